@@ -1,5 +1,4 @@
 import os
-import boto3
 import pandas as pd
 import stat
 from io import StringIO
@@ -8,13 +7,11 @@ from botocore.exceptions import NoCredentialsError, PartialCredentialsError, Tok
 import paramiko
 import zipfile
 from settings import settings  # Asegúrate de importar correctamente tus configuraciones
+from src.compresion import obtener_codec
+from src.clientes_aws import cliente_s3
 
-# Configurar las credenciales de AWS desde variables de entorno
-aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
-aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-
-# Configurar la sesión y el cliente de S3
-s3 = boto3.client('s3', aws_access_key_id=aws_access_key_id, aws_secret_access_key=aws_secret_access_key)
+# Cliente de S3 compartido (credenciales AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY del entorno)
+s3 = cliente_s3()
 #s3 = boto3.client('s3')
 
 # Crear el directorio temporal si no existe
@@ -199,15 +196,17 @@ def transformar_datos(df):
 
 def guardar_json_s3(df, bucket, key):
     """
-    Guarda el DataFrame en formato JSON en un bucket de S3.
+    Guarda el DataFrame en formato JSON en un bucket de S3, comprimido según CODEC_SALIDA.
 
     :param df: DataFrame a guardar.
     :param bucket: Nombre del bucket en S3.
-    :param key: Clave del objeto en S3.
+    :param key: Clave del objeto en S3 (se le añade el sufijo del códec, p. ej. '.gz').
     """
     try:
+        codec = obtener_codec()
+        key = key + codec.sufijo
         json_data = df.to_json(orient='records', lines=True)
-        s3.put_object(Bucket=bucket, Key=key, Body=json_data)
+        s3.put_object(Bucket=bucket, Key=key, Body=codec.comprimir(json_data.encode('utf-8')), **codec.argumentos_subida())
         logger.info(f"Archivo JSON guardado en S3: {key}")
         if not validar_archivo_s3(bucket, key):
             logger.error(f"El archivo en S3 no fue encontrado después de guardar: {key}")
@@ -7,47 +7,24 @@ manteniendo la estructura de carpetas de países y servicios.
 :param s3_prefix_raw: Prefijo en S3 de la carpeta 'src/raw/' donde se moverán los archivos.
 """
 
-import boto3
-import posixpath
+import os
 from loguru import logger
-from config.settings import settings
+from src.migracion_s3 import aplicar_plan, destino_por_prefijos, generar_plan
+from src.clientes_aws import cliente_s3
 
-def mover_archivos_json_a_raw(bucket_name, s3_prefix_sales, s3_prefix_raw):
-    # Crear cliente S3
-    s3 = boto3.client('s3', aws_access_key_id=settings.AWS_ACCESS_KEY_ID, aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY)
-    
-    # Paginador para listar todos los archivos bajo el prefijo 'src/sales/'
-    paginator = s3.get_paginator('list_objects_v2')
-    
+def mover_archivos_json_a_raw(bucket_name, s3_prefix_sales, s3_prefix_raw, ruta_plan):
+    # Plan de un único listado y aplicación con diario: si se interrumpe, volver a ejecutar reanuda sin re-listar
     try:
-        # Recorrer las páginas de resultados
-        for page in paginator.paginate(Bucket=bucket_name, Prefix=s3_prefix_sales):
-            for obj in page.get('Contents', []):
-                archivo_s3 = obj['Key']
-                
-                # Verificar si el archivo es un .json
-                if archivo_s3.endswith('.json'):
-                    logger.info(f"Archivo .json encontrado: {archivo_s3}")
-                    
-                    # Obtener la estructura relativa bajo 'src/sales/'
-                    relative_path = archivo_s3[len(s3_prefix_sales):]
-                    
-                    # Crear el nuevo path bajo 'src/raw/' manteniendo la estructura
-                    nuevo_s3_path = posixpath.join(s3_prefix_raw, relative_path)
-                    
-                    logger.info(f"Moviendo archivo a: s3://{bucket_name}/{nuevo_s3_path}")
-                    
-                    # Copiar el archivo a la nueva ubicación en 'src/raw/'
-                    s3.copy_object(
-                        Bucket=bucket_name,
-                        CopySource={'Bucket': bucket_name, 'Key': archivo_s3},
-                        Key=nuevo_s3_path
-                    )
-                    
-                    # Eliminar el archivo original de 'src/sales/' tras la copia exitosa
-                    s3.delete_object(Bucket=bucket_name, Key=archivo_s3)
-                    logger.info(f"Archivo original {archivo_s3} eliminado de 'src/sales/'.")
-    
+        if not os.path.exists(ruta_plan):
+            destino_de = destino_por_prefijos([(s3_prefix_sales, s3_prefix_raw)])
+            generar_plan(
+                cliente_s3(), bucket_name, s3_prefix_sales,
+                lambda archivo_s3: destino_de(archivo_s3) if archivo_s3.endswith('.json') else None, ruta_plan
+            )
+        resultado = aplicar_plan(ruta_plan)
+        for archivo_s3, error in sorted(resultado.fallidos.items()):
+            logger.error(f"No se movió {archivo_s3}, el original se conserva: {error}")
+        return resultado
     except Exception as e:
         logger.error(f"Error al mover archivos .json a 'raw/': {e}")
 
@@ -55,6 +32,7 @@ def mover_archivos_json_a_raw(bucket_name, s3_prefix_sales, s3_prefix_raw):
 bucket_name = 'sns-amazonmusic-trends'
 s3_prefix_sales = 'src/sales/NA/Daily/Unlimited/'  # Origen correcto
 s3_prefix_raw = 'src/sales/ROW_NA/Daily/Unlimited/'  # Destino correcto
+ruta_plan = 'migracion_json_NA_ROW_NA.jsonl'  # Plan de la migración; su diario queda en <plan>.diario
 
 # Llamada a la función
-mover_archivos_json_a_raw(bucket_name, s3_prefix_sales, s3_prefix_raw)
+mover_archivos_json_a_raw(bucket_name, s3_prefix_sales, s3_prefix_raw, ruta_plan)
@@ -0,0 +1,86 @@
+import argparse
+import random
+import time
+from io import BytesIO
+import pandas as pd
+from loguru import logger
+from src.compresion import CODECS, obtener_codec
+from src.file_transformer import transformar_datos
+from src.serializador_json import escribir_ndjson
+
+# Valores de ejemplo para generar un archivo diario sintético parecido a los reportes de Amazon
+TERRITORIOS = ['US', 'MX', 'BR', 'ES', 'AR', 'CO', 'CL']
+PLANES = ['Unlimited Individual', 'Unlimited Family', 'Prime', 'Ad-Supported']
+DISPOSITIVOS = ['Mobile', 'Echo', 'Web', 'Desktop', 'FireTV']
+FUENTES = ['Playlist', 'Album', 'Station', 'Search', 'Library']
+CALIDADES = ['SD', 'HD', 'UHD']
+
+
+def generar_dataframe(filas, semilla=42):
+    """DataFrame sintético con la cabecera de los TSV diarios (antes de transformar_datos)."""
+    aleatorio = random.Random(semilla)
+    pistas = [(f"B0{aleatorio.randrange(10**8):08d}", f"USRC1{aleatorio.randrange(10**7):07d}") for _ in range(2000)]
+    registros = []
+    for _ in range(filas):
+        asin, isrc = aleatorio.choice(pistas)
+        registros.append({
+            'dataset date': '2024-01-15',
+            'territory code': aleatorio.choice(TERRITORIOS),
+            'track asin': asin,
+            'track isrc': isrc,
+            'track name': f"Track {isrc[-4:]}",
+            'track artist': f"Artist {asin[-3:]}",
+            'streams': 1,
+            'timestamp': f"2024-01-15 {aleatorio.randrange(24):02d}:{aleatorio.randrange(60):02d}:{aleatorio.randrange(60):02d}",
+            'play duration': aleatorio.randrange(30, 300),
+            'subscription plan': aleatorio.choice(PLANES),
+            'device type': aleatorio.choice(DISPOSITIVOS),
+            'customer id': f"{aleatorio.randrange(10**9):x}",
+            'stream source': aleatorio.choice(FUENTES),
+            'track quality': aleatorio.choice(CALIDADES),
+        })
+    return pd.DataFrame(registros)
+
+
+def medir(codec, datos, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        comprimido = codec.comprimir(datos)
+    segundos_compresion = (time.perf_counter() - inicio) / repeticiones
+
+    inicio = time.perf_counter()
+    restaurado = codec.descomprimir(comprimido)
+    segundos_descompresion = time.perf_counter() - inicio
+
+    assert restaurado == datos, f"El códec {codec.nombre} no devuelve los datos originales"
+    return len(comprimido), segundos_compresion, segundos_descompresion
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara tamaño y velocidad de los códecs de salida JSON.")
+    parser.add_argument('--filas', type=int, default=200_000, help="Filas del archivo diario sintético.")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Repeticiones de cada compresión.")
+    args = parser.parse_args()
+
+    # Se comprime el NDJSON que publican los escritores, no el array de to_json(orient='records')
+    salida = BytesIO()
+    escribir_ndjson(transformar_datos(generar_dataframe(args.filas)), salida, date_format='iso')
+    datos = salida.getvalue()
+    mb = len(datos) / 1024 / 1024
+    logger.info(f"Archivo sintético: {args.filas} filas, {mb:.1f} MB de NDJSON")
+
+    for nombre in CODECS:
+        try:
+            codec = obtener_codec(nombre)
+        except ImportError as e:
+            logger.warning(f"{nombre}: omitido ({e})")
+            continue
+        tamano, segundos_compresion, segundos_descompresion = medir(codec, datos, args.repeticiones)
+        logger.info(
+            f"{nombre:>5}: {tamano / 1024 / 1024:8.2f} MB ({len(datos) / tamano:5.1f}x), "
+            f"compresión {mb / segundos_compresion:8.1f} MB/s, descompresión {mb / max(segundos_descompresion, 1e-9):8.1f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
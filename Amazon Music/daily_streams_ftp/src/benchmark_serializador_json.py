@@ -0,0 +1,61 @@
+import argparse
+import time
+from io import BytesIO
+import pandas as pd
+from loguru import logger
+from benchmark_codecs import generar_dataframe
+from src.esquema_tsv import leer_tsv_tipado
+from src.file_transformer import transformar_datos
+from src.serializador_json import escribir_ndjson, serializar_json
+
+
+def dataframe_tipado(filas):
+    """Archivo diario sintético leído con el esquema de Diccionario.json, como en producción."""
+    tsv = generar_dataframe(filas).to_csv(sep='\t', index=False).encode('utf-8')
+    return transformar_datos(leer_tsv_tipado(BytesIO(tsv)))
+
+
+def comprobar_paridad(df, date_format):
+    """
+    Falla si el serializador no produce exactamente los bytes de DataFrame.to_json en el archivo medido.
+    Los casos límite están en tests/test_serializador_json.py.
+    """
+    for lineas in (False, True):
+        esperado = df.to_json(orient='records', lines=lineas, date_format=date_format).encode('utf-8')
+        obtenido = serializar_json(df, lineas=lineas, date_format=date_format)
+        assert obtenido == esperado, f"Salida distinta de pandas (lines={lineas}, date_format={date_format})"
+    salida = BytesIO()
+    escribir_ndjson(df, salida, date_format=date_format, filas_por_lote=max(3, len(df) // 4))
+    assert salida.getvalue() == df.to_json(orient='records', lines=True, date_format=date_format).encode('utf-8')
+
+
+def medir(funcion, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion()
+    return resultado, (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el serializador JSON por columnas con DataFrame.to_json.")
+    parser.add_argument('--filas', type=int, default=200_000, help="Filas del archivo diario sintético.")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Repeticiones de cada serialización.")
+    args = parser.parse_args()
+
+    df = dataframe_tipado(args.filas)
+    comprobar_paridad(df, 'iso')
+    logger.info(f"Paridad con pandas en {args.filas} filas tipadas: OK")
+
+    for lineas in (False, True):
+        esperado, segundos_pandas = medir(lambda: df.to_json(orient='records', lines=lineas, date_format='iso').encode('utf-8'), args.repeticiones)
+        obtenido, segundos_rapido = medir(lambda: serializar_json(df, lineas=lineas, date_format='iso'), args.repeticiones)
+        assert obtenido == esperado
+        mb = len(esperado) / 1024 / 1024
+        logger.info(
+            f"{'NDJSON' if lineas else 'array'}: {mb:.1f} MB, pandas {mb / segundos_pandas:7.1f} MB/s, "
+            f"por columnas {mb / segundos_rapido:7.1f} MB/s ({segundos_pandas / segundos_rapido:4.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
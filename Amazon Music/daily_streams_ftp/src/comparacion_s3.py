@@ -160,12 +160,14 @@ def main():
                     logger.info(f"Omitiendo: {archivo} (No es un archivo .txt)")
 
         # Subir solo los archivos faltantes a S3
-        upload_missing_files_to_s3(
+        resultado_subida = upload_missing_files_to_s3(
             settings.DIRECTORIO_TEMPORAL, 
             settings.BUCKET_NAME, 
             settings.S3_PREFIX,  # 'src/raw/' como prefijo en S3
             set(s3_files)  # Archivos que ya existen en S3
         )
+        if not resultado_subida:
+            raise RuntimeError(f"No se pudieron subir {len(resultado_subida.fallidos)} zips: {sorted(resultado_subida.fallidos)}")
 
 
         # Limpiar el directorio temporal después de subir los archivos a S3
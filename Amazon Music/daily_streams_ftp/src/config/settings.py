@@ -23,11 +23,29 @@ class Settings:
     # AWS S3
     AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
     AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+    AWS_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', 64))  # Conexiones del cliente S3 compartido (cubrir hilos de copia/subida)
+    AWS_REINTENTOS = int(os.getenv('AWS_REINTENTOS', 10))  # Reintentos máximos por llamada a AWS (sin contar el primer intento)
+    AWS_MODO_REINTENTOS = os.getenv('AWS_MODO_REINTENTOS', 'adaptive')  # Modo de reintentos de botocore: legacy, standard o adaptive
+    AWS_TCP_KEEPALIVE = os.getenv('AWS_TCP_KEEPALIVE', 'true').lower() in ('1', 'true', 'si')  # Keep-alive TCP en las conexiones a AWS
     BUCKET_NAME = 'sns-amazonmusic-trends'  # Nombre del bucket de salida
     S3_PREFIX = 'raw/'  # Prefijo en S3
     S3_PREFIX_RAW = 'src/sales/'  # Prefijo en S3 para raw
+    S3_PREFIX_PARQUET = os.getenv('S3_PREFIX_PARQUET', 'src/sales_parquet/')  # Prefijo en S3 para la salida Parquet (particiones Hive)
     BUCKET_NAME_AMAZON_FTP = 'sns-dataplatform-landing-zone'
     S3_PREFIX_AMAZON_FTP = 'dsps/amazon-music/ftp/sales/'
+    S3_LIST_WORKERS = int(os.getenv('S3_LIST_WORKERS', 16))  # Hilos para listar shards de S3 en paralelo
+    S3_LIST_SHARD_DEPTH = int(os.getenv('S3_LIST_SHARD_DEPTH', 3))  # Niveles de carpetas por shard (territorio/Daily/servicio)
+    S3_UPLOAD_WORKERS = int(os.getenv('S3_UPLOAD_WORKERS', 8))  # Zips subiéndose a S3 a la vez
+    S3_TRANSFER_CONCURRENCIA = int(os.getenv('S3_TRANSFER_CONCURRENCIA', 4))  # Hilos por archivo en las subidas multiparte de zips
+    S3_TRANSFER_UMBRAL_MB = int(os.getenv('S3_TRANSFER_UMBRAL_MB', 16))  # Tamaño a partir del cual un zip se sube por partes
+    S3_TRANSFER_PARTE_MB = int(os.getenv('S3_TRANSFER_PARTE_MB', 16))  # MB por parte en las subidas de zips
+    S3_DELETE_WORKERS = int(os.getenv('S3_DELETE_WORKERS', 4))  # Lotes de delete_objects (1000 claves) enviándose a la vez
+    S3_BORRADO_SIMULADO = os.getenv('S3_BORRADO_SIMULADO', 'false').lower() in ('1', 'true', 'si')  # Solo listar lo que se borraría
+    S3_COPIA_WORKERS = int(os.getenv('S3_COPIA_WORKERS', 32))  # Copias del lado del servidor a la vez al mover prefijos
+    S3_COPIA_PARTE_MB = int(os.getenv('S3_COPIA_PARTE_MB', 512))  # MB por parte al copiar objetos de más de 5 GB
+    S3_COPIA_HILOS_PARTES = int(os.getenv('S3_COPIA_HILOS_PARTES', 8))  # Partes copiándose a la vez en esos objetos
+    MIGRACION_TAMANO_TANDA = int(os.getenv('MIGRACION_TAMANO_TANDA', 1000))  # Pares migrados entre anotaciones en el diario
+    S3_INDICE_MAX_ANTIGUEDAD = int(os.getenv('S3_INDICE_MAX_ANTIGUEDAD', 6 * 3600))  # Segundos de vigencia del índice de existencia
 
     # SFTP
     SFTP_HOST = 'prod.reporting.amazonmusiccatalog.com'
@@ -35,10 +53,42 @@ class Settings:
     SFTP_USERNAME = os.getenv('SFTP_USERNAME')
     SFTP_PASSWORD = os.getenv('SFTP_PASSWORD')
     SFTP_DIRECTORIO_RAIZ = '/cxp-reporting/ZQLUC/sales/'  # Directorio raíz en SFTP
+    SFTP_LIST_WORKERS = int(os.getenv('SFTP_LIST_WORKERS', 8))  # Canales SFTP en paralelo para listar el árbol
+    VENTANA_DIAS_ATRAS = int(os.getenv('VENTANA_DIAS_ATRAS')) if os.getenv('VENTANA_DIAS_ATRAS') else None  # Días hacia atrás a procesar por defecto (vacío: todo el histórico)
+    SFTP_DOWNLOAD_WORKERS = int(os.getenv('SFTP_DOWNLOAD_WORKERS', 4))  # Sesiones SFTP en paralelo para descargar
+    SFTP_DOWNLOAD_MAX_REINTENTOS = int(os.getenv('SFTP_DOWNLOAD_MAX_REINTENTOS', 3))  # Intentos por archivo
+    SFTP_DOWNLOAD_ESPERA_BASE = float(os.getenv('SFTP_DOWNLOAD_ESPERA_BASE', 2))  # Segundos de espera inicial entre reintentos (se duplica)
+    SFTP_STREAMING = os.getenv('SFTP_STREAMING', 'false').lower() in ('1', 'true', 'si')  # Procesar los zips en memoria, sin disco local
+    SPOOL_MAX_MEMORIA = int(os.getenv('SPOOL_MAX_MEMORIA', 256 * 1024 * 1024))  # Bytes de un zip en memoria antes de pasar a un temporal
+
+    # Pipeline descarga -> extracción -> transformación -> subida
+    PIPELINE_HILOS_DESCARGA = int(os.getenv('PIPELINE_HILOS_DESCARGA', SFTP_DOWNLOAD_WORKERS))  # Canales SFTP descargando a la vez
+    PIPELINE_HILOS_EXTRACCION = int(os.getenv('PIPELINE_HILOS_EXTRACCION', 2))  # Hilos descomprimiendo zips
+    PIPELINE_HILOS_TRANSFORMACION = int(os.getenv('PIPELINE_HILOS_TRANSFORMACION', 2))  # Hilos transformando TSV a JSON
+    PIPELINE_HILOS_SUBIDA = int(os.getenv('PIPELINE_HILOS_SUBIDA', 8))  # Hilos subiendo a S3
+    PIPELINE_CAPACIDAD_COLA = int(os.getenv('PIPELINE_CAPACIDAD_COLA', 8))  # Elementos en espera entre dos etapas
+    TRANSFORM_PROCESOS = int(os.getenv('TRANSFORM_PROCESOS', 1))  # Procesos para transformar TSV (1: en el propio proceso, sin pool)
+    TRANSFORM_MEMORIA_MAX_MB = int(os.getenv('TRANSFORM_MEMORIA_MAX_MB', 0))  # Límite de espacio de direcciones (RLIMIT_AS, no RSS) por proceso de transformación (0: sin límite)
+    TSV_LECTURA_TIPADA = os.getenv('TSV_LECTURA_TIPADA', 'false').lower() in ('1', 'true', 'si')  # Leer los TSV con los tipos de Diccionario.json
+    TSV_ESQUEMA_ESTRICTO = os.getenv('TSV_ESQUEMA_ESTRICTO', 'false').lower() in ('1', 'true', 'si')  # Fallar (no solo avisar) ante diferencias de esquema
+    DICCIONARIO_TSV = os.getenv('DICCIONARIO_TSV', os.path.join(os.path.dirname(__file__), 'Diccionario.json'))  # Esquema de columnas de los TSV
+    TSV_FILAS_POR_BLOQUE = int(os.getenv('TSV_FILAS_POR_BLOQUE', 0))  # Transformar los TSV por bloques de N filas (0: archivo completo)
+    FORMATO_SALIDA = os.getenv('FORMATO_SALIDA', 'json').lower()  # Formato de publicación de los TSV: json o parquet
+    PARQUET_COMPRESION = os.getenv('PARQUET_COMPRESION', 'zstd')  # Códec de los Parquet (zstd o snappy)
+    PARQUET_FILAS_POR_GRUPO = int(os.getenv('PARQUET_FILAS_POR_GRUPO', 1_000_000))  # Filas por row group
+    CODEC_SALIDA = os.getenv('CODEC_SALIDA', 'none').lower()  # Compresión de la salida JSON: none, gzip o zstd
+    CODEC_NIVEL_GZIP = int(os.getenv('CODEC_NIVEL_GZIP', 6))  # Nivel de gzip (1-9)
+    CODEC_NIVEL_ZSTD = int(os.getenv('CODEC_NIVEL_ZSTD', 3))  # Nivel de zstd (1-22)
+    JSON_LINEAS = os.getenv('JSON_LINEAS', 'true').lower() in ('1', 'true', 'si')  # Publicar NDJSON (un registro por línea, claves .ndjson); false: array JSON (claves .json)
+    SERIALIZADOR_JSON = os.getenv('SERIALIZADOR_JSON', 'rapido').lower()  # Serialización JSON: rapido (por columnas) o pandas (to_json)
+    S3_MULTIPARTE_TAMANO_PARTE_MB = int(os.getenv('S3_MULTIPARTE_TAMANO_PARTE_MB', 8))  # MB por parte al subir la salida desde memoria (mínimo 5)
+    S3_MULTIPARTE_CONCURRENCIA = int(os.getenv('S3_MULTIPARTE_CONCURRENCIA', 4))  # Partes subiéndose a la vez por archivo
 
     # Directorios
     DIRECTORIO_TEMPORAL = 'src/Data'
     DIRECTORIO_LOCAL = 'src/Data'
+    SFTP_LISTING_CACHE = os.getenv('SFTP_LISTING_CACHE', 'src/sftp_listing_cache.jsonl')  # Caché de listados SFTP ('' para desactivar)
+    S3_MANIFEST_PATH = os.getenv('S3_MANIFEST_PATH', 'src/s3_manifest.sqlite3')  # Índice local de claves S3 ('' para desactivar)
 
 settings = Settings()
 
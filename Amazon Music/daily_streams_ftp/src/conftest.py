@@ -0,0 +1 @@
+# Con este conftest en la raíz, pytest agrega esta carpeta a sys.path y los tests importan src y config
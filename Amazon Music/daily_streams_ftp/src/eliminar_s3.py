@@ -1,33 +1,24 @@
-import boto3
-import re
+from src.borrado_s3 import eliminar_prefijo
+from src.clientes_aws import cliente_s3
 
 # Configura tu cliente S3
-s3 = boto3.client('s3')
+s3 = cliente_s3()
 
 # Parámetros
 BUCKET_NAME = 'sns-amazonmusic-trends'  # Reemplaza con el nombre de tu bucket
 LOCAL_PATH_SALES = 'src/sales/'   # La ruta en el bucket
+SIMULAR = False  # True: solo se escribe el manifiesto con los .zip que se borrarían
+MANIFIESTO = 'zips_a_eliminar.txt'  # Claves a borrar, una por línea
 
-def delete_zip_files(bucket_name, prefix):
-    # Lista los objetos en el bucket con el prefijo dado
-    response = s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-    
-    # Verifica si la respuesta contiene objetos
-    while response.get('Contents'):
-        for obj in response['Contents']:
-            file_key = obj['Key']
-            # Verifica si el archivo tiene la extensión .zip
-            if file_key.endswith('.zip'):
-                print(f'Eliminando {file_key}...')
-                s3.delete_object(Bucket=bucket_name, Key=file_key)
-                print(f'Archivo {file_key} eliminado.')
-        
-        # Obtiene el marcador para la siguiente página de resultados, si lo hay
-        if response.get('IsTruncated'):
-            continuation_token = response.get('NextContinuationToken')
-            response = s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix, ContinuationToken=continuation_token)
-        else:
-            break
+def delete_zip_files(bucket_name, prefix, simular=SIMULAR, manifiesto=MANIFIESTO):
+    # Recorre todas las páginas del prefijo y borra los .zip en lotes de hasta 1000 claves
+    resultado = eliminar_prefijo(
+        s3, bucket_name, prefix, filtro=lambda clave: clave.endswith('.zip'), simular=simular, manifiesto=manifiesto
+    )
+    print(f"{'Se eliminarían' if resultado.simulado else 'Eliminados'} {len(resultado.eliminados)} archivos .zip.")
+    for clave, error in sorted(resultado.fallidos.items()):
+        print(f'No se pudo eliminar {clave}: {error}')
+    return resultado
 
 # Llama a la función para eliminar los archivos .zip
 delete_zip_files(BUCKET_NAME, LOCAL_PATH_SALES)
\ No newline at end of file
@@ -1,23 +1,60 @@
-import os
-import zipfile
-import pandas as pd
+import argparse
+from collections import Counter
 import paramiko
 from loguru import logger
-from src.s3_utils import list_s3_files, upload_missing_files_to_s3
-from src.sftp_utils import list_sftp_files
-from src.file_comparisons import compare_structures
-from src.file_transformer import upload_and_transform_txt_files_to_s3, validar_y_eliminar_archivos_nivel_superior
+from src.s3_utils import list_s3_objects
+from src.s3_manifest import ManifiestoS3
+from src.indice_s3 import IndiceExistenciaS3
+from src.sftp_utils import list_sftp_file_attrs, refrescar_atributos
+from src.file_comparisons import clave_archivo, compare_structures
+from src.file_transformer import validar_y_eliminar_archivos_nivel_superior
 from src.file_uploader import asegurar_directorio, limpiar_directorio_temporal
-from src.sftp_downloader import descargar_y_descomprimir_archivos_faltantes
+from src.sftp_downloader import seleccionar_archivos_a_descargar
+from src.sftp_streaming import procesar_archivos_en_streaming
+from src.pipeline_diario import procesar_archivos_en_pipeline
+from src.ventana_fechas import VentanaFechas
 from config.settings import settings
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sincroniza los reportes diarios de Amazon Music desde SFTP hacia S3.")
+    ventana = parser.add_mutually_exclusive_group()
+    ventana.add_argument('--since', help="Procesar solo fechas de dataset desde YYYY-MM-DD (inclusive).")
+    ventana.add_argument('--days-back', type=int, default=settings.VENTANA_DIAS_ATRAS,
+                         help="Procesar solo los últimos N días de fechas de dataset.")
+    parser.add_argument('--full-reconcile', action='store_true',
+                        help="Volver a listar S3 por completo y reconciliar el manifiesto local.")
+    parser.add_argument('--streaming', action='store_true', default=settings.SFTP_STREAMING,
+                        help="Procesar los zips en memoria (SFTP -> S3) sin pasar por el directorio temporal.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
     # Inicio del proceso
     logger.info("Iniciando el proceso...")
 
-    # Obtener listas de archivos en S3
+    # Ventana de fechas: se aplica durante el recorrido del SFTP
+    ventana = VentanaFechas.desde_argumentos(args.since, args.days_back)
+    if ventana:
+        logger.info(f"Procesando solo fechas de dataset en {ventana}")
+
+    # Descargas por ruta remota, para el resumen de la ejecución
+    contador_descargas = Counter()
+
+    # Obtener listas de archivos en S3 (desde el manifiesto local si está activo)
+    manifiesto = ManifiestoS3() if settings.S3_MANIFEST_PATH else None
     try:
-        s3_files = list_s3_files(settings.BUCKET_NAME, settings.S3_PREFIX)
+        if manifiesto:
+            manifiesto.refrescar(settings.BUCKET_NAME, settings.S3_PREFIX, completo=args.full_reconcile)
+            manifiesto.refrescar(settings.BUCKET_NAME_AMAZON_FTP, settings.S3_PREFIX_AMAZON_FTP, completo=args.full_reconcile)
+            s3_objetos = manifiesto.objetos(settings.BUCKET_NAME, settings.S3_PREFIX)
+            zips_objetos = manifiesto.objetos(settings.BUCKET_NAME_AMAZON_FTP, settings.S3_PREFIX_AMAZON_FTP)
+            zips_existentes = manifiesto.vista(settings.BUCKET_NAME_AMAZON_FTP, settings.S3_PREFIX_AMAZON_FTP)
+        else:
+            s3_objetos, _ = list_s3_objects(settings.BUCKET_NAME, settings.S3_PREFIX)
+            zips_objetos, _ = list_s3_objects(settings.BUCKET_NAME_AMAZON_FTP, settings.S3_PREFIX_AMAZON_FTP)
+            zips_existentes = {obj['Key'] for obj in zips_objetos}
+        s3_files = [obj['Key'] for obj in s3_objetos]
         #logger.info(f"Archivos en S3: {s3_files}")
     except Exception as e:
         logger.error(f"Error obteniendo lista de archivos de S3: {e}")
@@ -31,68 +68,67 @@ def main():
         #logger.info("Conexión SFTP establecida correctamente")
 
         # Obtener listas de archivos en SFTP
-        sftp_files = list_sftp_files(sftp, settings.SFTP_DIRECTORIO_RAIZ)
+        sftp_attrs = list_sftp_file_attrs(sftp, settings.SFTP_DIRECTORIO_RAIZ, ventana=ventana)
+        sftp_files = list(sftp_attrs)
+
+        # La caché de listados no ve un zip sobrescrito: stat de los que se van a comparar con la landing zone
+        claves_zips = {clave_archivo(obj['Key']) for obj in zips_objetos}
+        refrescar_atributos(sftp, sftp_attrs, filtro=lambda ruta: clave_archivo(ruta) in claves_zips)
         #logger.info(f"Archivos en SFTP: {sftp_files}")
     except Exception as e:
         logger.error(f"Error conectando al servidor SFTP: {e}")
         return
 
     try:
-        # Comparar estructuras
-        missing_in_s3 = compare_structures(s3_files, sftp_files)
-        #logger.info(f"Archivos faltantes en S3: {missing_in_s3}")
+        # Comparar estructuras: faltantes frente a raw/ y modificados (tamaño o mtime) frente a
+        # la landing zone, que es donde se vuelve a subir un zip modificado
+        comparacion = compare_structures(
+            s3_files, sftp_files, settings.SFTP_DIRECTORIO_RAIZ,
+            tamanos_sftp={ruta: attr.st_size for ruta, attr in sftp_attrs.items()},
+            tamanos_s3={obj['Key']: obj['Size'] for obj in zips_objetos},
+            mtimes_sftp={ruta: attr.st_mtime for ruta, attr in sftp_attrs.items()},
+            fechas_s3={obj['Key']: obj['LastModified'] for obj in zips_objetos},
+        )
+        #logger.info(f"Archivos faltantes en S3: {comparacion.faltantes}")
+        subcarpetas_encontradas = {'Ad-Supported': True, 'Prime': True, 'Unlimited': True}
 
-        # Asegurarse de que el directorio temporal exista
-        asegurar_directorio(settings.DIRECTORIO_TEMPORAL)
-        #logger.info(f"Directorio temporal asegurado: {settings.DIRECTORIO_TEMPORAL}")
+        # Índice de las salidas ya publicadas (JSON o Parquet), cargado una vez en lugar de un HEAD por archivo
+        prefijo_salida = settings.S3_PREFIX_PARQUET if settings.FORMATO_SALIDA == 'parquet' else settings.S3_PREFIX_RAW
+        if manifiesto:
+            manifiesto.refrescar(settings.BUCKET_NAME, prefijo_salida)
+            json_existentes = IndiceExistenciaS3.desde_manifiesto(manifiesto, settings.BUCKET_NAME, prefijo_salida)
+        else:
+            json_existentes = IndiceExistenciaS3.desde_listado(settings.BUCKET_NAME, prefijo_salida)
 
-        # Descargar y descomprimir archivos faltantes
-        subcarpetas_encontradas = {'Ad-Supported': True, 'Prime': True, 'Unlimited': True}
-        archivos_descargados = descargar_y_descomprimir_archivos_faltantes(
-            sftp, sftp_files, s3_files, settings.DIRECTORIO_TEMPORAL, subcarpetas_encontradas, settings.SFTP_DIRECTORIO_RAIZ
-        )
-        logger.info(f"Archivos descargados: {archivos_descargados}")
-
-        # Validar que los archivos descargados existan
-        #for root, dirs, files in os.walk(settings.DIRECTORIO_TEMPORAL):
-        #    if files:
-        #        logger.info(f"Archivos encontrados en {root}: {files}")
-        #    else:
-        #        logger.info(f"No se encontraron archivos en {root}")
-        
-        # Subir archivos faltantes a S3
-        upload_missing_files_to_s3(
-            settings.DIRECTORIO_TEMPORAL, 
-            settings.BUCKET_NAME_AMAZON_FTP, 
-            settings.S3_PREFIX_AMAZON_FTP,  
-            set(s3_files)
-        )
-        logger.info("Archivos subidos a S3 correctamente")
-
-# Procesar y subir archivos .txt a S3
-        for root, dirs, files in os.walk(settings.DIRECTORIO_TEMPORAL):
-            logger.info(f"Archivos encontrados en {root}: {files}")
-            for archivo in files:
-                archivo_path = os.path.join(root, archivo)
-
-                if archivo.lower().endswith('.txt'):
-                    logger.info(f"Procesando archivo: {archivo_path}")
-                    
-                    # Llamar a la función con los parámetros correctos
-                    upload_and_transform_txt_files_to_s3(
-                        archivo_path,              # Ruta completa del archivo .txt
-                        settings.BUCKET_NAME,      # Nombre del bucket en S3
-                        settings.S3_PREFIX_RAW,    # Prefijo de S3 (src/sales)
-                        settings.DIRECTORIO_TEMPORAL  # Directorio temporal local
-                    )
-                else:
-                    logger.info(f"Omitiendo archivo no .txt: {archivo}")
-                    
-        validar_y_eliminar_archivos_nivel_superior(settings.BUCKET_NAME_AMAZON_FTP, settings.S3_PREFIX_AMAZON_FTP)
+        if args.streaming:
+            # Descarga a memoria, subida del zip y publicación de los JSON sin tocar el disco local
+            archivos_para_descargar, atributos = seleccionar_archivos_a_descargar(comparacion, subcarpetas_encontradas)
+            procesar_archivos_en_streaming(
+                sftp, archivos_para_descargar, zips_existentes, json_existentes,
+                modificados={entrada.clave.nombre for entrada in comparacion.modificados()},
+                contador_descargas=contador_descargas, atributos=atributos
+            )
+        else:
+            # Asegurarse de que el directorio temporal exista
+            asegurar_directorio(settings.DIRECTORIO_TEMPORAL)
+            #logger.info(f"Directorio temporal asegurado: {settings.DIRECTORIO_TEMPORAL}")
 
-        # Limpiar el directorio temporal después de subir los archivos a S3
-        limpiar_directorio_temporal(settings.DIRECTORIO_TEMPORAL)
-        logger.info("Directorio temporal limpiado")
+            # Descargar, descomprimir, transformar y subir con las etapas solapadas
+            archivos_para_descargar, atributos = seleccionar_archivos_a_descargar(comparacion, subcarpetas_encontradas)
+            resultado_subida = procesar_archivos_en_pipeline(
+                sftp, archivos_para_descargar, settings.DIRECTORIO_TEMPORAL, zips_existentes, json_existentes,
+                modificados={entrada.clave.nombre for entrada in comparacion.modificados()},
+                contador_descargas=contador_descargas, atributos=atributos
+            )
+            logger.info(f"Archivos subidos a S3: {len(resultado_subida.subidos)}")
+            if not resultado_subida:
+                logger.error(f"{len(resultado_subida.fallidos)} zips fallaron en alguna etapa (ver el detalle del pipeline)")
+
+            # Limpiar el directorio temporal después de subir los archivos a S3
+            limpiar_directorio_temporal(settings.DIRECTORIO_TEMPORAL)
+            logger.info("Directorio temporal limpiado")
+
+        validar_y_eliminar_archivos_nivel_superior(settings.BUCKET_NAME_AMAZON_FTP, settings.S3_PREFIX_AMAZON_FTP)
 
     except Exception as e:
         logger.error(f"Ocurrió un error durante el proceso: {e}")
@@ -104,8 +140,15 @@ def main():
         if 'transport' in locals():
             transport.close()
             logger.info("Transporte SFTP cerrado")
+        if manifiesto:
+            manifiesto.cerrar()
 
     # Fin del proceso
+    duplicadas = sum(veces - 1 for veces in contador_descargas.values() if veces > 1)
+    logger.info(
+        f"Resumen: {sum(contador_descargas.values())} descargas SFTP, "
+        f"{len(contador_descargas)} archivos distintos, {duplicadas} descargas duplicadas"
+    )
     logger.info("Proceso completado con éxito.")
 
 if __name__ == "__main__":
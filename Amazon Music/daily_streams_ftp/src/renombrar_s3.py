@@ -1,70 +1,60 @@
-import boto3
 import os
-from config.settings import settings
+from src.clientes_aws import cliente_s3
+from src.migracion_s3 import aplicar_plan, generar_plan
+from src.mover_s3 import mover_prefijo
 
 # Parámetros
 S3_BUCKET_NAME = 'sns-amazonmusic-trends'  # Reemplaza con el nombre de tu bucket
 S3_PREFIX_RAW = 'src/sales/'  # Prefijo donde se almacenan los datos
 DAILY_FOLDER = 'daily'
 DAILY_FOLDER_RENAMED = 'Daily'
+RUTA_PLAN = 'migracion_daily_Daily.jsonl'  # Plan de la migración; su diario queda en <plan>.diario
 
 # Inicializar el cliente S3
-s3 = boto3.client('s3', aws_access_key_id=settings.AWS_ACCESS_KEY_ID, aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY)
+s3 = cliente_s3()
     
 
-def listar_objetos_prefijo(bucket, prefix):
-    """
-    Lista los objetos que comienzan con un prefijo dado en un bucket de S3.
-    """
-    response = s3.list_objects_v2(Bucket=bucket, Prefix=prefix)
-    return response.get('Contents', [])
-
 def renombrar_directorio(bucket, old_key, new_key):
     """
-    Renombra un directorio en S3 copiando el contenido a un nuevo nombre y eliminando el original.
+    Renombra un directorio en S3 copiando el contenido a un nuevo nombre y eliminando el original
+    (todas las páginas del prefijo, con copias en paralelo; ver src.mover_s3.mover_prefijo).
     """
-    # Obtener todos los objetos en la carpeta a renombrar
-    objetos = listar_objetos_prefijo(bucket, old_key)
+    resultado = mover_prefijo(bucket, old_key, new_key)
     
-    if not objetos:
+    if not resultado.movidos and not resultado.fallidos:
         print(f"No se encontró la carpeta '{old_key}'.")
         return
     
-    for obj in objetos:
-        # Generar la nueva clave para cada archivo
-        new_obj_key = obj['Key'].replace(old_key, new_key, 1)
-        
-        # Copiar el objeto a la nueva ubicación
-        s3.copy_object(
-            Bucket=bucket,
-            CopySource={'Bucket': bucket, 'Key': obj['Key']},
-            Key=new_obj_key
-        )
-        # Eliminar el objeto original
-        s3.delete_object(Bucket=bucket, Key=obj['Key'])
+    if resultado.fallidos:
+        print(f"No se pudieron mover {len(resultado.fallidos)} objetos de '{old_key}'; los originales se conservan.")
+        return
     
     print(f"Directorio renombrado de '{old_key}' a '{new_key}'.")
 
-def buscar_y_renombrar_carpeta_daily():
+def destino_carpeta_daily(clave):
+    """Clave con la carpeta 'daily' del país renombrada a 'Daily', o None si no está bajo 'daily'."""
+    partes = clave[len(S3_PREFIX_RAW):].split('/')
+    if len(partes) < 3 or partes[1] != DAILY_FOLDER:
+        return None
+    partes[1] = DAILY_FOLDER_RENAMED
+    return S3_PREFIX_RAW + '/'.join(partes)
+
+def buscar_y_renombrar_carpeta_daily(ruta_plan=RUTA_PLAN):
     """
     Busca la carpeta 'daily' en cada país y la renombra a 'Daily'.
+    Un único listado de 'src/sales/' genera el plan y la aplicación se anota en un diario,
+    así que si se interrumpe basta con volver a ejecutar para terminar sin re-listar.
     """
-    # Listar todos los países dentro de 'src/sales/'
-    objetos = listar_objetos_prefijo(S3_BUCKET_NAME, S3_PREFIX_RAW)
-    
-    # Crear un conjunto con los países (directorios de primer nivel)
-    paises = set(os.path.dirname(obj['Key']).split('/')[2] for obj in objetos if len(obj['Key'].split('/')) > 3)
+    if not os.path.exists(ruta_plan):
+        generar_plan(s3, S3_BUCKET_NAME, S3_PREFIX_RAW, destino_carpeta_daily, ruta_plan)
+    else:
+        print(f"Reanudando el plan existente {ruta_plan}")
     
-    for pais in paises:
-        old_daily_path = f"{S3_PREFIX_RAW}{pais}/{DAILY_FOLDER}/"
-        new_daily_path = f"{S3_PREFIX_RAW}{pais}/{DAILY_FOLDER_RENAMED}/"
-        
-        # Verificar si la carpeta 'daily' existe y renombrarla
-        if listar_objetos_prefijo(S3_BUCKET_NAME, old_daily_path):
-            print(f"Renombrando carpeta 'daily' para el país: {pais}")
-            renombrar_directorio(S3_BUCKET_NAME, old_daily_path, new_daily_path)
-        else:
-            print(f"No se encontró la carpeta 'daily' para el país: {pais}")
+    resultado = aplicar_plan(ruta_plan)
+    if resultado.fallidos:
+        print(f"No se pudieron mover {len(resultado.fallidos)} objetos; vuelve a ejecutar para reintentarlos.")
+    else:
+        print(f"Carpetas 'daily' renombradas a 'Daily' ({len(resultado.movidos)} objetos movidos en esta ejecución).")
 
 if __name__ == '__main__':
     buscar_y_renombrar_carpeta_daily()
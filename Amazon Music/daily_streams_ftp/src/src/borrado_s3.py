@@ -0,0 +1,109 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from loguru import logger
+from config.settings import settings
+
+# Máximo de claves que admite una llamada a delete_objects
+CLAVES_POR_LOTE = 1000
+
+
+@dataclass
+class ResultadoBorrado:
+    """
+    Resultado de un borrado masivo.
+
+    - eliminados: claves borradas (o que se borrarían, si simulado).
+    - fallidos: {clave: 'Código: mensaje'} de las claves que S3 no borró.
+    - simulado: True si solo se generó el manifiesto sin borrar nada.
+    """
+    eliminados: list = field(default_factory=list)
+    fallidos: dict = field(default_factory=dict)
+    simulado: bool = False
+
+    def __bool__(self):
+        """True si no falló ninguna clave."""
+        return not self.fallidos
+
+
+def listar_claves(s3, bucket_name, prefix, filtro=None, solo_nivel_superior=False):
+    """
+    Genera todas las claves bajo prefix, paginando list_objects_v2 hasta el final.
+
+    :param filtro: Función opcional clave -> bool; solo se generan las claves que la cumplen.
+    :param solo_nivel_superior: Si es True solo se generan los archivos directamente bajo prefix,
+                                sin entrar en subcarpetas (se lista con Delimiter='/').
+    """
+    parametros = {'Bucket': bucket_name, 'Prefix': prefix}
+    if solo_nivel_superior:
+        parametros['Delimiter'] = '/'
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(**parametros):
+        for obj in page.get('Contents', []):
+            if filtro is None or filtro(obj['Key']):
+                yield obj['Key']
+
+
+def _eliminar_lote(s3, bucket_name, claves):
+    """Borra hasta CLAVES_POR_LOTE claves. Devuelve {clave: error} de las que fallaron."""
+    try:
+        respuesta = s3.delete_objects(
+            Bucket=bucket_name, Delete={'Objects': [{'Key': clave} for clave in claves], 'Quiet': True}
+        )
+    except Exception as e:
+        # Si falla la llamada entera no se borró ninguna clave del lote
+        return {clave: str(e) for clave in claves}
+    return {error['Key']: f"{error.get('Code')}: {error.get('Message')}" for error in respuesta.get('Errors', [])}
+
+
+def eliminar_claves(s3, bucket_name, claves, simular=None, manifiesto=None, max_workers=None):
+    """
+    Borra claves con delete_objects en lotes de hasta 1000, enviando varios lotes a la vez.
+
+    :param claves: Iterable de claves (se consume una sola vez).
+    :param simular: Si es True no se borra nada; solo se devuelven (y se escriben en el manifiesto)
+                    las claves que se borrarían. Por defecto settings.S3_BORRADO_SIMULADO.
+    :param manifiesto: Ruta local opcional donde escribir las claves a borrar, una por línea.
+    :param max_workers: Lotes enviándose a la vez (por defecto settings.S3_DELETE_WORKERS).
+    :return: ResultadoBorrado.
+    """
+    simular = settings.S3_BORRADO_SIMULADO if simular is None else simular
+    max_workers = max(1, max_workers or settings.S3_DELETE_WORKERS)
+    claves = list(claves)
+    resultado = ResultadoBorrado(simulado=simular)
+
+    if manifiesto:
+        with open(manifiesto, 'w', encoding='utf-8') as archivo:
+            archivo.writelines(f"{clave}\n" for clave in claves)
+        logger.info(f"Manifiesto de borrado con {len(claves)} claves escrito en {manifiesto}")
+    if simular:
+        logger.info(f"Simulación: se borrarían {len(claves)} claves de s3://{bucket_name}")
+        resultado.eliminados = claves
+        return resultado
+
+    inicio = time.perf_counter()
+    lotes = [claves[i:i + CLAVES_POR_LOTE] for i in range(0, len(claves), CLAVES_POR_LOTE)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {executor.submit(_eliminar_lote, s3, bucket_name, lote): lote for lote in lotes}
+        for futuro in as_completed(futuros):
+            fallidos = futuro.result()
+            resultado.fallidos.update(fallidos)
+            resultado.eliminados.extend(clave for clave in futuros[futuro] if clave not in fallidos)
+
+    logger.info(
+        f"Borrado en s3://{bucket_name}: {len(resultado.eliminados)} claves eliminadas, "
+        f"{len(resultado.fallidos)} fallidas, {len(lotes)} lotes en {time.perf_counter() - inicio:.2f}s"
+    )
+    for clave, error in sorted(resultado.fallidos.items()):
+        logger.error(f"  No se pudo borrar {clave}: {error}")
+    return resultado
+
+
+def eliminar_prefijo(s3, bucket_name, prefix, filtro=None, solo_nivel_superior=False, simular=None, manifiesto=None):
+    """
+    Borra las claves bajo prefix que cumplan filtro (ver listar_claves y eliminar_claves).
+
+    :return: ResultadoBorrado.
+    """
+    claves = listar_claves(s3, bucket_name, prefix, filtro, solo_nivel_superior)
+    return eliminar_claves(s3, bucket_name, claves, simular, manifiesto)
@@ -0,0 +1,77 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+from config.settings import settings
+
+# Registro de sesiones y clientes del proceso: se crean la primera vez que se piden
+_lock = threading.Lock()
+_sesiones = {}
+_clientes = {}
+
+
+def configuracion_cliente():
+    """Config de botocore común: tamaño del pool de conexiones, reintentos y keep-alive TCP."""
+    return Config(
+        max_pool_connections=settings.AWS_MAX_POOL_CONNECTIONS,
+        retries={'max_attempts': settings.AWS_REINTENTOS, 'mode': settings.AWS_MODO_REINTENTOS},
+        tcp_keepalive=settings.AWS_TCP_KEEPALIVE,
+    )
+
+
+def obtener_sesion(region=None):
+    """Sesión de boto3 con las credenciales de settings, una por región y proceso."""
+    sesion = _sesiones.get(region)
+    if sesion is not None:
+        return sesion
+    with _lock:
+        if region not in _sesiones:
+            _sesiones[region] = boto3.session.Session(
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                region_name=region,
+            )
+        return _sesiones[region]
+
+
+def obtener_cliente(servicio, region=None):
+    """
+    Cliente de boto3 compartido para servicio (y región). Los clientes son seguros entre hilos,
+    así que todo el proceso reutiliza el mismo y su pool de conexiones; crearlo cuesta decenas
+    de milisegundos y cada cliente nuevo abre sus propias conexiones TLS.
+    """
+    clave = (servicio, region)
+    cliente = _clientes.get(clave)
+    if cliente is not None:
+        return cliente
+    sesion = obtener_sesion(region)
+    with _lock:
+        # Las sesiones no son seguras entre hilos: el cliente se crea bajo el lock
+        if clave not in _clientes:
+            _clientes[clave] = sesion.client(servicio, config=configuracion_cliente())
+        return _clientes[clave]
+
+
+def cliente_s3():
+    """Cliente de S3 compartido (ver obtener_cliente)."""
+    return obtener_cliente('s3')
+
+
+def reiniciar_clientes():
+    """Descarta las sesiones y clientes creados; los siguientes se crean de nuevo."""
+    with _lock:
+        _sesiones.clear()
+        _clientes.clear()
+
+
+def _reiniciar_en_hijo():
+    # Un proceso hijo de fork no debe reutilizar las conexiones del padre, y el lock
+    # pudo quedar tomado por un hilo que no existe en el hijo
+    global _lock
+    _lock = threading.Lock()
+    _sesiones.clear()
+    _clientes.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_en_hijo)
@@ -0,0 +1,111 @@
+import gzip
+from io import BytesIO
+from config.settings import settings
+
+
+class Codec:
+    """
+    Compresión de las salidas JSON que se suben a S3.
+
+    - sufijo: se añade a la clave S3 (p. ej. '.json.gz').
+    - content_encoding: valor de ContentEncoding del objeto, o None sin compresión.
+    - abrir_escritura(archivo) devuelve un flujo que comprime hacia archivo; al cerrarlo
+      se vacía el códec pero archivo queda abierto.
+    """
+
+    nombre = 'none'
+    sufijo = ''
+    content_encoding = None
+
+    def abrir_escritura(self, archivo):
+        return _SinCerrar(archivo)
+
+    def comprimir(self, datos):
+        salida = BytesIO()
+        with self.abrir_escritura(salida) as flujo:
+            flujo.write(datos)
+        return salida.getvalue()
+
+    def descomprimir(self, datos):
+        return datos
+
+    def argumentos_subida(self):
+        """ExtraArgs para upload_file / upload_fileobj."""
+        return {'ContentEncoding': self.content_encoding} if self.content_encoding else {}
+
+    def __repr__(self):
+        return f"Codec({self.nombre})"
+
+
+class _SinCerrar:
+    """Envoltorio que no cierra el archivo subyacente al salir del with."""
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+
+    def write(self, datos):
+        return self.archivo.write(datos)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CodecGzip(Codec):
+    nombre = 'gzip'
+    sufijo = '.gz'
+    content_encoding = 'gzip'
+
+    def __init__(self, nivel=None):
+        self.nivel = settings.CODEC_NIVEL_GZIP if nivel is None else nivel
+
+    def abrir_escritura(self, archivo):
+        # GzipFile no cierra un fileobj recibido; mtime=0 para que la salida sea reproducible
+        return gzip.GzipFile(fileobj=archivo, mode='wb', compresslevel=self.nivel, mtime=0)
+
+    def descomprimir(self, datos):
+        return gzip.decompress(datos)
+
+
+class CodecZstd(Codec):
+    nombre = 'zstd'
+    sufijo = '.zst'
+    content_encoding = 'zstd'
+
+    def __init__(self, nivel=None):
+        self.nivel = settings.CODEC_NIVEL_ZSTD if nivel is None else nivel
+        self._zstd = _zstandard()
+
+    def abrir_escritura(self, archivo):
+        return self._zstd.ZstdCompressor(level=self.nivel).stream_writer(archivo, closefd=False)
+
+    def descomprimir(self, datos):
+        return self._zstd.ZstdDecompressor().decompressobj().decompress(datos)
+
+
+def _zstandard():
+    # zstandard solo hace falta con CODEC_SALIDA=zstd
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("CODEC_SALIDA=zstd requiere zstandard (pip install zstandard)") from e
+    return zstandard
+
+
+CODECS = {'none': Codec, 'gzip': CodecGzip, 'zstd': CodecZstd}
+
+
+def obtener_codec(nombre=None):
+    """
+    :param nombre: 'none', 'gzip' o 'zstd' (por defecto settings.CODEC_SALIDA).
+    :return: Instancia de Codec.
+    """
+    nombre = (nombre or settings.CODEC_SALIDA or 'none').lower()
+    if nombre not in CODECS:
+        raise ValueError(f"Códec no soportado: {nombre}. Opciones: {', '.join(CODECS)}")
+    return CODECS[nombre]()
@@ -0,0 +1,164 @@
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+import pandas as pd
+from loguru import logger
+from config.settings import settings
+
+# Cabecera de los TSV de Amazon -> nombre de columna en config/Diccionario.json
+COLUMNAS_ORIGEN = {
+    'dataset date': 'Dataset_date',
+    'territory code': 'Territory_code',
+    'track asin': 'Track_asin',
+    'track isrc': 'Track_isrc',
+    'proprietery track id': 'Proprietery_track_id',
+    'track name': 'Track_name',
+    'track artist': 'Track_artist',
+    'album asin': 'Album_asim',
+    'digital album upc': 'Digital_album_upc',
+    'album name': 'Album_name',
+    'album artist': 'Album_artist',
+    'offline plays': 'Offline_plays',
+    'streams': 'Streams',
+    'timestamp': 'Timestamp',
+    'play duration': 'Play_duration',
+    'subscription plan': 'Subscription_plan',
+    'device type': 'Device_type',
+    'customer id': 'Customer_id',
+    'postal code': 'Postal_code',
+    'stream source': 'Stream_source',
+    'stream source id': 'Stream_source_id',
+    'stream source name': 'Stream_source_name',
+    'track quality': 'Track_quality',
+    'asset type': 'Asset_type'
+}
+
+# Columnas de texto con pocos valores distintos: se cargan como category
+COLUMNAS_CATEGORICAS = {
+    'Territory_code', 'Subscription_plan', 'Device_type', 'Stream_source', 'Track_quality', 'Asset_type'
+}
+
+
+# Identificadores que el diccionario declara "int" pero no son cantidades: como entero perderían
+# los ceros a la izquierda (ZIP, UPC) y harían fallar la lectura con códigos alfanuméricos (UK, CA)
+COLUMNAS_IDENTIFICADORAS = {'Postal_code', 'Digital_album_upc'}
+
+
+class ErrorEsquemaTSV(ValueError):
+    """El TSV no coincide con el esquema de config/Diccionario.json."""
+
+
+@dataclass(frozen=True)
+class EsquemaTSV:
+    """Argumentos de pd.read_csv compilados desde el diccionario, con las columnas en el nombre de la cabecera."""
+    dtype: dict
+    parse_dates: list
+    columnas: frozenset
+    anchos: dict
+
+
+@lru_cache(maxsize=None)
+def cargar_esquema(ruta=None):
+    """
+    Compila config/Diccionario.json en dtype, parse_dates y columnas para pd.read_csv.
+
+    - ["str", ancho] -> category si la columna es de baja cardinalidad, si no str (sin inferencia numérica).
+    - "int" -> Int64 (entero que admite vacíos), salvo los identificadores de COLUMNAS_IDENTIFICADORAS, que se leen como str.
+    - "datetime" / "datetime.date" -> fecha (pd.to_datetime tras la lectura).
+    """
+    with open(ruta or settings.DICCIONARIO_TSV, encoding='utf-8') as f:
+        diccionario = json.load(f)
+
+    cabeceras = {nombre: cabecera for cabecera, nombre in COLUMNAS_ORIGEN.items()}
+    dtype, parse_dates, anchos = {}, [], {}
+    for nombre, tipo in diccionario.items():
+        cabecera = cabeceras.get(nombre, nombre)
+        if isinstance(tipo, list):
+            tipo, anchos[cabecera] = tipo
+        if tipo == 'str':
+            dtype[cabecera] = 'category' if nombre in COLUMNAS_CATEGORICAS else str
+        elif tipo == 'int':
+            dtype[cabecera] = str if nombre in COLUMNAS_IDENTIFICADORAS else 'Int64'
+        elif tipo.startswith('datetime'):
+            parse_dates.append(cabecera)
+        else:
+            raise ErrorEsquemaTSV(f"Tipo no soportado en el diccionario para {nombre}: {tipo}")
+
+    return EsquemaTSV(dtype, parse_dates, frozenset(dtype) | frozenset(parse_dates), anchos)
+
+
+def tipos_salida(esquema=None):
+    """
+    Tipo ('str', 'int' o 'datetime') de cada columna del diccionario con el nombre que lleva
+    tras transformar_datos (COLUMNAS_ORIGEN en mayúsculas), para fijar el esquema de las salidas.
+    """
+    esquema = esquema or cargar_esquema()
+    tipos = {}
+    for cabecera, tipo in esquema.dtype.items():
+        tipos[COLUMNAS_ORIGEN.get(cabecera, cabecera).upper()] = 'int' if tipo == 'Int64' else 'str'
+    for cabecera in esquema.parse_dates:
+        tipos[COLUMNAS_ORIGEN.get(cabecera, cabecera).upper()] = 'datetime'
+    return tipos
+
+
+def leer_tsv_tipado(origen, esquema=None, estricto=None, chunksize=None):
+    """
+    Lee un TSV con los tipos del diccionario en lugar de inferirlos fila a fila.
+    Las columnas que no están en el diccionario se descartan y las que faltan se avisan;
+    un valor que no encaja con su tipo hace fallar la lectura.
+
+    :param origen: Ruta local del TSV o un objeto tipo archivo.
+    :param estricto: Si es True (por defecto settings.TSV_ESQUEMA_ESTRICTO) cualquier diferencia
+                     de columnas o un texto más largo que su ancho lanza ErrorEsquemaTSV.
+    :param chunksize: Si se pasa, devuelve un iterador de DataFrames de como mucho chunksize filas.
+    :return: DataFrame (o iterador de DataFrames) con las columnas de la cabecera original.
+    """
+    esquema = esquema or cargar_esquema()
+    estricto = settings.TSV_ESQUEMA_ESTRICTO if estricto is None else estricto
+
+    # pandas puede evaluar usecols más de una vez por columna
+    desconocidas = set()
+
+    def conocida(columna):
+        if columna in esquema.columnas:
+            return True
+        desconocidas.add(columna)
+        return False
+
+    lector = pd.read_csv(origen, delimiter='\t', usecols=conocida, dtype=esquema.dtype, chunksize=chunksize)
+    if chunksize is None:
+        return _validar(lector, esquema, estricto, desconocidas)
+    # Las columnas se comprueban solo en el primer bloque; los anchos, en todos
+    return (
+        _validar(bloque, esquema, estricto, desconocidas, columnas=(numero == 0))
+        for numero, bloque in enumerate(lector)
+    )
+
+
+def _validar(df, esquema, estricto, desconocidas, columnas=True):
+    """Convierte las fechas y comprueba el DataFrame contra el esquema (ver leer_tsv_tipado)."""
+    # Las fechas se convierten después de leer: parse_dates falla si la columna no viene en el archivo
+    for columna in esquema.parse_dates:
+        if columna in df.columns:
+            df[columna] = pd.to_datetime(df[columna])
+
+    problemas = []
+    if columnas:
+        faltantes = sorted(esquema.columnas - set(df.columns))
+        if desconocidas:
+            problemas.append(f"columnas fuera del diccionario (descartadas): {sorted(desconocidas)}")
+        if faltantes:
+            problemas.append(f"columnas del diccionario ausentes: {faltantes}")
+    if estricto:
+        for columna, ancho in esquema.anchos.items():
+            if columna in df.columns:
+                excedidos = int((df[columna].astype('string').str.len() > ancho).sum())
+                if excedidos:
+                    problemas.append(f"{excedidos} valores de '{columna}' superan el ancho {ancho}")
+
+    if problemas:
+        mensaje = "Diferencias con el esquema del TSV: " + "; ".join(problemas)
+        if estricto:
+            raise ErrorEsquemaTSV(mensaje)
+        logger.warning(mensaje)
+    return df
@@ -1,36 +1,160 @@
 import os
+import posixpath
+from collections import namedtuple
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from loguru import logger
+from .ventana_fechas import extraer_fecha
 
-def compare_structures(s3_files, sftp_files, sftp_base_path='/cxp-reporting/ZQLUC/sales'):
+# Máximo de entradas de ejemplo que se escriben en el log por categoría
+MAX_ENTRADAS_LOG = 20
+# Margen para diferencias de reloj entre el servidor SFTP y S3 al comparar fechas
+TOLERANCIA_MTIME_SEGUNDOS = 300
+
+ClaveArchivo = namedtuple('ClaveArchivo', ['territorio', 'servicio', 'fecha', 'nombre'])
+
+
+@dataclass
+class EntradaComparacion:
+    clave: ClaveArchivo
+    ruta_sftp: str = None
+    ruta_relativa: str = None
+    ruta_s3: str = None
+    tamano_sftp: int = None
+    tamano_s3: int = None
+    mtime_sftp: int = None
+    fecha_s3: datetime = None
+
+
+@dataclass
+class ResultadoComparacion:
+    """
+    Diferencias entre SFTP y S3.
+
+    - faltantes: presentes en SFTP y ausentes en S3.
+    - sobrantes: presentes en S3 y ausentes del listado SFTP comparado.
+    - tamano_distinto: presentes en ambos lados con distinto tamaño (si se conocen los tamaños).
+    - reemitidos: mismo tamaño, pero modificados en SFTP después de subirse a S3.
+    """
+    faltantes: list = field(default_factory=list)
+    sobrantes: list = field(default_factory=list)
+    tamano_distinto: list = field(default_factory=list)
+    reemitidos: list = field(default_factory=list)
+
+    def modificados(self):
+        """Archivos presentes en S3 cuyo contenido en SFTP cambió."""
+        return self.tamano_distinto + self.reemitidos
+
+    def a_descargar(self):
+        """Archivos que hay que (volver a) traer del SFTP: faltantes y modificados."""
+        return self.faltantes + self.modificados()
+
+    def __bool__(self):
+        return bool(self.faltantes or self.tamano_distinto or self.reemitidos)
+
+
+def clave_archivo(nombre_archivo):
+    """
+    Construye la clave (territorio, servicio, fecha, nombre) a partir del nombre del archivo.
+    Todos los campos salen del nombre, no de la ruta, para que la misma clave se obtenga
+    en SFTP y en S3 aunque las carpetas difieran (p. ej. ROW_NA frente a NA).
     """
-    Compara las estructuras de archivos entre S3 y SFTP y detecta archivos faltantes en S3.
+    nombre = posixpath.basename(nombre_archivo)
+    partes = nombre.replace('.zip', '').replace('.txt', '').split('_')
+    territorio = servicio = None
+    if 'AmazonMP3' in nombre and len(partes) >= 4:
+        territorio = partes[-3]
+        servicio = partes[2]
+    return ClaveArchivo(territorio, servicio, extraer_fecha(nombre), nombre)
+
+
+def _registrar_muestra(titulo, entradas, descripcion):
+    if not entradas:
+        return
+    logger.info(f"{titulo}: {len(entradas)}")
+    for entrada in entradas[:MAX_ENTRADAS_LOG]:
+        logger.info(f"  {descripcion(entrada)}")
+    if len(entradas) > MAX_ENTRADAS_LOG:
+        logger.info(f"  ... y {len(entradas) - MAX_ENTRADAS_LOG} más")
+
+
+def compare_structures(s3_files, sftp_files, sftp_base_path='/cxp-reporting/ZQLUC/sales', tamanos_sftp=None, tamanos_s3=None,
+                       mtimes_sftp=None, fechas_s3=None):
+    """
+    Compara las estructuras de archivos entre S3 y SFTP con un único índice por clave
+    (territorio, servicio, fecha, nombre) para cada lado.
     Omite archivos cuyo nombre contenga "Summary_Statement".
-    
-    :param s3_files: Lista de archivos en S3.
+
+    :param s3_files: Lista de claves en S3.
     :param sftp_files: Lista de archivos en SFTP.
     :param sftp_base_path: Ruta base en SFTP para extraer la ruta relativa.
-    :return: Conjunto de archivos faltantes en S3.
+    :param tamanos_sftp: Diccionario opcional {ruta SFTP: tamaño en bytes}.
+    :param tamanos_s3: Diccionario opcional {clave S3: tamaño en bytes}. Las claves se emparejan por nombre
+                       de archivo, así que pueden ser de otro prefijo que s3_files (p. ej. la landing zone,
+                       que es donde se vuelven a subir los zips modificados).
+    :param mtimes_sftp: Diccionario opcional {ruta SFTP: st_mtime (epoch)}.
+    :param fechas_s3: Diccionario opcional {clave S3: LastModified (datetime)}, emparejadas igual que tamanos_s3.
+    :return: ResultadoComparacion con los archivos faltantes, sobrantes, de tamaño distinto y reemitidos.
     """
-    # Excluir archivos con "Summary_Statement" en el nombre
-    sftp_files_filtered = [file for file in sftp_files if "Summary_Statement" not in os.path.basename(file)]
-    
-    # Extraer las rutas relativas de los archivos en SFTP
-    sftp_relative_paths = {os.path.relpath(file, sftp_base_path).replace("\\", "/") for file in sftp_files_filtered}
-    logger.info(f"Rutas relativas en SFTP: {sftp_relative_paths}")
-
-    # Extraer los nombres de archivos de S3
-    s3_filenames = {os.path.basename(file) for file in s3_files}
-    logger.info(f"Archivos en S3: {s3_filenames}")
-
-    # Archivos que están en SFTP pero no en S3
-    missing_in_s3 = {file for file in sftp_relative_paths if os.path.basename(file) not in s3_filenames}
-
-    if missing_in_s3:
-        logger.info("Archivos presentes en SFTP pero faltantes en S3:")
-        for item in sorted(missing_in_s3):
-            logger.info(item)
+    tamanos_sftp = tamanos_sftp or {}
+    tamanos_s3 = {clave_archivo(ruta): tamano for ruta, tamano in (tamanos_s3 or {}).items()}
+    mtimes_sftp = mtimes_sftp or {}
+    fechas_s3 = {clave_archivo(ruta): fecha for ruta, fecha in (fechas_s3 or {}).items()}
+
+    indice_s3 = {}
+    for ruta_s3 in s3_files:
+        indice_s3.setdefault(clave_archivo(ruta_s3), ruta_s3)
+
+    resultado = ResultadoComparacion()
+    vistas = set()
+    for ruta_sftp in sftp_files:
+        nombre = posixpath.basename(ruta_sftp)
+        # Excluir archivos con "Summary_Statement" en el nombre
+        if "Summary_Statement" in nombre:
+            continue
+
+        clave = clave_archivo(nombre)
+        vistas.add(clave)
+        entrada = EntradaComparacion(
+            clave=clave,
+            ruta_sftp=ruta_sftp,
+            ruta_relativa=os.path.relpath(ruta_sftp, sftp_base_path).replace("\\", "/"),
+            tamano_sftp=tamanos_sftp.get(ruta_sftp),
+            mtime_sftp=mtimes_sftp.get(ruta_sftp),
+        )
+
+        ruta_s3 = indice_s3.get(clave)
+        if ruta_s3 is None:
+            resultado.faltantes.append(entrada)
+            continue
+
+        entrada.ruta_s3 = ruta_s3
+        entrada.tamano_s3 = tamanos_s3.get(clave)
+        entrada.fecha_s3 = fechas_s3.get(clave)
+        if entrada.tamano_sftp is not None and entrada.tamano_s3 is not None and entrada.tamano_sftp != entrada.tamano_s3:
+            resultado.tamano_distinto.append(entrada)
+        elif (entrada.mtime_sftp is not None and entrada.fecha_s3 is not None
+              and entrada.mtime_sftp > entrada.fecha_s3.timestamp() + TOLERANCIA_MTIME_SEGUNDOS):
+            resultado.reemitidos.append(entrada)
+
+    resultado.sobrantes = [
+        EntradaComparacion(clave=clave, ruta_s3=ruta_s3, tamano_s3=tamanos_s3.get(clave))
+        for clave, ruta_s3 in indice_s3.items() if clave not in vistas
+    ]
+
+    resultado.faltantes.sort(key=lambda entrada: entrada.ruta_relativa)
+    if resultado.faltantes:
+        _registrar_muestra("Archivos presentes en SFTP pero faltantes en S3", resultado.faltantes, lambda e: e.ruta_relativa)
     else:
         logger.info("Todos los archivos en SFTP están presentes en S3.")
+    _registrar_muestra(
+        "Archivos con tamaño distinto entre SFTP y S3", resultado.tamano_distinto,
+        lambda e: f"{e.ruta_relativa} (SFTP {e.tamano_sftp} B, S3 {e.tamano_s3} B)"
+    )
+    _registrar_muestra(
+        "Archivos modificados en SFTP después de subirse a S3", resultado.reemitidos,
+        lambda e: f"{e.ruta_relativa} (SFTP {datetime.fromtimestamp(e.mtime_sftp, timezone.utc).isoformat()}, S3 {e.fecha_s3.isoformat()})"
+    )
+    logger.info(f"Archivos en S3 sin contraparte en el listado SFTP: {len(resultado.sobrantes)}")
 
-    return missing_in_s3
-
+    return resultado
@@ -1,15 +1,17 @@
 import posixpath
+import tempfile
+from contextlib import nullcontext
 import pandas as pd
-import zipfile
 import os
-import boto3
 from loguru import logger
 from config.settings import settings
-from io import StringIO
-
-
-# Inicializar el cliente de S3
-s3_client = boto3.client('s3', aws_access_key_id=settings.AWS_ACCESS_KEY_ID, aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY)
+from .clientes_aws import cliente_s3
+from .esquema_tsv import COLUMNAS_ORIGEN, leer_tsv_tipado
+from .salida_parquet import EscritorParquet, clave_parquet
+from .compresion import Codec, obtener_codec
+from .serializador_json import escribir_array_json, escribir_ndjson
+from .subida_multiparte import SubidaMultiparte
+from .borrado_s3 import eliminar_prefijo
 
 def transformar_datos(df):
     """
@@ -18,100 +20,266 @@ def transformar_datos(df):
     :return: DataFrame transformado, o None en caso de error.
     """
     try:
-        df = df.rename(columns={
-            'dataset date': 'Dataset_date',
-            'territory code': 'Territory_code',
-            'track asin': 'Track_asin',
-            'track isrc': 'Track_isrc',
-            'proprietery track id': 'Proprietery_track_id',
-            'track name': 'Track_name',
-            'track artist': 'Track_artist',
-            'album asin': 'Album_asim',
-            'digital album upc': 'Digital_album_upc',
-            'album name': 'Album_name',
-            'album artist': 'Album_artist',
-            'offline plays': 'Offline_plays',
-            'streams': 'Streams',
-            'timestamp': 'Timestamp',
-            'play duration': 'Play_duration',
-            'subscription plan': 'Subscription_plan',
-            'device type': 'Device_type',
-            'customer id': 'Customer_id',
-            'postal code': 'Postal_code',
-            'stream source': 'Stream_source',
-            'stream source id': 'Stream_source_id',
-            'stream source name': 'Stream_source_name',
-            'track quality': 'Track_quality',
-            'asset type': 'Asset_type'
-        })
+        df = df.rename(columns=COLUMNAS_ORIGEN)
         df = df.rename(columns=lambda x: x.upper())
         return df
     except Exception as e:
         logger.error(f"Error al transformar los datos: {e}")
         return None
 
-def validar_y_eliminar_archivos_nivel_superior(bucket_name, prefix):
+def validar_y_eliminar_archivos_nivel_superior(bucket_name, prefix, simular=None):
     """
     Elimina los archivos que están en el nivel del prefijo, sin afectar las subcarpetas.
+    Recorre todas las páginas del prefijo y borra en lotes con delete_objects (ver borrado_s3).
     
     :param bucket_name: El nombre del bucket de S3.
     :param prefix: El prefijo donde buscar archivos en el nivel superior.
+    :param simular: Si es True solo se registran los archivos que se borrarían (por defecto settings.S3_BORRADO_SIMULADO).
+    :return: ResultadoBorrado.
     """
-    # Listar todos los objetos dentro del prefijo
-    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-    
-    if 'Contents' not in response:
-        print("No se encontraron archivos en el prefijo especificado.")
-        return
+    resultado = eliminar_prefijo(cliente_s3(), bucket_name, prefix, solo_nivel_superior=True, simular=simular)
+    if not resultado.eliminados and not resultado.fallidos:
+        logger.info("No se encontraron archivos en el nivel superior del prefijo especificado.")
+    for key in resultado.eliminados:
+        logger.debug(f"{'Se eliminaría' if resultado.simulado else 'Eliminado'} archivo en el nivel superior: {key}")
+    return resultado
 
-    # Recorrer los objetos y eliminar los archivos que estén en el nivel superior
-    for obj in response['Contents']:
-        key = obj['Key']
-        
-        # Verificar si el objeto está en el nivel superior (sin entrar a las carpetas)
-        if '/' not in key[len(prefix):]:  # Si no hay más subniveles después del prefijo
-            print(f"Eliminando archivo en el nivel superior: {key}")
-            s3_client.delete_object(Bucket=bucket_name, Key=key)
+def existe_en_s3(s3, bucket, ruta_s3, indice_existentes=None):
+    """
+    Indica si ruta_s3 ya existe en el bucket.
+    Usa el índice de existencia si se pasa y está vigente; si no, consulta S3 con head_object.
 
+    :param indice_existentes: Conjunto de claves, vista del manifiesto o IndiceExistenciaS3.
+    """
+    if indice_existentes is not None:
+        esta_vigente = getattr(indice_existentes, 'esta_vigente', None)
+        if esta_vigente is None or esta_vigente():
+            return ruta_s3 in indice_existentes
+        logger.info(f"Índice de existencia caducado, consultando S3 para {ruta_s3}")
 
-def upload_and_transform_txt_files_to_s3(archivo_txt, bucket, s3_prefix_raw, ruta_local_base):
     try:
-        # Leer el archivo TXT
-        df = pd.read_csv(archivo_txt, delimiter='\t')
+        s3.head_object(Bucket=bucket, Key=ruta_s3)
+        return True
+    except s3.exceptions.ClientError as e:
+        if e.response['Error']['Code'] == '404':
+            return False
+        raise
 
-        # Transformar los datos
-        df_transformado = transformar_datos(df)
-        if df_transformado is None:
-            logger.error(f"Error al transformar los datos para el archivo: {archivo_txt}")
-            return
 
-        # Obtener la ruta relativa del archivo respecto a la carpeta local base
-        ruta_relativa = os.path.relpath(archivo_txt, ruta_local_base).replace("\\", "/")
+def leer_y_transformar_tsv(origen):
+    """
+    Lee un TSV (ruta local u objeto tipo archivo) y aplica transformar_datos.
+
+    :return: DataFrame transformado, o None si la transformación falla.
+    """
+    # Leer el archivo TXT (con los tipos de config/Diccionario.json si está activado)
+    if settings.TSV_LECTURA_TIPADA:
+        df = leer_tsv_tipado(origen)
+    else:
+        df = pd.read_csv(origen, delimiter='\t')
+
+    # Transformar los datos
+    return transformar_datos(df)
+
+
+def _bloques_transformados(origen, filas_por_bloque=None):
+    """Genera el TSV transformado en DataFrames de como mucho filas_por_bloque filas (todo junto si es 0)."""
+    if settings.TSV_LECTURA_TIPADA:
+        bloques = leer_tsv_tipado(origen, chunksize=filas_por_bloque or None)
+    else:
+        bloques = pd.read_csv(origen, delimiter='\t', chunksize=filas_por_bloque or None)
+    if not filas_por_bloque:
+        bloques = [bloques]
+
+    filas = 0
+    for bloque in bloques:
+        bloque = transformar_datos(bloque)
+        if bloque is None:
+            raise ValueError(f"Error al transformar el bloque que empieza en la fila {filas}")
+        filas += len(bloque)
+        yield bloque
+
+
+def escribir_json_por_bloques(origen, destino, filas_por_bloque=None):
+    """
+    Transforma un TSV por bloques de filas y escribe el resultado en destino como NDJSON
+    (un registro por línea) o, con settings.JSON_LINEAS desactivado, como un único array JSON
+    (orient='records'), de modo que la memoria no depende del tamaño del archivo.
+    Los bytes pasan por el códec de settings.CODEC_SALIDA a medida que se escriben.
+
+    :param origen: Ruta local del TSV o un objeto tipo archivo.
+    :param destino: Ruta local del JSON a escribir, o un objeto tipo archivo binario escribible
+                    (p. ej. una SubidaMultiparte), que no se cierra.
+    :param filas_por_bloque: Filas por bloque (por defecto settings.TSV_FILAS_POR_BLOQUE).
+    :return: Número de filas escritas.
+    """
+    filas = 0
+    archivo_destino = open(destino, 'wb') if isinstance(destino, str) else nullcontext(destino)
+    with archivo_destino as archivo, codec_salida().abrir_escritura(archivo) as salida:
+        if not settings.JSON_LINEAS:
+            salida.write(b'[')
+        for bloque in _bloques_transformados(origen, filas_por_bloque or settings.TSV_FILAS_POR_BLOQUE):
+            if bloque.empty:
+                continue
+            if settings.JSON_LINEAS:
+                escribir_ndjson(bloque, salida, date_format='iso')
+            else:
+                # Los registros de cada bloque se encadenan con comas dentro del mismo array
+                escribir_array_json(bloque, salida, date_format='iso', primero=not filas)
+            filas += len(bloque)
+        if not settings.JSON_LINEAS:
+            salida.write(b']')
+    return filas
+
+
+def escribir_parquet(origen, destino):
+    """
+    Transforma un TSV y lo escribe en destino como Parquet (ver EscritorParquet),
+    por bloques si settings.TSV_FILAS_POR_BLOQUE lo indica.
+
+    :return: Número de filas escritas.
+    """
+    with EscritorParquet(destino) as escritor:
+        for bloque in _bloques_transformados(origen, settings.TSV_FILAS_POR_BLOQUE):
+            escritor.escribir(bloque)
+    return escritor.filas
+
+
+def escribir_salida(origen, destino):
+    """Transforma un TSV y lo escribe en destino en el formato de settings.FORMATO_SALIDA."""
+    if settings.FORMATO_SALIDA == 'parquet':
+        return escribir_parquet(origen, destino)
+    return escribir_json_por_bloques(origen, destino)
+
+
+def codec_salida():
+    """Códec de settings.CODEC_SALIDA para la salida JSON; el Parquet ya se comprime internamente."""
+    if settings.FORMATO_SALIDA == 'parquet':
+        return Codec()
+    return obtener_codec()
 
-        # Definir la ruta del archivo JSON en S3 manteniendo la estructura de carpetas
-        nombre_archivo_json = os.path.basename(archivo_txt).replace('.txt', '.json')
-        ruta_s3 = posixpath.join(s3_prefix_raw, os.path.dirname(ruta_relativa), nombre_archivo_json)
 
-        # Inicializar el cliente S3
-        s3 = boto3.client('s3', aws_access_key_id=settings.AWS_ACCESS_KEY_ID, aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY)
+def argumentos_subida():
+    """ExtraArgs de S3 para subir la salida (ContentEncoding si va comprimida)."""
+    return codec_salida().argumentos_subida()
 
-        # Verificar si el archivo ya existe en S3
+
+def extension_salida():
+    """
+    Sufijo de la salida publicada. El NDJSON lleva '.ndjson' y el array JSON '.json', para que
+    quien lea una clave sepa qué formato contiene sin abrirla.
+    """
+    if settings.FORMATO_SALIDA == 'parquet':
+        return '.parquet'
+    return ('.ndjson' if settings.JSON_LINEAS else '.json') + codec_salida().sufijo
+
+
+def clave_salida(carpeta_relativa, nombre_txt, prefijo_json=None):
+    """
+    Clave S3 donde se publica un TSV transformado.
+
+    :param carpeta_relativa: Carpeta <pais>/Daily/<servicio> del TSV.
+    :param nombre_txt: Nombre del TSV.
+    :param prefijo_json: Prefijo para la salida JSON (por defecto settings.S3_PREFIX_RAW).
+    :return: <prefijo_json>/<carpeta_relativa>/<nombre>.ndjson[.gz|.zst] (.json si settings.JSON_LINEAS
+             está desactivado), o la clave con particiones Hive
+             bajo settings.S3_PREFIX_PARQUET si FORMATO_SALIDA es parquet.
+    """
+    if settings.FORMATO_SALIDA == 'parquet':
+        return clave_parquet(settings.S3_PREFIX_PARQUET, carpeta_relativa, nombre_txt)
+    nombre_json = posixpath.basename(nombre_txt).replace('.txt', extension_salida())
+    return posixpath.join(prefijo_json or settings.S3_PREFIX_RAW, carpeta_relativa, nombre_json)
+
+
+def transformar_y_subir_tsv(origen, bucket, ruta_s3, indice_existentes=None, sobrescribir=False, transformador=None):
+    """
+    Lee un TSV, lo transforma y lo sube a S3 (JSON o Parquet) en ruta_s3, salvo que ya exista.
+
+    En el propio proceso, el JSON se sube desde memoria con una SubidaMultiparte a medida que se
+    serializa cada bloque, así que no pasa por disco y varias llamadas pueden ejecutarse a la vez.
+
+    :param origen: Ruta local del TSV o un objeto tipo archivo (p. ej. un miembro de un zip abierto).
+    :param bucket: Bucket de destino.
+    :param ruta_s3: Clave de destino del JSON.
+    :param indice_existentes: Índice opcional de claves ya presentes (ver existe_en_s3).
+    :param sobrescribir: Si es True se sube aunque el JSON ya exista (origen modificado en SFTP).
+    :param transformador: TransformadorProcesos opcional; si se pasa y origen es una ruta local, la
+                          lectura y la serialización se hacen en su pool de procesos. Un objeto tipo
+                          archivo se transforma siempre en el propio proceso, para no copiarlo a disco.
+                          Con FORMATO_SALIDA=parquet o con el pool, la salida se escribe a un
+                          temporal en disco (ver escribir_salida) y se sube desde ahí.
+    :return: True si se subió el JSON; False si ya existía o la transformación falló.
+    """
+    # Cliente S3 compartido del proceso
+    s3 = cliente_s3()
+    # Los procesos solo reciben rutas: un miembro de un zip abierto se transforma aquí mismo
+    if not isinstance(origen, str):
+        transformador = None
+
+    # Verificar si el archivo ya existe en S3 antes de leer y transformar
+    if not sobrescribir and existe_en_s3(s3, bucket, ruta_s3, indice_existentes):
+        logger.info(f"El archivo ya existe en S3: s3://{bucket}/{ruta_s3}, no se subirá nuevamente.")
+        return False
+    if sobrescribir:
+        logger.info(f"Origen modificado en SFTP, se sobrescribirá: {ruta_s3}")
+    else:
+        logger.info(f"El archivo no existe en S3, procediendo con la carga: {ruta_s3}")
+
+    if settings.FORMATO_SALIDA == 'parquet' or transformador is not None:
+        # El Parquet, y la salida de los procesos, se escribe en un temporal propio y se sube desde ahí
+        descriptor, ruta_salida = tempfile.mkstemp(suffix=extension_salida())
+        os.close(descriptor)
         try:
-            s3.head_object(Bucket=bucket, Key=ruta_s3)
-            logger.info(f"El archivo ya existe en S3: s3://{bucket}/{ruta_s3}, no se subirá nuevamente.")
-            return  # Si el archivo ya existe, salir de la función
-        except s3.exceptions.ClientError as e:
-            if e.response['Error']['Code'] == '404':
-                logger.info(f"El archivo no existe en S3, procediendo con la carga: {ruta_s3}")
+            if transformador is not None:
+                transformador.transformar(origen, ruta_salida)
             else:
-                raise
+                escribir_salida(origen, ruta_salida)
+            s3.upload_file(ruta_salida, bucket, ruta_s3, ExtraArgs=argumentos_subida())
+        finally:
+            os.remove(ruta_salida)
+        if hasattr(indice_existentes, 'agregar'):
+            indice_existentes.agregar(ruta_s3)
+        return True
+
+    with SubidaMultiparte(s3, bucket, ruta_s3, argumentos=argumentos_subida()) as subida:
+        # Cada bloque se serializa y comprime (según settings.CODEC_SALIDA) directamente en las partes de la subida
+        try:
+            escribir_json_por_bloques(origen, subida)
+        except ValueError as e:
+            logger.error(f"Error al transformar los datos para: {ruta_s3}: {e}")
+            subida.abortar()
+            return False
+
+    if hasattr(indice_existentes, 'agregar'):
+        indice_existentes.agregar(ruta_s3)
+    return True
 
-        # Subir el DataFrame transformado a S3 como JSON
-        with open("/tmp/temp.json", 'w') as f:
-            df_transformado.to_json(f, orient='records')
 
-        #logger.info(f"Subiendo {archivo_txt} como JSON a s3://{bucket}/{ruta_s3}")
-        s3.upload_file('/tmp/temp.json', bucket, ruta_s3)
+def upload_and_transform_txt_files_to_s3(archivo_txt, bucket, s3_prefix_raw, ruta_local_base, indice_existentes=None, sobrescribir=False,
+                                         transformador=None):
+    """
+    Transforma un archivo TXT (TSV) a JSON y lo sube a S3 manteniendo la estructura de carpetas.
+    main ya no la llama (la etapa de transformación de pipeline_diario hace lo mismo por elemento);
+    se conserva para procesar a mano los .txt de un directorio local.
+
+    :param archivo_txt: Ruta local del archivo .txt.
+    :param bucket: Bucket de destino.
+    :param s3_prefix_raw: Prefijo de destino en S3.
+    :param ruta_local_base: Carpeta local base para calcular la ruta relativa.
+    :param indice_existentes: Índice opcional de claves ya presentes bajo s3_prefix_raw
+                              (set, vista del manifiesto o IndiceExistenciaS3) para evitar un HEAD por archivo.
+    :param sobrescribir: Si es True se sube aunque el JSON ya exista (origen modificado en SFTP).
+    :param transformador: TransformadorProcesos opcional para transformar en un pool de procesos.
+    """
+    try:
+        # Obtener la ruta relativa del archivo respecto a la carpeta local base
+        ruta_relativa = os.path.relpath(archivo_txt, ruta_local_base).replace("\\", "/")
+
+        # Definir la ruta de salida en S3 manteniendo la estructura de carpetas (o las particiones Parquet)
+        ruta_s3 = clave_salida(posixpath.dirname(ruta_relativa), os.path.basename(archivo_txt), s3_prefix_raw)
+
+        if not transformar_y_subir_tsv(archivo_txt, bucket, ruta_s3, indice_existentes, sobrescribir, transformador=transformador):
+            return
 
         # Eliminar el archivo TXT original si todo fue exitoso
         os.remove(archivo_txt)
@@ -119,5 +287,3 @@ def upload_and_transform_txt_files_to_s3(archivo_txt, bucket, s3_prefix_raw, rut
 
     except Exception as e:
         logger.error(f"Error procesando el archivo {archivo_txt}: {e}")
-
-
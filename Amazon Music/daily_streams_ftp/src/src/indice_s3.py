@@ -0,0 +1,50 @@
+import time
+from datetime import datetime, timezone
+from loguru import logger
+from config.settings import settings
+from .s3_utils import list_s3_files
+
+
+class IndiceExistenciaS3:
+    """
+    Conjunto de claves de un prefijo de S3, cargado una sola vez para resolver
+    "¿ya existe este archivo?" sin un head_object por archivo.
+    Pasado settings.S3_INDICE_MAX_ANTIGUEDAD segundos se considera caducado y
+    los llamadores vuelven a consultar S3 directamente.
+    """
+
+    def __init__(self, bucket, prefijo, claves, cargado_en=None, max_antiguedad=None):
+        self.bucket = bucket
+        self.prefijo = prefijo
+        self._claves = set(claves)
+        self.cargado_en = datetime.now(timezone.utc) if cargado_en is None else cargado_en
+        self.max_antiguedad = settings.S3_INDICE_MAX_ANTIGUEDAD if max_antiguedad is None else max_antiguedad
+
+    @classmethod
+    def desde_listado(cls, bucket, prefijo):
+        inicio = time.perf_counter()
+        indice = cls(bucket, prefijo, list_s3_files(bucket, prefijo))
+        logger.info(f"Índice de existencia s3://{bucket}/{prefijo}: {len(indice)} claves en {time.perf_counter() - inicio:.2f}s")
+        return indice
+
+    @classmethod
+    def desde_manifiesto(cls, manifiesto, bucket, prefijo):
+        refrescado_en = manifiesto.refrescado_en(bucket, prefijo)
+        if refrescado_en is None:
+            # Un prefijo que nunca se refrescó no dice nada de S3: el índice nace caducado y se consulta S3
+            logger.warning(f"El manifiesto nunca refrescó s3://{bucket}/{prefijo}; el índice de existencia se trata como caducado")
+            refrescado_en = datetime.min.replace(tzinfo=timezone.utc)
+        return cls(bucket, prefijo, manifiesto.claves(bucket, prefijo), cargado_en=refrescado_en)
+
+    def esta_vigente(self):
+        antiguedad = (datetime.now(timezone.utc) - self.cargado_en).total_seconds()
+        return antiguedad <= self.max_antiguedad
+
+    def agregar(self, clave, tamano=None):
+        self._claves.add(clave)
+
+    def __contains__(self, clave):
+        return clave in self._claves
+
+    def __len__(self):
+        return len(self._claves)
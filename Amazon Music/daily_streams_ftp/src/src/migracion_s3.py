@@ -0,0 +1,194 @@
+"""
+Migraciones masivas de claves S3 en dos pasos:
+
+1. plan: un único listado del prefijo genera un archivo JSONL con los pares origen -> destino.
+2. apply: copia, verifica y borra los pares del plan por tandas con un pool de hilos,
+   anotando cada par terminado en un diario local. Si se interrumpe, volver a aplicar
+   el mismo plan continúa donde se quedó, sin volver a listar S3.
+
+Uso:
+    python -m src.migracion_s3 plan --bucket B --mover src/sales/NA/ src/sales/ROW_NA/ --plan plan.jsonl
+    python -m src.migracion_s3 apply --plan plan.jsonl
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+from loguru import logger
+from config.settings import settings
+from .clientes_aws import cliente_s3
+from .mover_s3 import ParMovimiento, ResultadoMovimiento, aplicar_movimiento, clave_destino
+
+
+def destino_por_prefijos(movimientos):
+    """
+    Función clave -> clave destino para una lista de movimientos de prefijo.
+
+    :param movimientos: Lista de (prefijo_origen, prefijo_destino); gana el primer prefijo que coincide.
+    """
+    def destino_de(clave):
+        for prefijo_origen, prefijo_destino in movimientos:
+            if clave.startswith(prefijo_origen):
+                return clave_destino(clave, prefijo_origen, prefijo_destino)
+        return None
+    return destino_de
+
+
+def generar_plan(s3, bucket_name, prefix, destino_de, ruta_plan):
+    """
+    Lista prefix una sola vez y escribe el plan de la migración.
+
+    :param destino_de: Función clave -> clave destino, o None si la clave no se mueve.
+    :param ruta_plan: Archivo JSONL: una cabecera con el bucket y una línea por par.
+    :return: Número de pares del plan.
+    """
+    pares = 0
+    temporal = f"{ruta_plan}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        archivo.write(json.dumps({'bucket': bucket_name, 'prefijo': prefix, 'creado': datetime.now(timezone.utc).isoformat()}) + '\n')
+        paginator = s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                destino = destino_de(obj['Key'])
+                if destino is None or destino == obj['Key']:
+                    continue
+                par = ParMovimiento(obj['Key'], destino, obj['Size'], obj.get('ETag'))
+                archivo.write(json.dumps(par._asdict()) + '\n')
+                pares += 1
+    # El plan solo aparece completo: un plan a medias no debe poder aplicarse
+    os.replace(temporal, ruta_plan)
+    logger.info(f"Plan de migración con {pares} pares de s3://{bucket_name}/{prefix} escrito en {ruta_plan}")
+    return pares
+
+
+def leer_plan(ruta_plan):
+    """:return: Tupla (bucket, lista de ParMovimiento)."""
+    with open(ruta_plan, encoding='utf-8') as archivo:
+        cabecera = json.loads(archivo.readline())
+        pares = [ParMovimiento(**json.loads(linea)) for linea in archivo if linea.strip()]
+    return cabecera['bucket'], pares
+
+
+def ruta_diario_por_defecto(ruta_plan):
+    return f"{ruta_plan}.diario"
+
+
+def leer_diario(ruta_diario):
+    """Claves de origen ya migradas según el diario (ignora una última línea cortada)."""
+    completados = set()
+    if not os.path.exists(ruta_diario):
+        return completados
+    with open(ruta_diario, encoding='utf-8') as archivo:
+        for linea in archivo:
+            try:
+                completados.add(json.loads(linea)['origen'])
+            except (ValueError, KeyError):
+                logger.warning(f"Línea ilegible en el diario {ruta_diario}, se ignora: {linea.strip()[:100]}")
+    return completados
+
+
+def _anotar(diario, pares):
+    for par in pares:
+        diario.write(json.dumps({'origen': par.origen, 'destino': par.destino}) + '\n')
+    diario.flush()
+    os.fsync(diario.fileno())
+
+
+def _ya_migrado(s3, bucket_name, par):
+    """
+    Un par falla al copiarse si su origen ya se borró en una ejecución interrumpida antes de
+    anotarlo en el diario: cuenta como migrado si el origen ya no existe y el destino tiene su tamaño.
+    """
+    try:
+        s3.head_object(Bucket=bucket_name, Key=par.origen)
+        return False
+    except s3.exceptions.ClientError as e:
+        if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+    try:
+        return s3.head_object(Bucket=bucket_name, Key=par.destino)['ContentLength'] == par.tamano
+    except s3.exceptions.ClientError:
+        return False
+
+
+def aplicar_plan(ruta_plan, ruta_diario=None, max_workers=None, tamano_tanda=None, s3=None):
+    """
+    Aplica un plan de migración por tandas (ver mover_s3.aplicar_movimiento) y anota en el diario
+    cada par cuyo origen ya se borró. Los pares anotados se omiten, así que un plan interrumpido
+    se reanuda llamando de nuevo con el mismo plan y diario.
+
+    :param ruta_diario: Diario JSONL de pares completados (por defecto <ruta_plan>.diario).
+    :param max_workers: Copias a la vez (por defecto settings.S3_COPIA_WORKERS).
+    :param tamano_tanda: Pares por tanda entre anotaciones en el diario (por defecto settings.MIGRACION_TAMANO_TANDA).
+    :return: ResultadoMovimiento acumulado de esta ejecución.
+    """
+    ruta_diario = ruta_diario or ruta_diario_por_defecto(ruta_plan)
+    tamano_tanda = max(1, tamano_tanda or settings.MIGRACION_TAMANO_TANDA)
+    max_workers = max(1, max_workers or settings.S3_COPIA_WORKERS)
+    s3 = s3 or cliente_s3()
+
+    bucket_name, pares = leer_plan(ruta_plan)
+    completados = leer_diario(ruta_diario)
+    pendientes = [par for par in pares if par.origen not in completados]
+    logger.info(
+        f"Aplicando {ruta_plan}: {len(pares)} pares, {len(pares) - len(pendientes)} ya completados, "
+        f"{len(pendientes)} pendientes"
+    )
+
+    total = ResultadoMovimiento()
+    with open(ruta_diario, 'a', encoding='utf-8') as diario:
+        for inicio in range(0, len(pendientes), tamano_tanda):
+            tanda = pendientes[inicio:inicio + tamano_tanda]
+            resultado = aplicar_movimiento(s3, bucket_name, tanda, max_workers)
+            movidos = set(resultado.movidos)
+            for par in tanda:
+                if par.origen in resultado.fallidos and _ya_migrado(s3, bucket_name, par):
+                    logger.info(f"{par.origen} ya estaba migrado a {par.destino}")
+                    del resultado.fallidos[par.origen]
+                    movidos.add(par.origen)
+            _anotar(diario, [par for par in tanda if par.origen in movidos])
+
+            total.movidos.extend(par.origen for par in tanda if par.origen in movidos)
+            total.fallidos.update(resultado.fallidos)
+            total.bytes_copiados += resultado.bytes_copiados
+            total.segundos += resultado.segundos
+            logger.info(
+                f"Progreso: {len(pares) - len(pendientes) + inicio + len(tanda)}/{len(pares)} pares procesados, "
+                f"{len(total.fallidos)} fallidos"
+            )
+
+    if total.fallidos:
+        logger.error(f"{len(total.fallidos)} pares fallaron; vuelve a aplicar el plan para reintentarlos")
+    else:
+        logger.info(f"Migración de {ruta_plan} completada")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones de prefijos S3 con plan y diario de progreso.")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    plan = subparsers.add_parser('plan', help="Lista una vez y escribe el plan de pares origen -> destino.")
+    plan.add_argument('--bucket', required=True)
+    plan.add_argument('--mover', nargs=2, action='append', required=True, metavar=('ORIGEN', 'DESTINO'),
+                      help="Prefijo de origen y de destino; se puede repetir.")
+    plan.add_argument('--plan', required=True, help="Archivo JSONL del plan.")
+
+    aplicar = subparsers.add_parser('apply', help="Aplica (o reanuda) un plan.")
+    aplicar.add_argument('--plan', required=True, help="Archivo JSONL del plan.")
+    aplicar.add_argument('--diario', help="Diario de pares completados (por defecto <plan>.diario).")
+    aplicar.add_argument('--workers', type=int, help="Copias a la vez.")
+    args = parser.parse_args()
+
+    if args.comando == 'plan':
+        # Un único listado desde el prefijo común de todos los orígenes
+        prefijo = os.path.commonprefix([origen for origen, _ in args.mover])
+        generar_plan(cliente_s3(), args.bucket, prefijo,
+                     destino_por_prefijos(args.mover), args.plan)
+    else:
+        aplicar_plan(args.plan, args.diario, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import posixpath
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from loguru import logger
+from config.settings import settings
+from .borrado_s3 import eliminar_claves
+from .clientes_aws import cliente_s3
+
+# copy_object no admite objetos de más de 5 GB: por encima se copia por partes con upload_part_copy
+LIMITE_COPY_OBJECT = 5 * 1024 ** 3
+# Máximo de partes de una subida multiparte
+MAX_PARTES = 10_000
+
+ParMovimiento = namedtuple('ParMovimiento', ['origen', 'destino', 'tamano', 'etag'])
+
+
+@dataclass
+class ResultadoMovimiento:
+    """
+    Resultado de mover_prefijo.
+
+    - movidos: claves de origen copiadas, verificadas y borradas.
+    - fallidos: {clave de origen: error}; el origen se conserva.
+    """
+    movidos: list = field(default_factory=list)
+    fallidos: dict = field(default_factory=dict)
+    bytes_copiados: int = 0
+    segundos: float = 0.0
+
+    def __bool__(self):
+        """True si no falló ninguna clave."""
+        return not self.fallidos
+
+
+def clave_destino(clave, prefijo_origen, prefijo_destino):
+    """Clave bajo prefijo_destino con la misma ruta relativa que clave tenía bajo prefijo_origen."""
+    return posixpath.join(prefijo_destino, clave[len(prefijo_origen):].lstrip('/'))
+
+
+def planificar_movimiento(s3, bucket_name, prefijo_origen, prefijo_destino, filtro=None):
+    """
+    Lista una vez (paginando todo el prefijo) las claves a mover y su destino.
+
+    :param filtro: Función opcional clave -> bool para elegir qué claves se mueven.
+    :return: Lista de ParMovimiento.
+    """
+    pares = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefijo_origen):
+        for obj in page.get('Contents', []):
+            clave = obj['Key']
+            if filtro is not None and not filtro(clave):
+                continue
+            destino = clave_destino(clave, prefijo_origen, prefijo_destino)
+            if destino != clave:
+                pares.append(ParMovimiento(clave, destino, obj['Size'], obj.get('ETag')))
+    return pares
+
+
+def _copiar_por_partes(s3, bucket_name, par, tamano_parte, executor_partes):
+    """Copia del lado del servidor con upload_part_copy, para objetos de más de 5 GB."""
+    cabecera = s3.head_object(Bucket=bucket_name, Key=par.origen)
+    argumentos = {'Metadata': cabecera.get('Metadata', {})}
+    for nombre in ('ContentType', 'ContentEncoding', 'CacheControl', 'ContentDisposition', 'ContentLanguage'):
+        if cabecera.get(nombre):
+            argumentos[nombre] = cabecera[nombre]
+    upload_id = s3.create_multipart_upload(Bucket=bucket_name, Key=par.destino, **argumentos)['UploadId']
+
+    # S3 admite como mucho 10.000 partes: en objetos enormes la parte crece lo necesario
+    tamano_parte = max(tamano_parte, -(-par.tamano // MAX_PARTES))
+
+    def copiar_parte(numero, inicio):
+        fin = min(inicio + tamano_parte, par.tamano) - 1
+        respuesta = s3.upload_part_copy(
+            Bucket=bucket_name, Key=par.destino, UploadId=upload_id, PartNumber=numero,
+            CopySource={'Bucket': bucket_name, 'Key': par.origen}, CopySourceRange=f"bytes={inicio}-{fin}"
+        )
+        return {'ETag': respuesta['CopyPartResult']['ETag'], 'PartNumber': numero}
+
+    futuros = []
+    try:
+        futuros = [
+            executor_partes.submit(copiar_parte, numero, inicio)
+            for numero, inicio in enumerate(range(0, par.tamano, tamano_parte), start=1)
+        ]
+        partes = [futuro.result() for futuro in futuros]
+        s3.complete_multipart_upload(
+            Bucket=bucket_name, Key=par.destino, UploadId=upload_id, MultipartUpload={'Parts': partes}
+        )
+    except BaseException:
+        for futuro in futuros:
+            futuro.cancel()
+        s3.abort_multipart_upload(Bucket=bucket_name, Key=par.destino, UploadId=upload_id)
+        raise
+
+
+def copiar_y_verificar(s3, bucket_name, par, tamano_parte=None, executor_partes=None):
+    """
+    Copia par.origen en par.destino del lado del servidor y comprueba la copia con un HEAD:
+    mismo tamaño y, si el origen no es multiparte y se copió con copy_object, mismo ETag.
+
+    :raises ValueError: Si la copia no coincide con el origen.
+    """
+    tamano_parte = tamano_parte or settings.S3_COPIA_PARTE_MB * 1024 * 1024
+    if par.tamano > LIMITE_COPY_OBJECT:
+        _copiar_por_partes(s3, bucket_name, par, tamano_parte, executor_partes)
+        comparar_etag = False
+    else:
+        s3.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': par.origen}, Key=par.destino)
+        comparar_etag = bool(par.etag) and '-' not in par.etag
+
+    cabecera = s3.head_object(Bucket=bucket_name, Key=par.destino)
+    if cabecera['ContentLength'] != par.tamano:
+        raise ValueError(f"Tamaño de la copia {cabecera['ContentLength']} distinto del origen {par.tamano}")
+    if comparar_etag and cabecera.get('ETag') != par.etag:
+        raise ValueError(f"ETag de la copia {cabecera.get('ETag')} distinto del origen {par.etag}")
+
+
+def aplicar_movimiento(s3, bucket_name, pares, max_workers=None):
+    """
+    Copia en paralelo los pares y, solo para los verificados, borra los orígenes en lotes.
+
+    :return: ResultadoMovimiento.
+    """
+    max_workers = max(1, max_workers or settings.S3_COPIA_WORKERS)
+    resultado = ResultadoMovimiento()
+    verificados = []
+    inicio = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=settings.S3_COPIA_HILOS_PARTES) as executor_partes, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {executor.submit(copiar_y_verificar, s3, bucket_name, par, None, executor_partes): par for par in pares}
+        for futuro in as_completed(futuros):
+            par = futuros[futuro]
+            try:
+                futuro.result()
+            except Exception as e:
+                logger.error(f"Error copiando s3://{bucket_name}/{par.origen} a {par.destino}: {e}")
+                resultado.fallidos[par.origen] = str(e)
+                continue
+            logger.debug(f"Copiado s3://{bucket_name}/{par.origen} -> {par.destino}")
+            verificados.append(par)
+            resultado.bytes_copiados += par.tamano
+
+    # Los orígenes se borran solo después de verificar su copia
+    borrado = eliminar_claves(s3, bucket_name, [par.origen for par in verificados], simular=False)
+    resultado.fallidos.update(borrado.fallidos)
+    resultado.movidos = borrado.eliminados
+    resultado.segundos = time.perf_counter() - inicio
+
+    logger.info(
+        f"Movimiento en s3://{bucket_name}: {len(resultado.movidos)} claves movidas, {len(resultado.fallidos)} fallidas, "
+        f"{resultado.bytes_copiados / 1024 / 1024:.1f} MB copiados en {resultado.segundos:.2f}s"
+    )
+    return resultado
+
+
+def mover_prefijo(bucket_name, prefijo_origen, prefijo_destino, filtro=None, max_workers=None, s3=None):
+    """
+    Mueve las claves de prefijo_origen a prefijo_destino conservando la ruta relativa:
+    listado paginado, copias del lado del servidor en paralelo (por partes por encima de 5 GB)
+    y borrado en lotes de los orígenes cuya copia se verificó.
+
+    :param filtro: Función opcional clave -> bool para elegir qué claves se mueven.
+    :param max_workers: Copias a la vez (por defecto settings.S3_COPIA_WORKERS).
+    :param s3: Cliente de S3 opcional.
+    :return: ResultadoMovimiento.
+    """
+    max_workers = max(1, max_workers or settings.S3_COPIA_WORKERS)
+    s3 = s3 or cliente_s3()
+    pares = planificar_movimiento(s3, bucket_name, prefijo_origen, prefijo_destino, filtro)
+    logger.info(f"Moviendo {len(pares)} claves de s3://{bucket_name}/{prefijo_origen} a {prefijo_destino}")
+    return aplicar_movimiento(s3, bucket_name, pares, max_workers)
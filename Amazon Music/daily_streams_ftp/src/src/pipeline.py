@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+from loguru import logger
+
+# Marca de fin de cola: cada hilo de una etapa termina al recibir una
+_FIN = object()
+
+
+class Etapa:
+    """
+    Etapa de un Pipeline: aplica funcion a cada elemento con varios hilos.
+
+    La función devuelve el elemento para la siguiente etapa, o None para descartarlo.
+    Con expandir=True devuelve un iterable y cada uno de sus elementos pasa a la siguiente etapa.
+    Las excepciones se registran y el elemento se descarta sin detener el pipeline
+    (ver el parámetro al_fallar de Pipeline).
+    """
+
+    def __init__(self, nombre, funcion, workers=1, expandir=False):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.workers = max(1, workers)
+        self.expandir = expandir
+        self.procesados = 0
+        self.errores = 0
+        self.segundos = 0.0
+        self._lock = threading.Lock()
+
+    def _registrar(self, segundos, error=False):
+        with self._lock:
+            self.procesados += 1
+            self.errores += int(error)
+            self.segundos += segundos
+
+
+class Pipeline:
+    """
+    Ejecuta una secuencia de etapas conectadas por colas acotadas, de modo que todas
+    trabajan a la vez: mientras una etapa descarga, la siguiente ya procesa lo anterior.
+    Las colas acotadas frenan a las etapas rápidas cuando una lenta se atrasa, así que
+    nunca hay más de 'capacidad' elementos esperando entre dos etapas.
+    """
+
+    def __init__(self, etapas, capacidad=8, al_fallar=None):
+        """
+        :param capacidad: Elementos en espera como mucho entre dos etapas.
+        :param al_fallar: Función opcional (etapa, elemento, error) llamada con cada elemento
+                          descartado porque su etapa lanzó una excepción.
+        """
+        self.etapas = list(etapas)
+        self.capacidad = max(1, capacidad)
+        self.al_fallar = al_fallar
+
+    def ejecutar(self, entradas):
+        """
+        Pasa cada elemento de entradas por todas las etapas.
+
+        :return: Lista con los elementos que salen de la última etapa (en orden de llegada).
+        """
+        colas = [queue.Queue(maxsize=self.capacidad) for _ in self.etapas]
+        resultados = []
+        lock_resultados = threading.Lock()
+        pendientes = [etapa.workers for etapa in self.etapas]
+        lock_pendientes = threading.Lock()
+
+        def entregar(indice, elemento):
+            if indice + 1 < len(colas):
+                colas[indice + 1].put(elemento)
+            else:
+                with lock_resultados:
+                    resultados.append(elemento)
+
+        def trabajar(indice):
+            etapa = self.etapas[indice]
+            try:
+                while True:
+                    elemento = colas[indice].get()
+                    if elemento is _FIN:
+                        break
+                    inicio = time.perf_counter()
+                    try:
+                        salida = etapa.funcion(elemento)
+                        salidas = (salida or ()) if etapa.expandir else ((salida,) if salida is not None else ())
+                        for siguiente in salidas:
+                            entregar(indice, siguiente)
+                        etapa._registrar(time.perf_counter() - inicio)
+                    except Exception as e:
+                        etapa._registrar(time.perf_counter() - inicio, error=True)
+                        logger.error(f"Error en la etapa '{etapa.nombre}' procesando {elemento}: {e}")
+                        if self.al_fallar is not None:
+                            self.al_fallar(etapa, elemento, e)
+            finally:
+                # El último hilo de la etapa cierra la cola de la siguiente, aunque este hilo termine
+                # por una excepción no capturada: si no, las etapas siguientes esperarían para siempre
+                with lock_pendientes:
+                    pendientes[indice] -= 1
+                    ultimo = pendientes[indice] == 0
+                if ultimo and indice + 1 < len(colas):
+                    for _ in range(self.etapas[indice + 1].workers):
+                        colas[indice + 1].put(_FIN)
+
+        hilos = [
+            threading.Thread(target=trabajar, args=(indice,), name=f"{etapa.nombre}-{n}", daemon=True)
+            for indice, etapa in enumerate(self.etapas)
+            for n in range(etapa.workers)
+        ]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        try:
+            for elemento in entradas:
+                colas[0].put(elemento)
+        finally:
+            for _ in range(self.etapas[0].workers):
+                colas[0].put(_FIN)
+            for hilo in hilos:
+                hilo.join()
+
+        self._registrar_resumen(time.perf_counter() - inicio)
+        return resultados
+
+    def _registrar_resumen(self, segundos_totales):
+        logger.info(f"Pipeline completado en {segundos_totales:.2f}s")
+        for etapa in self.etapas:
+            logger.info(
+                f"  Etapa '{etapa.nombre}' ({etapa.workers} hilos): {etapa.procesados} elementos, "
+                f"{etapa.errores} errores, {etapa.segundos:.2f}s de trabajo"
+            )
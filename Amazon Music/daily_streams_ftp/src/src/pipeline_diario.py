@@ -0,0 +1,155 @@
+import os
+import posixpath
+import threading
+import time
+import zipfile
+from collections import namedtuple
+from loguru import logger
+from config.settings import settings
+from .clientes_aws import cliente_s3
+from .file_transformer import argumentos_subida, clave_salida, escribir_salida, existe_en_s3, extension_salida
+from .pipeline import Etapa, Pipeline
+from .s3_utils import ResultadoSubida, avisar_si_faltan_conexiones, crear_transfer_config, subir_archivo
+from .sftp_downloader import descargar_con_reintentos, ruta_local_destino
+from .sftp_utils import PoolCanalesSFTP
+from .transformacion_paralela import crear_transformador
+
+ZipLocal = namedtuple('ZipLocal', ['remoto', 'local', 'carpeta', 'sobrescribir'])
+# remoto: ruta SFTP del zip de origen, con la que se anotan los fallos de cualquier etapa.
+TxtExtraido = namedtuple('TxtExtraido', ['remoto', 'local', 'ruta_s3', 'sobrescribir'])
+# ruta_local: archivo a subir, que se borra tras subirlo.
+# argumentos: ExtraArgs de S3 (p. ej. ContentEncoding de la salida comprimida).
+Subida = namedtuple('Subida', ['remoto', 'bucket', 'clave', 'ruta_local', 'indice', 'argumentos'])
+
+
+def procesar_archivos_en_pipeline(sftp, archivos, directorio_temporal, zips_existentes, json_existentes, modificados=None,
+                                  contador_descargas=None, atributos=None):
+    """
+    Descarga, descomprime, transforma y sube los zips del SFTP con un Pipeline de cuatro
+    etapas solapadas, en lugar de completar cada fase para todos los archivos antes de la siguiente.
+
+    - descarga: trae el zip a <directorio_temporal>/<pais>/Daily/<servicio> (canales SFTP en paralelo).
+    - extracción: descomprime el zip y emite sus .txt y, si falta en la landing zone, el propio zip.
+    - transformación: convierte cada .txt, si la salida no existe ya en S3, a un archivo JSON o
+      Parquet junto al .txt (ver escribir_salida); en un pool de procesos si settings.TRANSFORM_PROCESOS > 1.
+      La salida nunca pasa entera por memoria ni por las colas: entre etapas solo viajan rutas.
+    - subida: sube zips y JSON a S3 con el TransferConfig de crear_transfer_config, registra la
+      velocidad de cada archivo y borra el archivo local ya subido.
+
+    Los hilos por etapa y el tamaño de las colas salen de settings.PIPELINE_*.
+
+    :param zips_existentes: Claves ya presentes en la landing zone (conjunto o vista del manifiesto;
+                            en la vista se registra cada zip subido con su tamaño).
+    :param json_existentes: Índice de las salidas ya publicadas (JSON o Parquet, ver clave_salida).
+    :param modificados: Nombres de zip que se vuelven a publicar aunque ya existan en S3.
+    :param contador_descargas: collections.Counter opcional donde se suma cada ruta remota descargada.
+    :param atributos: Diccionario opcional {ruta remota: (st_size, st_mtime)} del listado.
+    :return: ResultadoSubida con las claves subidas y omitidas (ya existían en S3), y en fallidos
+             {ruta remota del zip: 'etapa: error'} de los zips con algún fallo en cualquier etapa.
+    """
+    modificados = modificados or set()
+    atributos = atributos or {}
+    max_reintentos = max(1, settings.SFTP_DOWNLOAD_MAX_REINTENTOS)
+    s3 = cliente_s3()
+    transfer_config = crear_transfer_config()
+    avisar_si_faltan_conexiones(settings.PIPELINE_HILOS_SUBIDA)
+    resultado = ResultadoSubida()
+    lock_resultado = threading.Lock()
+    tramo_subidas = []
+    pool = PoolCanalesSFTP(sftp.get_channel().get_transport(), sftp)
+    transformador = crear_transformador()
+
+    def descargar(archivo):
+        carpeta = ruta_local_destino(archivo, directorio_temporal)
+        if carpeta is None:
+            return None
+        os.makedirs(carpeta, exist_ok=True)
+        zip_local = os.path.join(carpeta, os.path.basename(archivo))
+        descargar_con_reintentos(
+            pool, archivo, zip_local, max_reintentos, settings.SFTP_DOWNLOAD_ESPERA_BASE, atributos.get(archivo)
+        )
+        logger.info(f"Archivo descargado: {zip_local}")
+        if contador_descargas is not None:
+            contador_descargas[archivo] += 1
+        return ZipLocal(archivo, zip_local, carpeta, os.path.basename(archivo) in modificados)
+
+    def extraer(zip_local):
+        with zipfile.ZipFile(zip_local.local, 'r') as zip_ref:
+            zip_ref.extractall(zip_local.carpeta)
+            miembros = [miembro for miembro in zip_ref.namelist() if miembro.endswith('.txt')]
+
+        for miembro in miembros:
+            txt_local = os.path.join(zip_local.carpeta, miembro)
+            ruta_relativa = os.path.relpath(txt_local, directorio_temporal).replace("\\", "/")
+            ruta_s3 = clave_salida(posixpath.dirname(ruta_relativa), posixpath.basename(miembro))
+            yield TxtExtraido(zip_local.remoto, txt_local, ruta_s3, zip_local.sobrescribir)
+
+        clave_zip = posixpath.join(
+            settings.S3_PREFIX_AMAZON_FTP, os.path.relpath(zip_local.local, directorio_temporal).replace("\\", "/")
+        )
+        if zip_local.sobrescribir or clave_zip not in zips_existentes:
+            yield Subida(zip_local.remoto, settings.BUCKET_NAME_AMAZON_FTP, clave_zip, zip_local.local, zips_existentes, None)
+        else:
+            logger.info(f"El archivo {clave_zip} ya existe en S3, omitiendo.")
+            resultado.omitidos.append(clave_zip)
+
+    def transformar(elemento):
+        if isinstance(elemento, Subida):
+            return elemento
+        if not elemento.sobrescribir and existe_en_s3(s3, settings.BUCKET_NAME, elemento.ruta_s3, json_existentes):
+            logger.info(f"El archivo ya existe en S3: s3://{settings.BUCKET_NAME}/{elemento.ruta_s3}, no se subirá nuevamente.")
+            resultado.omitidos.append(elemento.ruta_s3)
+            return None
+        # La salida se escribe por lotes junto al .txt y se sube desde ahí por partes (TransferConfig)
+        ruta_salida = os.path.splitext(elemento.local)[0] + extension_salida()
+        transformar_tsv = transformador.transformar if transformador else escribir_salida
+        transformar_tsv(elemento.local, ruta_salida)
+        os.remove(elemento.local)
+        return Subida(elemento.remoto, settings.BUCKET_NAME, elemento.ruta_s3, ruta_salida, json_existentes, argumentos_subida())
+
+    def subir(subida):
+        inicio = time.perf_counter()
+        tamano, _ = subir_archivo(s3, subida.ruta_local, subida.bucket, subida.clave, transfer_config, subida.argumentos)
+        with lock_resultado:
+            resultado.subidos.append(subida.clave)
+            resultado.bytes_subidos += tamano
+            tramo_subidas.extend((inicio, time.perf_counter()))
+        if hasattr(subida.indice, 'agregar'):
+            subida.indice.agregar(subida.clave, tamano)
+        os.remove(subida.ruta_local)
+        return subida.clave
+
+    def registrar_fallo(etapa, elemento, error):
+        # Las entradas de la descarga son rutas remotas; el resto de elementos lleva la del zip de origen
+        remoto = elemento if isinstance(elemento, str) else elemento.remoto
+        with lock_resultado:
+            resultado.fallidos.setdefault(remoto, f"{etapa.nombre}: {error}")
+
+    # Con pool de procesos hace falta al menos un hilo por proceso para mantenerlos ocupados
+    hilos_transformacion = settings.PIPELINE_HILOS_TRANSFORMACION
+    if transformador:
+        hilos_transformacion = max(hilos_transformacion, transformador.procesos)
+
+    pipeline = Pipeline([
+        Etapa('descarga', descargar, settings.PIPELINE_HILOS_DESCARGA),
+        Etapa('extracción', extraer, settings.PIPELINE_HILOS_EXTRACCION, expandir=True),
+        Etapa('transformación', transformar, hilos_transformacion),
+        Etapa('subida', subir, settings.PIPELINE_HILOS_SUBIDA),
+    ], capacidad=settings.PIPELINE_CAPACIDAD_COLA, al_fallar=registrar_fallo)
+    try:
+        pipeline.ejecutar(archivos)
+    finally:
+        pool.cerrar()
+        if transformador:
+            transformador.cerrar()
+
+    # Velocidad global sobre el tramo en que hubo subidas, no sobre todo el pipeline
+    resultado.segundos = max(tramo_subidas) - min(tramo_subidas) if tramo_subidas else 0.0
+    logger.info(
+        f"Subidas del pipeline: {len(resultado.subidos)} subidos, {len(resultado.omitidos)} omitidos, "
+        f"{len(resultado.fallidos)} fallidos; {resultado.bytes_subidos / 1024 / 1024:.1f} MB en {resultado.segundos:.2f}s "
+        f"({resultado.megabytes_por_segundo():.1f} MB/s, {settings.PIPELINE_HILOS_SUBIDA} hilos)"
+    )
+    for remoto, error in sorted(resultado.fallidos.items()):
+        logger.error(f"  Fallido: {remoto}: {error}")
+    return resultado
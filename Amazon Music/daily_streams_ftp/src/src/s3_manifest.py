@@ -0,0 +1,218 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from loguru import logger
+from config.settings import settings
+from .s3_utils import list_s3_objects
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS objetos (
+    bucket TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    tamano INTEGER,
+    etag TEXT,
+    ultima_modificacion TEXT,
+    PRIMARY KEY (bucket, clave)
+);
+CREATE TABLE IF NOT EXISTS marcas (
+    bucket TEXT NOT NULL,
+    shard TEXT NOT NULL,
+    ultima_clave TEXT NOT NULL,
+    PRIMARY KEY (bucket, shard)
+);
+CREATE TABLE IF NOT EXISTS prefijos (
+    bucket TEXT NOT NULL,
+    prefijo TEXT NOT NULL,
+    reconciliado_en TEXT NOT NULL,
+    refrescado_en TEXT NOT NULL,
+    PRIMARY KEY (bucket, prefijo)
+);
+"""
+
+
+def _fin_de_rango(prefijo):
+    # Límite superior exclusivo para 'clave >= prefijo AND clave < fin' (todas las claves con ese prefijo)
+    return prefijo + '\U0010ffff'
+
+
+class ManifiestoS3:
+    """
+    Índice local (SQLite) de las claves de S3 por bucket y prefijo: clave, tamaño, ETag y LastModified.
+
+    El refresco incremental pagina cada shard (territorio/Daily/servicio) con StartAfter desde la
+    última clave conocida, lo que basta porque los archivos diarios llevan la fecha en el nombre
+    y se ordenan lexicográficamente. Las claves borradas o sobrescritas solo se detectan con una
+    reconciliación completa (refrescar(..., completo=True)).
+    """
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or settings.S3_MANIFEST_PATH
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+        self._conexion.executescript(_ESQUEMA)
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def refrescar(self, bucket, prefijo, completo=False, profundidad=None):
+        """
+        Actualiza el índice para bucket/prefijo.
+
+        :param completo: Si es True (o el prefijo nunca se reconcilió) se vuelve a listar todo
+                         y se eliminan del índice las claves que ya no existen.
+        :return: Número de objetos nuevos o actualizados en el índice.
+        """
+        profundidad = settings.S3_LIST_SHARD_DEPTH if profundidad is None else profundidad
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT reconciliado_en FROM prefijos WHERE bucket = ? AND prefijo = ?", (bucket, prefijo)
+            ).fetchone()
+            marcas = {} if completo or fila is None else dict(self._conexion.execute(
+                "SELECT shard, ultima_clave FROM marcas WHERE bucket = ? AND shard >= ? AND shard < ?",
+                (bucket, prefijo, _fin_de_rango(prefijo))
+            ).fetchall())
+        completo = completo or fila is None
+
+        objetos, shards = list_s3_objects(bucket, prefijo, profundidad=profundidad, start_after=marcas)
+        ahora = datetime.now(timezone.utc).isoformat()
+
+        nuevas_marcas = {}
+        shards = set(shards)
+        for obj in objetos:
+            shard = self._shard_de(obj['Key'], prefijo, profundidad)
+            if shard in shards and obj['Key'] > nuevas_marcas.get(shard, marcas.get(shard, '')):
+                nuevas_marcas[shard] = obj['Key']
+
+        with self._lock, self._conexion:
+            if completo:
+                self._conexion.execute(
+                    "DELETE FROM objetos WHERE bucket = ? AND clave >= ? AND clave < ?",
+                    (bucket, prefijo, _fin_de_rango(prefijo))
+                )
+                self._conexion.execute(
+                    "DELETE FROM marcas WHERE bucket = ? AND shard >= ? AND shard < ?",
+                    (bucket, prefijo, _fin_de_rango(prefijo))
+                )
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO objetos VALUES (?, ?, ?, ?, ?)",
+                (
+                    (bucket, obj['Key'], obj.get('Size'), obj.get('ETag'), self._fecha_a_texto(obj.get('LastModified')))
+                    for obj in objetos
+                )
+            )
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO marcas VALUES (?, ?, ?)",
+                ((bucket, shard, clave) for shard, clave in nuevas_marcas.items())
+            )
+            self._conexion.execute(
+                "INSERT INTO prefijos VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(bucket, prefijo) DO UPDATE SET refrescado_en = excluded.refrescado_en"
+                + (", reconciliado_en = excluded.reconciliado_en" if completo else ""),
+                (bucket, prefijo, ahora, ahora)
+            )
+
+        logger.info(
+            f"Manifiesto s3://{bucket}/{prefijo} {'reconciliado' if completo else 'refrescado'}: "
+            f"{len(objetos)} objetos {'listados' if completo else 'nuevos'}"
+        )
+        return len(objetos)
+
+    def refrescado_en(self, bucket, prefijo):
+        """Fecha (UTC) del último refresco de bucket/prefijo, o None si nunca se refrescó."""
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT refrescado_en FROM prefijos WHERE bucket = ? AND prefijo = ?", (bucket, prefijo)
+            ).fetchone()
+        return datetime.fromisoformat(fila[0]) if fila else None
+
+    def claves(self, bucket, prefijo):
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT clave FROM objetos WHERE bucket = ? AND clave >= ? AND clave < ? ORDER BY clave",
+                (bucket, prefijo, _fin_de_rango(prefijo))
+            ).fetchall()
+        return [clave for (clave,) in filas]
+
+    def objetos(self, bucket, prefijo):
+        """Objetos con el mismo formato que list_objects_v2 (Key, Size, ETag, LastModified)."""
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT clave, tamano, etag, ultima_modificacion FROM objetos "
+                "WHERE bucket = ? AND clave >= ? AND clave < ? ORDER BY clave",
+                (bucket, prefijo, _fin_de_rango(prefijo))
+            ).fetchall()
+        return [
+            {'Key': clave, 'Size': tamano, 'ETag': etag, 'LastModified': self._texto_a_fecha(fecha)}
+            for clave, tamano, etag, fecha in filas
+        ]
+
+    def contiene(self, bucket, clave):
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT 1 FROM objetos WHERE bucket = ? AND clave = ?", (bucket, clave)
+            ).fetchone()
+        return fila is not None
+
+    def registrar(self, bucket, clave, tamano=None, etag=None, ultima_modificacion=None):
+        """Agrega al índice un objeto recién subido, sin esperar al siguiente refresco."""
+        ultima_modificacion = ultima_modificacion or datetime.now(timezone.utc)
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO objetos VALUES (?, ?, ?, ?, ?)",
+                (bucket, clave, tamano, etag, self._fecha_a_texto(ultima_modificacion))
+            )
+
+    def vista(self, bucket, prefijo):
+        return VistaManifiesto(self, bucket, prefijo)
+
+    @staticmethod
+    def _shard_de(clave, prefijo, profundidad):
+        partes = clave[len(prefijo):].split('/')
+        if len(partes) <= profundidad:
+            return None
+        return prefijo + '/'.join(partes[:profundidad]) + '/'
+
+    @staticmethod
+    def _fecha_a_texto(fecha):
+        return fecha.isoformat() if fecha is not None else None
+
+    @staticmethod
+    def _texto_a_fecha(texto):
+        return datetime.fromisoformat(texto) if texto else None
+
+
+class VistaManifiesto:
+    """
+    Vista de un bucket/prefijo del manifiesto.
+    Se comporta como un conjunto de claves (in, iteración, len); agregar registra una subida.
+    """
+
+    def __init__(self, manifiesto, bucket, prefijo):
+        self.manifiesto = manifiesto
+        self.bucket = bucket
+        self.prefijo = prefijo
+
+    def __contains__(self, clave):
+        return clave.startswith(self.prefijo) and self.manifiesto.contiene(self.bucket, clave)
+
+    def agregar(self, clave, tamano=None):
+        # El refresco incremental no ve las claves sobrescritas: sin esto un zip vuelto a subir
+        # conservaría el tamaño y la fecha anteriores y se volvería a descargar en cada ejecución
+        self.manifiesto.registrar(self.bucket, clave, tamano)
+
+    def __iter__(self):
+        return iter(self.manifiesto.claves(self.bucket, self.prefijo))
+
+    def __len__(self):
+        return len(self.manifiesto.claves(self.bucket, self.prefijo))
@@ -1,30 +1,191 @@
 import os
 import posixpath
-import boto3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 from loguru import logger
 from config.settings import settings
+from .clientes_aws import cliente_s3
 
-def list_s3_files(bucket_name, prefix):
-    s3 = boto3.client('s3', aws_access_key_id=settings.AWS_ACCESS_KEY_ID, aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY)
-    files = []
+def _listar_nivel(s3, bucket_name, prefix):
+    """Lista un nivel con Delimiter='/'. Devuelve (objetos directos, subprefijos)."""
+    objetos = []
+    subprefijos = []
     paginator = s3.get_paginator('list_objects_v2')
-    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
-        for obj in page.get('Contents', []):
-            files.append(obj['Key'])
-    return files
-
-def upload_missing_files_to_s3(directorio_local, bucket_name, s3_prefix_raw, s3_existing_files):
-    s3_client = boto3.client('s3', aws_access_key_id=settings.AWS_ACCESS_KEY_ID, aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY)
-    
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix, Delimiter='/'):
+        objetos.extend(page.get('Contents', []))
+        subprefijos.extend(cp['Prefix'] for cp in page.get('CommonPrefixes', []))
+    return objetos, subprefijos
+
+def _listar_shard(s3, bucket_name, prefix, start_after=None):
+    """Pagina un shard completo (o solo lo posterior a start_after). Devuelve (objetos, segundos empleados)."""
+    inicio = time.perf_counter()
+    objetos = []
+    paginator = s3.get_paginator('list_objects_v2')
+    parametros = {'Bucket': bucket_name, 'Prefix': prefix}
+    if start_after:
+        parametros['StartAfter'] = start_after
+    for page in paginator.paginate(**parametros):
+        objetos.extend(page.get('Contents', []))
+    return objetos, time.perf_counter() - inicio
+
+def descubrir_shards(s3, bucket_name, prefix, profundidad, executor):
+    """
+    Descubre los prefijos de shard bajo prefix bajando 'profundidad' niveles con Delimiter='/'
+    (territorio/Daily/servicio con la profundidad por defecto).
+
+    :return: Tupla (shards a paginar, objetos sueltos encontrados en los niveles intermedios).
+    """
+    nivel = [prefix]
+    objetos_sueltos = []
+    for _ in range(profundidad):
+        siguiente = []
+        for objetos, subprefijos in executor.map(lambda p: _listar_nivel(s3, bucket_name, p), nivel):
+            objetos_sueltos.extend(objetos)
+            siguiente.extend(subprefijos)
+        nivel = siguiente
+        if not nivel:
+            break
+    return nivel, objetos_sueltos
+
+def list_s3_objects(bucket_name, prefix, max_workers=None, profundidad=None, start_after=None):
+    """
+    Lista todos los objetos bajo un prefijo repartiendo el paginado en shards concurrentes.
+    Primero descubre los prefijos territorio/Daily/servicio y luego pagina cada uno en un hilo.
+
+    :param bucket_name: Nombre del bucket de S3.
+    :param prefix: Prefijo a listar.
+    :param max_workers: Hilos para listar (por defecto settings.S3_LIST_WORKERS).
+    :param profundidad: Niveles de carpetas por shard (por defecto settings.S3_LIST_SHARD_DEPTH).
+    :param start_after: Diccionario opcional {shard: última clave conocida} para paginar solo lo nuevo.
+    :return: Tupla (objetos de list_objects_v2 ordenados por clave, lista de shards recorridos).
+    """
+    s3 = cliente_s3()
+    max_workers = max(1, max_workers or settings.S3_LIST_WORKERS)
+    profundidad = settings.S3_LIST_SHARD_DEPTH if profundidad is None else profundidad
+    start_after = start_after or {}
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        shards, objetos = descubrir_shards(s3, bucket_name, prefix, profundidad, executor)
+        futuros = {
+            executor.submit(_listar_shard, s3, bucket_name, shard, start_after.get(shard)): shard
+            for shard in shards
+        }
+
+        tiempos = {}
+        for futuro in as_completed(futuros):
+            shard = futuros[futuro]
+            objetos_shard, segundos = futuro.result()
+            objetos.extend(objetos_shard)
+            tiempos[shard] = segundos
+            logger.debug(f"Shard s3://{bucket_name}/{shard}: {len(objetos_shard)} claves en {segundos:.2f}s")
+
+    lentos = sorted(tiempos.items(), key=lambda item: item[1], reverse=True)[:5]
+    logger.info(
+        f"Listado de s3://{bucket_name}/{prefix}: {len(objetos)} claves en {len(shards)} shards, "
+        f"{time.perf_counter() - inicio:.2f}s. Shards más lentos: "
+        + ", ".join(f"{shard} ({segundos:.2f}s)" for shard, segundos in lentos)
+    )
+    objetos.sort(key=lambda obj: obj['Key'])
+    return objetos, shards
+
+def list_s3_files(bucket_name, prefix, max_workers=None, profundidad=None):
+    """
+    Lista todas las claves bajo un prefijo (ver list_s3_objects).
+
+    :return: Lista de claves ordenada lexicográficamente, igual que un paginado serie.
+    """
+    objetos, _ = list_s3_objects(bucket_name, prefix, max_workers, profundidad)
+    return [obj['Key'] for obj in objetos]
+
+@dataclass
+class ResultadoSubida:
+    """
+    Resultado de upload_missing_files_to_s3 y de la etapa de subida de pipeline_diario.
+
+    - subidos: claves subidas.
+    - omitidos: claves que ya existían en S3.
+    - fallidos: {clave: mensaje de error} de las subidas que fallaron; en pipeline_diario,
+      {ruta remota del zip: 'etapa: error'} de los fallos de cualquier etapa.
+    """
+    subidos: list = field(default_factory=list)
+    omitidos: list = field(default_factory=list)
+    fallidos: dict = field(default_factory=dict)
+    bytes_subidos: int = 0
+    segundos: float = 0.0
+
+    def megabytes_por_segundo(self):
+        return self.bytes_subidos / 1024 / 1024 / self.segundos if self.segundos else 0.0
+
+    def __bool__(self):
+        """True si no falló nada."""
+        return not self.fallidos
+
+def crear_transfer_config():
+    """TransferConfig de las subidas de zips según settings (multiparte y hilos por archivo)."""
+    return TransferConfig(
+        multipart_threshold=settings.S3_TRANSFER_UMBRAL_MB * 1024 * 1024,
+        multipart_chunksize=settings.S3_TRANSFER_PARTE_MB * 1024 * 1024,
+        max_concurrency=settings.S3_TRANSFER_CONCURRENCIA,
+        use_threads=settings.S3_TRANSFER_CONCURRENCIA > 1,
+    )
+
+def avisar_si_faltan_conexiones(hilos):
+    """Avisa si hilos subidas a la vez, cada una con S3_TRANSFER_CONCURRENCIA partes, superan el pool del cliente."""
+    conexiones = hilos * max(1, settings.S3_TRANSFER_CONCURRENCIA)
+    if conexiones > settings.AWS_MAX_POOL_CONNECTIONS:
+        logger.warning(f"Las subidas pueden usar {conexiones} conexiones y AWS_MAX_POOL_CONNECTIONS es {settings.AWS_MAX_POOL_CONNECTIONS}")
+
+def subir_archivo(s3, ruta_local, bucket_name, clave, transfer_config, argumentos=None):
+    """
+    Sube un archivo con transfer_config (ver crear_transfer_config) y registra su velocidad.
+
+    :param argumentos: ExtraArgs opcionales de S3 (p. ej. ContentEncoding).
+    :return: Tupla (bytes, segundos).
+    """
+    tamano = os.path.getsize(ruta_local)
+    inicio = time.perf_counter()
+    s3.upload_file(ruta_local, bucket_name, clave, ExtraArgs=argumentos, Config=transfer_config)
+    segundos = time.perf_counter() - inicio
+    logger.info(
+        f"Subido {ruta_local} a s3://{bucket_name}/{clave}: {tamano / 1024 / 1024:.1f} MB en {segundos:.2f}s "
+        f"({tamano / 1024 / 1024 / max(segundos, 1e-9):.1f} MB/s)"
+    )
+    return tamano, segundos
+
+def upload_missing_files_to_s3(directorio_local, bucket_name, s3_prefix_raw, s3_existing_files, forzar=None, max_workers=None):
+    """
+    Sube a S3 los .zip del directorio local que no existan todavía bajo s3_prefix_raw.
+    Los archivos se suben a la vez en un pool de hilos que comparte un cliente y un TransferConfig.
+    main ya no la llama (los zips se suben en la etapa de subida de pipeline_diario, con el mismo
+    subir_archivo); se conserva para los scripts que suben un directorio local, como comparacion_s3.
+
+    :param s3_existing_files: Claves ya presentes en S3 (conjunto o vista del manifiesto).
+    :param forzar: Nombres de archivo que se suben aunque ya existan (p. ej. reemitidos en SFTP).
+    :param max_workers: Archivos subiéndose a la vez (por defecto settings.S3_UPLOAD_WORKERS).
+    :return: ResultadoSubida con las claves subidas, omitidas y fallidas.
+    """
+    forzar = forzar or set()
+    max_workers = max(1, max_workers or settings.S3_UPLOAD_WORKERS)
+    transfer_config = crear_transfer_config()
+    s3_client = cliente_s3()
+    # Cada archivo usa hasta max_concurrency conexiones: el pool del cliente debe alcanzar para todos
+    avisar_si_faltan_conexiones(max_workers)
+
     # Convertir s3_existing_files a set para mejorar la eficiencia
     s3_existing_files_set = set(s3_existing_files)
-    
+
     # Definir los sufijos y prefijos S3
     extensions_prefixes = {
         '.zip': s3_prefix_raw
     }
 
+    resultado = ResultadoSubida()
+    pendientes = []
+
     # Recorrer los archivos del directorio local
     for root, _, files in os.walk(directorio_local):
         for archivo in files:
@@ -32,7 +193,7 @@ def upload_missing_files_to_s3(directorio_local, bucket_name, s3_prefix_raw, s3_
             if "Summary_Statement" in archivo or archivo.endswith('.csv'):
                 logger.info(f"Ignorando archivo {archivo}")
                 continue  # Saltar este archivo y continuar con el siguiente
-            
+
             ext = os.path.splitext(archivo)[1]
             if ext in extensions_prefixes:
                 # Obtener la ruta local del archivo
@@ -45,13 +206,36 @@ def upload_missing_files_to_s3(directorio_local, bucket_name, s3_prefix_raw, s3_
                 s3_path = posixpath.join(extensions_prefixes[ext], relative_path)
 
                 # Comprobar si el archivo ya existe en S3
-                if s3_path not in s3_existing_files_set:
-                    try:
-                        logger.info(f"Subiendo {archivo_local_path} a s3://{bucket_name}/{s3_path}")
-                        # Subir el archivo a S3
-                        s3_client.upload_file(archivo_local_path, bucket_name, s3_path)
-                    except Exception as e:
-                        logger.error(f"Error subiendo {archivo_local_path} a S3: {e}")
+                if s3_path not in s3_existing_files_set or archivo in forzar:
+                    pendientes.append((archivo_local_path, s3_path))
                 else:
                     logger.info(f"El archivo {s3_path} ya existe en S3, omitiendo.")
+                    resultado.omitidos.append(s3_path)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {
+            executor.submit(subir_archivo, s3_client, ruta_local, bucket_name, s3_path, transfer_config): (ruta_local, s3_path)
+            for ruta_local, s3_path in pendientes
+        }
+        for futuro in as_completed(futuros):
+            ruta_local, s3_path = futuros[futuro]
+            try:
+                tamano, _ = futuro.result()
+            except Exception as e:
+                logger.error(f"Error subiendo {ruta_local} a S3: {e}")
+                resultado.fallidos[s3_path] = str(e)
+                continue
+            resultado.subidos.append(s3_path)
+            resultado.bytes_subidos += tamano
+    resultado.segundos = time.perf_counter() - inicio
 
+    logger.info(
+        f"Subida a s3://{bucket_name}/{s3_prefix_raw}: {len(resultado.subidos)} subidos, "
+        f"{len(resultado.omitidos)} omitidos, {len(resultado.fallidos)} fallidos; "
+        f"{resultado.bytes_subidos / 1024 / 1024:.1f} MB en {resultado.segundos:.2f}s "
+        f"({resultado.megabytes_por_segundo():.1f} MB/s, {max_workers} hilos)"
+    )
+    for s3_path, error in sorted(resultado.fallidos.items()):
+        logger.error(f"  Fallido: {s3_path}: {error}")
+    return resultado
@@ -0,0 +1,139 @@
+import posixpath
+import pandas as pd
+from config.settings import settings
+from .esquema_tsv import tipos_salida
+from .ventana_fechas import extraer_fecha
+
+# Valor de partición Hive para los archivos sin fecha reconocible en el nombre
+PARTICION_POR_DEFECTO = '__HIVE_DEFAULT_PARTITION__'
+
+
+def _pyarrow():
+    # pyarrow solo hace falta con FORMATO_SALIDA=parquet
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("FORMATO_SALIDA=parquet requiere pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def clave_parquet(prefijo, carpeta_relativa, nombre_txt):
+    """
+    Clave S3 del Parquet de un TSV con particiones Hive:
+    <prefijo>territorio=<pais>/servicio=<servicio>/fecha=<YYYY-MM-DD>/<nombre>.parquet
+
+    :param carpeta_relativa: Carpeta <pais>/Daily/<servicio> del TSV.
+    :param nombre_txt: Nombre del TSV; de él sale la fecha de dataset.
+    """
+    partes = carpeta_relativa.strip('/').split('/')
+    fecha = extraer_fecha(nombre_txt)
+    nombre = posixpath.basename(nombre_txt).replace('.txt', '.parquet')
+    return posixpath.join(
+        prefijo,
+        f"territorio={partes[0] or PARTICION_POR_DEFECTO}",
+        f"servicio={partes[-1] or PARTICION_POR_DEFECTO}",
+        f"fecha={fecha.isoformat() if fecha else PARTICION_POR_DEFECTO}",
+        nombre
+    )
+
+
+class EscritorParquet:
+    """
+    Escribe DataFrames sucesivos en un único archivo Parquet.
+
+    Las filas se acumulan hasta filas_por_grupo antes de escribir cada row group, de modo que
+    los bloques pequeños de una lectura por bloques no generan row groups pequeños.
+    destino puede ser una ruta local o cualquier objeto tipo archivo binario escribible,
+    p. ej. un archivo temporal o un flujo de subida a S3.
+
+    El esquema del archivo no se infiere solo del primer bloque: en una lectura sin tipos, una columna
+    vacía en ese bloque saldría como float64 y el texto de un bloque posterior no encajaría. Las
+    columnas del diccionario llevan su tipo (ver tipos_salida), las demás el inferido (texto si venían
+    vacías), y cada bloque se convierte a ese esquema antes de escribirse.
+    """
+
+    def __init__(self, destino, compresion=None, filas_por_grupo=None, tipos=None):
+        """
+        :param tipos: {columna: 'str', 'int' o 'datetime'} (por defecto los de Diccionario.json).
+        """
+        self._pa = _pyarrow()
+        self.destino = destino
+        self.compresion = compresion or settings.PARQUET_COMPRESION
+        self.filas_por_grupo = filas_por_grupo or settings.PARQUET_FILAS_POR_GRUPO
+        self.tipos = tipos_salida() if tipos is None else tipos
+        self.filas = 0
+        self._escritor = None
+        self._esquema = None
+        self._pendientes = []
+        self._filas_pendientes = 0
+
+    def escribir(self, df):
+        if self._esquema is None:
+            self._esquema = self._fijar_esquema(df)
+        tabla = self._pa.Table.from_pandas(self._normalizar(df), schema=self._esquema, preserve_index=False)
+        self._pendientes.append(tabla)
+        self._filas_pendientes += tabla.num_rows
+        if self._filas_pendientes >= self.filas_por_grupo:
+            self._volcar()
+
+    def _fijar_esquema(self, df):
+        pa = self._pa
+        tipos_arrow = {'str': pa.string(), 'int': pa.int64(), 'datetime': pa.timestamp('ns')}
+        campos = []
+        for campo in pa.Schema.from_pandas(df, preserve_index=False):
+            tipo = tipos_arrow.get(self.tipos.get(campo.name))
+            if tipo is None:
+                tipo = campo.type
+                if pa.types.is_dictionary(tipo):
+                    tipo = tipo.value_type
+                elif df[campo.name].isna().all():
+                    # Sin valores en el primer bloque no hay tipo que inferir: texto admite cualquiera
+                    tipo = pa.string()
+            campos.append(pa.field(campo.name, tipo))
+        return pa.schema(campos)
+
+    def _normalizar(self, df):
+        """Convierte las columnas del bloque al tipo que tienen en el esquema del archivo."""
+        tipos = self._pa.types
+        df = df.copy(deep=False)
+        for campo in self._esquema:
+            if campo.name not in df.columns:
+                continue
+            if tipos.is_string(campo.type):
+                df[campo.name] = df[campo.name].astype('string')
+            elif tipos.is_integer(campo.type):
+                df[campo.name] = pd.to_numeric(df[campo.name]).astype('Int64')
+            elif tipos.is_floating(campo.type):
+                df[campo.name] = pd.to_numeric(df[campo.name])
+            elif tipos.is_timestamp(campo.type):
+                df[campo.name] = pd.to_datetime(df[campo.name])
+        return df
+
+    def _volcar(self, final=False):
+        if self._escritor is None:
+            self._escritor = self._pa.parquet.ParquetWriter(self.destino, self._esquema, compression=self.compresion)
+        tabla = self._pa.concat_tables(self._pendientes)
+        # Solo se escriben row groups completos; el resto espera a los siguientes bloques salvo al cerrar
+        filas = tabla.num_rows if final else tabla.num_rows - tabla.num_rows % self.filas_por_grupo
+        self._escritor.write_table(tabla.slice(0, filas), row_group_size=self.filas_por_grupo)
+        self.filas += filas
+        resto = tabla.slice(filas)
+        self._pendientes = [resto] if resto.num_rows else []
+        self._filas_pendientes = resto.num_rows
+
+    def cerrar(self):
+        if self._pendientes:
+            self._volcar(final=True)
+        if self._escritor is None:
+            raise ValueError("No se escribió ninguna fila en el Parquet")
+        self._escritor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if tipo is None:
+            self.cerrar()
+        elif self._escritor is not None:
+            self._escritor.close()
@@ -0,0 +1,148 @@
+from itertools import repeat
+from json.encoder import encode_basestring_ascii
+import numpy as np
+import pandas as pd
+from loguru import logger
+from pandas.api import types as tipos
+from config.settings import settings
+
+# Filas por lote: acota la memoria de las cadenas intermedias en archivos grandes
+FILAS_POR_LOTE = 50_000
+
+
+class TipoNoSoportado(TypeError):
+    """Columna que el serializador rápido no sabe codificar igual que pandas."""
+
+
+def _codificar_texto(valor):
+    # Igual que el ujson de pandas: ASCII con escapes \uXXXX y '/' escapada
+    return encode_basestring_ascii(valor).replace('/', '\\/')
+
+
+def _valores_via_pandas(valores, date_format):
+    # Números y fechas nunca contienen comas: se usa el formato exacto de pandas y se separa el array
+    texto = pd.Series(valores).to_json(orient='values', date_format=date_format)
+    return texto[1:-1].split(',') if texto != '[]' else []
+
+
+def _codificar_unicos(unicos, dtype, date_format, nombre):
+    """JSON de cada valor distinto (sin nulos) de una columna, según su tipo."""
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    if tipos.is_bool_dtype(dtype) and not isinstance(dtype, pd.BooleanDtype):
+        return ['true' if valor else 'false' for valor in unicos.tolist()]
+    if tipos.is_integer_dtype(dtype):
+        # Series.to_json escribiría los Int64 como float; to_json por registros los escribe como enteros
+        return [str(valor) for valor in unicos.tolist()]
+    if tipos.is_datetime64_dtype(dtype):
+        return _valores_via_pandas(unicos, date_format)
+    if tipos.is_object_dtype(dtype) or tipos.is_string_dtype(dtype):
+        unicos = unicos.tolist()
+        if not all(isinstance(valor, str) for valor in unicos):
+            raise TipoNoSoportado(f"valores no textuales en la columna {nombre}")
+        return [_codificar_texto(valor) for valor in unicos]
+    raise TipoNoSoportado(f"tipo {dtype} en la columna {nombre}")
+
+
+def _fragmentos(columna, date_format, prefijo):
+    """
+    Representación JSON de cada valor de la columna, con el mismo formato que DataFrame.to_json.
+
+    :param prefijo: Texto que precede a cada valor en el registro ('{"CLAVE":' o ',"CLAVE":').
+    """
+    if tipos.is_float_dtype(columna.dtype):
+        if isinstance(columna.dtype, pd.api.extensions.ExtensionDtype):
+            raise TipoNoSoportado(f"tipo {columna.dtype} en la columna {columna.name}")
+        # Sin factorizar: 0.0 y -0.0 serían el mismo valor distinto pero pandas los escribe diferente
+        return prefijo + np.array(_valores_via_pandas(columna, date_format), dtype=object)
+    # Cada valor distinto se codifica una sola vez; territorios, planes, fechas, etc. se repiten mucho
+    codigos, unicos = pd.factorize(columna, use_na_sentinel=True)
+    codificados = [prefijo + valor for valor in _codificar_unicos(unicos, columna.dtype, date_format, columna.name)]
+    codificados.append(prefijo + 'null')
+    return np.array(codificados, dtype=object)[codigos]
+
+
+def _registros(df, date_format):
+    """Lista con el JSON de cada fila ('{...}')."""
+    if not len(df.columns):
+        return ['{}'] * len(df)
+    columnas = [
+        _fragmentos(df[nombre], date_format, ('{' if posicion == 0 else ',') + _codificar_texto(str(nombre)) + ':')
+        for posicion, nombre in enumerate(df.columns)
+    ]
+    # Un solo join por fila: sumar columna a columna copiaría el registro entero en cada paso
+    return list(map(''.join, zip(*columnas, repeat('}'))))
+
+
+def serializar_registros(df, date_format='iso', filas_por_lote=None):
+    """
+    Genera, por lotes, las cadenas JSON de las filas de df con los mismos bytes que
+    df.to_json(orient='records', date_format=date_format) produce para cada registro.
+    Los tipos que no se pueden reproducir con exactitud se delegan en pandas.
+
+    :return: Iterador de listas de cadenas, una por fila.
+    """
+    filas_por_lote = filas_por_lote or FILAS_POR_LOTE
+    if settings.SERIALIZADOR_JSON == 'pandas' or df.columns.has_duplicates:
+        yield from _registros_pandas(df, date_format, filas_por_lote)
+        return
+    for inicio in range(0, len(df), filas_por_lote):
+        lote = df.iloc[inicio:inicio + filas_por_lote]
+        try:
+            yield _registros(lote, date_format)
+        except TipoNoSoportado as e:
+            # Cada registro sale igual con pandas, así que el respaldo puede aplicarse solo a este lote
+            logger.debug(f"Lote serializado con pandas: {e}")
+            yield from _registros_pandas(lote, date_format, filas_por_lote)
+
+
+def _registros_pandas(df, date_format, filas_por_lote):
+    for inicio in range(0, len(df), filas_por_lote):
+        lineas = df.iloc[inicio:inicio + filas_por_lote].to_json(orient='records', lines=True, date_format=date_format)
+        yield lineas.rstrip('\n').split('\n')
+
+
+def escribir_ndjson(df, salida, date_format='iso', filas_por_lote=None):
+    """
+    Escribe df como NDJSON (una fila por línea, terminada en salto de línea) en el flujo binario salida.
+    Equivale byte a byte a df.to_json(orient='records', lines=True, date_format=date_format).
+    """
+    escrito = False
+    for lote in serializar_registros(df, date_format, filas_por_lote):
+        if lote:
+            salida.write(('\n'.join(lote) + '\n').encode('utf-8'))
+            escrito = True
+    if not escrito:
+        # pandas escribe un salto de línea aunque no haya registros
+        salida.write(b'\n')
+
+
+def escribir_array_json(df, salida, date_format='iso', filas_por_lote=None, primero=True):
+    """
+    Escribe los registros de df separados por comas, sin corchetes, en el flujo binario salida.
+    Con los corchetes que pone el llamador equivale a df.to_json(orient='records', date_format=date_format).
+
+    :param primero: False si ya se escribieron registros antes en salida (se antepone una coma).
+    :return: True si se escribió al menos un registro.
+    """
+    escrito = False
+    for lote in serializar_registros(df, date_format, filas_por_lote):
+        if not lote:
+            continue
+        if escrito or not primero:
+            salida.write(b',')
+        salida.write(','.join(lote).encode('utf-8'))
+        escrito = True
+    return escrito
+
+
+def serializar_json(df, lineas=False, date_format='iso'):
+    """
+    JSON de df como bytes: array de registros, o NDJSON si lineas es True.
+    Mismo resultado que df.to_json(orient='records', lines=lineas, date_format=date_format).
+    """
+    lotes = [','.join(lote) if not lineas else '\n'.join(lote) for lote in serializar_registros(df, date_format)]
+    lotes = [lote for lote in lotes if lote]
+    if lineas:
+        return ('\n'.join(lotes) + '\n').encode('utf-8')
+    return ('[' + ','.join(lotes) + ']').encode('utf-8')
@@ -1,93 +1,330 @@
+import json
 import os
+import posixpath
+import threading
+import time
 import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
+from config.settings import settings
 from .file_comparisons import compare_structures
+from .sftp_utils import PoolCanalesSFTP
+
+
+def ruta_relativa_destino(archivo):
+    """
+    Calcula la carpeta relativa <pais>/Daily/<servicio> de un zip, la misma que se usa en local y en S3.
+
+    :return: Ruta relativa con separadores '/', o None si no se puede deducir país y servicio.
+    """
+    archivo_sin_extension = os.path.basename(archivo).replace('.zip', '')
+    partes_nombre = archivo_sin_extension.split('_')
+
+    # Verificar si es un archivo de AmazonMP3 y obtener país y servicio
+    if 'AmazonMP3' in os.path.basename(archivo) and len(partes_nombre) >= 4:
+        pais = partes_nombre[-3].replace('.txt', '')  # Obtener el país y eliminar .txt
+        servicio = partes_nombre[2]  # Obtener el servicio
+    else:
+        # Si no se puede extraer del nombre, intentar usar la ruta
+        ruta_subcarpeta = os.path.dirname(archivo)
+        partes = ruta_subcarpeta.split('/')
+
+        # Verificar que haya suficientes partes
+        if len(partes) < 3:  # Al menos debe haber el país y la subcarpeta
+            logger.error(f"La ruta {ruta_subcarpeta} no contiene la estructura esperada.")
+            return None
+
+        # Suponiendo que la estructura es: /cxp-reporting/ZQLUC/sales/{pais}/Daily/{servicio}
+        pais = partes[-3].replace('.txt', '')  # Remover .txt si está presente
+        servicio = partes[-1]  # Tomar el servicio de la última parte
+
+    # Asegurarse de que el servicio mantenga el sufijo completo
+    if 'ROW' in pais:  # Verifica si el país contiene "ROW"
+        pais = '_'.join(pais.split('_')[-2:])  # Extrae el sufijo después de "ROW", para que quede así ROW_NA/Daily/Unlimited
+
+    return posixpath.join(pais, "Daily", servicio)
+
+
+def ruta_local_destino(archivo, directorio_temporal):
+    """Carpeta local donde se guarda y descomprime un zip, o None si no se puede deducir."""
+    ruta_relativa = ruta_relativa_destino(archivo)
+    if ruta_relativa is None:
+        return None
+    return os.path.join(directorio_temporal, *ruta_relativa.split('/'))
+
+
+# Tamaño de lectura y cada cuántos bytes se guarda el punto de control de una descarga
+TAMANO_BLOQUE = 1024 * 1024
+BYTES_ENTRE_CHECKPOINTS = 8 * 1024 * 1024
+
+
+def _leer_checkpoint(ruta_meta):
+    try:
+        with open(ruta_meta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _guardar_checkpoint(ruta_meta, archivo, tamano, mtime, offset):
+    with open(ruta_meta, 'w', encoding='utf-8') as f:
+        json.dump({'remoto': archivo, 'tamano': tamano, 'mtime': mtime, 'offset': offset}, f)
+
+
+def descargar_reanudable(sftp, archivo, archivo_local, tamano_esperado=None, mtime_remoto=None):
+    """
+    Descarga un archivo SFTP a archivo_local pudiendo reanudar un intento anterior.
+    Los bytes se escriben en '<archivo_local>.part' y el offset alcanzado se guarda en
+    '<archivo_local>.part.meta'; al reintentar se hace seek a ese offset y se sigue
+    leyendo con prefetch (lecturas en paralelo). Al terminar se verifica el tamaño.
+
+    El tamaño y el mtime reales se piden al abrir el archivo (stat del handle), de modo que
+    cada intento se verifica contra el archivo actual y no contra un listado desfasado;
+    si no coinciden con los del checkpoint la descarga empieza de cero.
+
+    :param tamano_esperado: st_size del listado; solo se usa para avisar si el archivo cambió desde entonces.
+    :param mtime_remoto: st_mtime del listado, con el mismo fin.
+    """
+    ruta_part = f"{archivo_local}.part"
+    ruta_meta = f"{ruta_part}.meta"
+
+    with sftp.open(archivo, 'rb') as remoto:
+        attr = remoto.stat()
+        tamano, mtime = attr.st_size, attr.st_mtime
+        if (tamano_esperado is not None and tamano_esperado != tamano) or (mtime_remoto is not None and mtime_remoto != mtime):
+            logger.info(
+                f"{archivo} cambió desde el listado ({tamano_esperado} B, mtime {mtime_remoto}); "
+                f"se descarga la versión actual ({tamano} B, mtime {mtime})"
+            )
+
+        offset = 0
+        checkpoint = _leer_checkpoint(ruta_meta)
+        if (checkpoint and os.path.exists(ruta_part) and checkpoint.get('remoto') == archivo
+                and checkpoint.get('tamano') == tamano and checkpoint.get('mtime') == mtime):
+            offset = min(checkpoint.get('offset', 0), os.path.getsize(ruta_part))
+
+        with open(ruta_part, 'r+b' if offset else 'wb') as local:
+            # Descartar lo escrito después del último checkpoint
+            local.truncate(offset)
+            local.seek(offset)
+            _guardar_checkpoint(ruta_meta, archivo, tamano, mtime, offset)
+            if offset:
+                logger.info(f"Reanudando {archivo} desde el byte {offset} de {tamano}")
+
+            if offset < tamano:
+                remoto.seek(offset)
+                remoto.prefetch(tamano)
+                ultimo_checkpoint = offset
+                while True:
+                    bloque = remoto.read(TAMANO_BLOQUE)
+                    if not bloque:
+                        break
+                    local.write(bloque)
+                    offset += len(bloque)
+                    if offset - ultimo_checkpoint >= BYTES_ENTRE_CHECKPOINTS:
+                        local.flush()
+                        _guardar_checkpoint(ruta_meta, archivo, tamano, mtime, offset)
+                        ultimo_checkpoint = offset
+            local.flush()
+            _guardar_checkpoint(ruta_meta, archivo, tamano, mtime, offset)
+
+    tamano_final = os.path.getsize(ruta_part)
+    if tamano_final != tamano:
+        if tamano_final > tamano:
+            # El archivo remoto cambió mientras se descargaba: empezar de cero en el siguiente intento
+            os.remove(ruta_part)
+            os.remove(ruta_meta)
+        raise IOError(f"Descarga incompleta de {archivo}: {tamano_final} de {tamano} bytes")
+
+    os.replace(ruta_part, archivo_local)
+    os.remove(ruta_meta)
+
+
+def reintentar_sftp(pool, operacion, archivo, max_reintentos, espera_base):
+    """
+    Ejecuta operacion(sftp) con el canal SFTP del hilo actual, reintentando con espera exponencial.
+    Tras cada fallo se descarta el canal para que el siguiente intento abra uno nuevo.
+
+    :return: Lo que devuelva operacion.
+    """
+    for intento in range(1, max_reintentos + 1):
+        try:
+            return operacion(pool.cliente())
+        except Exception as e:
+            pool.descartar()
+            if intento == max_reintentos:
+                raise
+            espera = espera_base * 2 ** (intento - 1)
+            logger.warning(f"Error descargando {archivo} ({e}). Reintentando ({intento}/{max_reintentos}) en {espera:.0f}s...")
+            time.sleep(espera)
+
+
+def descargar_con_reintentos(pool, archivo, archivo_zip_local, max_reintentos, espera_base, atributos=None):
+    """
+    Descarga un archivo reintentando; cada reintento reanuda desde el último checkpoint.
+
+    :param atributos: Tupla opcional (st_size, st_mtime) del listado SFTP.
+    """
+    tamano, mtime = atributos or (None, None)
+    reintentar_sftp(
+        pool, lambda sftp: descargar_reanudable(sftp, archivo, archivo_zip_local, tamano, mtime),
+        archivo, max_reintentos, espera_base
+    )
+
+
+def _descomprimir(archivo_zip_local, ruta_local):
+    """Descomprime el zip en su carpeta. Devuelve las tuplas (zip local, txt local) de los .txt extraídos."""
+    extraidos = []
+    with zipfile.ZipFile(archivo_zip_local, 'r') as zip_ref:
+        zip_ref.extractall(ruta_local)
+
+        # Listar y verificar los archivos extraídos
+        for archivo in zip_ref.namelist():
+            # Verificar si es un archivo .txt
+            if archivo.endswith('.txt'):
+                archivo_txt_local = os.path.join(ruta_local, os.path.basename(archivo).replace('.txt', ''))  # Remover .txt
+                extraidos.append((archivo_zip_local, archivo_txt_local))
+    return extraidos
+
+
+def _procesar_archivo(pool, archivo, directorio_temporal, max_reintentos, espera_base, atributos=None):
+    """Descarga y descomprime un zip. Devuelve (True si se descargó, tuplas (zip, txt))."""
+    ruta_local = ruta_local_destino(archivo, directorio_temporal)
+    if ruta_local is None:
+        return False, []
+    os.makedirs(ruta_local, exist_ok=True)
+    archivo_zip_local = os.path.join(ruta_local, os.path.basename(archivo))
+
+    try:
+        # Descargar el archivo ZIP desde el servidor SFTP
+        descargar_con_reintentos(pool, archivo, archivo_zip_local, max_reintentos, espera_base, atributos)
+        logger.info(f"Archivo descargado: {archivo_zip_local}")
+    except Exception as e:
+        logger.error(f"Error descargando el archivo {archivo}: {e}")
+        return False, []
+
+    try:
+        # Descomprimir el archivo (el canal queda libre para otras descargas)
+        return True, _descomprimir(archivo_zip_local, ruta_local)
+    except Exception as e:
+        logger.error(f"Error descomprimiendo el archivo {archivo}: {e}")
+        return True, []
+
+
+def descargar_archivos_en_paralelo(sftp, archivos, directorio_temporal, max_workers=None, max_reintentos=None, espera_base=None,
+                                   contador_descargas=None, atributos=None):
+    """
+    Descarga y descomprime una lista de zips con varias sesiones SFTP en paralelo.
+    Cada sesión es un canal sobre el transporte de sftp; la cola de trabajo está acotada
+    al doble de sesiones para no encolar de golpe todo un backfill.
+
+    :param sftp: Cliente SFTP conectado.
+    :param archivos: Rutas remotas de los zips.
+    :param directorio_temporal: Carpeta local base.
+    :param max_workers: Sesiones en paralelo (por defecto settings.SFTP_DOWNLOAD_WORKERS).
+    :param max_reintentos: Intentos por archivo (por defecto settings.SFTP_DOWNLOAD_MAX_REINTENTOS).
+    :param espera_base: Segundos de espera antes del primer reintento (por defecto settings.SFTP_DOWNLOAD_ESPERA_BASE).
+    :param contador_descargas: collections.Counter opcional donde se suma cada ruta remota descargada.
+    :param atributos: Diccionario opcional {ruta remota: (st_size, st_mtime)} del listado, para avisar
+                      de los archivos que cambiaron desde entonces.
+    :return: Lista de tuplas (zip local, txt local), en el orden de archivos.
+    """
+    max_workers = max(1, max_workers or settings.SFTP_DOWNLOAD_WORKERS)
+    max_reintentos = max(1, max_reintentos or settings.SFTP_DOWNLOAD_MAX_REINTENTOS)
+    espera_base = settings.SFTP_DOWNLOAD_ESPERA_BASE if espera_base is None else espera_base
+
+    atributos = atributos or {}
+    cupo = threading.BoundedSemaphore(max_workers * 2)
+    pool = PoolCanalesSFTP(sftp.get_channel().get_transport(), sftp)
+    futuros = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for archivo in archivos:
+                cupo.acquire()
+                futuro = executor.submit(
+                    _procesar_archivo, pool, archivo, directorio_temporal, max_reintentos, espera_base, atributos.get(archivo)
+                )
+                futuro.add_done_callback(lambda _: cupo.release())
+                futuros.append(futuro)
+    finally:
+        pool.cerrar()
 
-def descargar_y_descomprimir_archivos_faltantes(sftp, sftp_files, s3_files, directorio_temporal, subcarpetas_encontradas, sftp_base_path):
     archivos_descargados = []
+    for archivo, futuro in zip(archivos, futuros):
+        descargado, extraidos = futuro.result()
+        if descargado and contador_descargas is not None:
+            contador_descargas[archivo] += 1
+        archivos_descargados.extend(extraidos)
+    return archivos_descargados
+
+
+def servicio_de(entrada):
+    """Servicio (Ad-Supported, Prime, Unlimited...) de un archivo, según su nombre o, si no, su carpeta."""
+    return entrada.clave.servicio or posixpath.basename(posixpath.dirname(entrada.ruta_sftp))
+
+
+def seleccionar_archivos_a_descargar(comparacion, subcarpetas_encontradas):
+    """
+    Elige los zips a traer del SFTP (faltantes y modificados), asignando cada uno a un solo servicio.
+
+    :param subcarpetas_encontradas: Diccionario {servicio: True/False}; los servicios no listados se incluyen igualmente.
+    :return: Tupla (rutas remotas, {ruta remota: (st_size, st_mtime)}).
+    """
+    # Repartir los archivos por servicio según su nombre o ruta
+    por_servicio = {}
+    atributos = {}
+    for entrada in comparacion.a_descargar():
+        if entrada.ruta_sftp.endswith('.zip'):
+            por_servicio.setdefault(servicio_de(entrada), []).append(entrada.ruta_sftp)
+            if entrada.tamano_sftp is not None and entrada.mtime_sftp is not None:
+                atributos[entrada.ruta_sftp] = (entrada.tamano_sftp, entrada.mtime_sftp)
+
+    for servicio in por_servicio:
+        if servicio not in subcarpetas_encontradas:
+            logger.warning(f"Servicio no reconocido '{servicio}' ({len(por_servicio[servicio])} archivos), se descargará igualmente")
+
+    archivos_para_descargar = []
+    for servicio, archivos in por_servicio.items():
+        if not subcarpetas_encontradas.get(servicio, True):
+            logger.info(f"Omitiendo {len(archivos)} archivos de la subcarpeta desactivada: {servicio}")
+            continue
+        logger.info(f"Archivos para descargar en la subcarpeta {servicio}: {len(archivos)}")
+        archivos_para_descargar.extend(archivos)
+
+    return archivos_para_descargar, atributos
+
+
+def descargar_y_descomprimir_archivos_faltantes(sftp, sftp_files, s3_files, directorio_temporal, subcarpetas_encontradas, sftp_base_path,
+                                                comparacion=None, contador_descargas=None):
+    """
+    Descarga y descomprime los archivos .zip del SFTP que faltan en S3.
+    Cada archivo se asigna a una sola subcarpeta según su servicio, de modo que se descarga una única vez.
+    main ya no la llama: usa pipeline_diario.procesar_archivos_en_pipeline, que solapa las etapas.
+    Se conserva como alternativa por fases (todas las descargas antes de transformar).
+
+    :param subcarpetas_encontradas: Diccionario {servicio: True/False} con los servicios a procesar.
+                                    Los archivos de servicios no listados se descargan igualmente.
+    :param comparacion: ResultadoComparacion ya calculado; si no se pasa, se compara sftp_files con s3_files.
+                        Se descargan los faltantes y los modificados (tamaño distinto o reemitidos).
+    :param contador_descargas: collections.Counter opcional con las descargas por ruta remota.
+    :return: Lista de tuplas (zip local, txt local).
+    """
+    archivos_descargados = []
+    contador_descargas = Counter() if contador_descargas is None else contador_descargas
 
     # Comparar estructuras de archivos entre SFTP y S3 para encontrar archivos faltantes en S3
-    missing_in_s3 = compare_structures(s3_files, sftp_files, sftp_base_path)
-    logger.info(f"Archivos faltantes en S3: {missing_in_s3}")
-
-    for subcarpeta, encontrada in subcarpetas_encontradas.items():
-        if encontrada:
-            #logger.info(f"Procesando la subcarpeta: {subcarpeta}")
-
-            # Filtrar archivos de la subcarpeta que faltan en S3, omitiendo "Summary_Statement"
-            archivos_para_descargar = [
-                archivo for archivo in sftp_files 
-                if archivo.endswith('.zip') 
-                and 'Summary_Statement' not in archivo 
-                and os.path.relpath(archivo, sftp_base_path).replace("\\", "/") in missing_in_s3
-            ]
-
-            #logger.info(f"Archivos para descargar en la subcarpeta {subcarpeta}: {archivos_para_descargar}")
-
-            for archivo in archivos_para_descargar:
-                archivo_sin_extension = os.path.basename(archivo).replace('.zip', '')
-                partes_nombre = archivo_sin_extension.split('_')
-
-# Verificar si es un archivo de AmazonMP3 y obtener país y servicio
-                if 'AmazonMP3' in os.path.basename(archivo) and len(partes_nombre) >= 4:
-                    pais = partes_nombre[-3].replace('.txt', '')  # Obtener el país y eliminar .txt
-                    servicio = partes_nombre[2]  # Obtener el servicio
-
-                    # Crear la ruta completa para guardar el archivo en "Daily"
-                    ruta_local = os.path.join(directorio_temporal)  # Solo usar "Daily"
-                    os.makedirs(ruta_local, exist_ok=True)
-
-                    # Ruta para el archivo ZIP
-                    archivo_zip_local = os.path.join(ruta_local, os.path.basename(archivo))
-
-                else:
-                    # Si no se puede extraer del nombre, intentar usar la ruta
-                    ruta_subcarpeta = os.path.dirname(archivo)
-                    partes = ruta_subcarpeta.split('/')
-
-                    # Verificar que haya suficientes partes
-                    if len(partes) < 3:  # Al menos debe haber el país y la subcarpeta
-                        logger.error(f"La ruta {ruta_subcarpeta} no contiene la estructura esperada.")
-                        continue
-
-                    # Suponiendo que la estructura es: /cxp-reporting/ZQLUC/sales/{pais}/Daily/{servicio}
-                    pais = partes[-3].replace('.txt', '')  # Remover .txt si está presente
-                    servicio = partes[-1]  # Tomar el servicio de la última parte
-
-                # Asegurarse de que el servicio mantenga el sufijo completo
-                if 'ROW' in pais:  # Verifica si el país contiene "ROW"
-                    pais = '_'.join(pais.split('_')[-2:])  # Extrae el sufijo después de "ROW"
-                    servicio = f"{servicio}"  # Agrega el sufijo completo, para que quede así ROW_NA/Daily/Unlimited
-
-                # Crear la ruta completa
-                ruta_local = os.path.join(directorio_temporal, pais, "Daily", servicio)
-                os.makedirs(ruta_local, exist_ok=True)
-
-                archivo_zip_local = os.path.join(ruta_local, os.path.basename(archivo))
-
-                try:
-                    # Descargar el archivo ZIP desde el servidor SFTP
-                    #logger.info(f"Descargando archivo: {archivo}")
-                    sftp.get(archivo, archivo_zip_local)
-                    logger.info(f"Archivo descargado: {archivo_zip_local}")
-
-                    # Descomprimir el archivo
-                    with zipfile.ZipFile(archivo_zip_local, 'r') as zip_ref:
-                        zip_ref.extractall(ruta_local)
-                        #logger.info(f"Archivo ZIP {archivo_zip_local} descomprimido en {ruta_local}")
-
-                        # Listar y verificar los archivos extraídos
-                        archivos_descomprimidos = zip_ref.namelist()
-                        for archivo in archivos_descomprimidos:
-                            #logger.info(f"Archivo descomprimido: {archivo}")
-
-                            # Verificar si es un archivo .txt
-                            if archivo.endswith('.txt'):
-                                archivo_txt_local = os.path.join(ruta_local, os.path.basename(archivo).replace('.txt', ''))  # Remover .txt
-                                #logger.info(f"Archivo .txt descomprimido: {archivo_txt_local}")
-                                archivos_descargados.append((archivo_zip_local, archivo_txt_local))
-
-                except Exception as e:
-                    logger.error(f"Error descargando/descomprimiendo el archivo {archivo}: {e}")
+    if comparacion is None:
+        comparacion = compare_structures(s3_files, sftp_files, sftp_base_path)
+    logger.info(f"Archivos faltantes en S3: {len(comparacion.faltantes)}, modificados en SFTP: {len(comparacion.modificados())}")
+
+    archivos_para_descargar, atributos = seleccionar_archivos_a_descargar(comparacion, subcarpetas_encontradas)
+    archivos_descargados.extend(
+        descargar_archivos_en_paralelo(
+            sftp, archivos_para_descargar, directorio_temporal, contador_descargas=contador_descargas, atributos=atributos
+        )
+    )
 
+    duplicados = sum(veces - 1 for veces in contador_descargas.values() if veces > 1)
+    logger.info(f"Descargas: {sum(contador_descargas.values())} archivos, {len(contador_descargas)} únicos, {duplicados} duplicados")
     return archivos_descargados
@@ -0,0 +1,136 @@
+import posixpath
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from config.settings import settings
+from .clientes_aws import cliente_s3
+from .file_transformer import clave_salida, transformar_y_subir_tsv
+from .sftp_downloader import TAMANO_BLOQUE, reintentar_sftp, ruta_relativa_destino
+from .sftp_utils import PoolCanalesSFTP
+
+
+def leer_zip_remoto(sftp, archivo, tamano_esperado=None):
+    """
+    Lee un archivo SFTP completo a un SpooledTemporaryFile: en memoria hasta
+    settings.SPOOL_MAX_MEMORIA bytes y en un temporal anónimo a partir de ahí.
+    El tamaño se verifica contra el stat del archivo abierto, no contra el del listado.
+
+    :param tamano_esperado: st_size del listado; solo se usa para avisar si el archivo cambió desde entonces.
+    :return: Archivo temporal posicionado al inicio. El llamador debe cerrarlo.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.SPOOL_MAX_MEMORIA)
+    try:
+        with sftp.open(archivo, 'rb') as remoto:
+            tamano = remoto.stat().st_size
+            if tamano_esperado is not None and tamano_esperado != tamano:
+                logger.info(f"{archivo} cambió desde el listado ({tamano_esperado} B); se lee la versión actual ({tamano} B)")
+            remoto.prefetch(tamano)
+            shutil.copyfileobj(remoto, spool, TAMANO_BLOQUE)
+        if spool.tell() != tamano:
+            raise IOError(f"Descarga incompleta de {archivo}: {spool.tell()} de {tamano} bytes")
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def _procesar_zip(pool, s3, archivo, tamano, zips_existentes, json_existentes, sobrescribir, max_reintentos, espera_base):
+    """
+    Trae un zip del SFTP, lo sube a la landing zone y publica cada .txt como JSON, sin tocar el disco local.
+
+    :return: True si el zip se descargó.
+    """
+    ruta_relativa = ruta_relativa_destino(archivo)
+    if ruta_relativa is None:
+        return False
+
+    try:
+        spool = reintentar_sftp(
+            pool, lambda sftp: leer_zip_remoto(sftp, archivo, tamano), archivo, max_reintentos, espera_base
+        )
+        logger.info(f"Archivo descargado en memoria: {archivo}")
+    except Exception as e:
+        logger.error(f"Error descargando el archivo {archivo}: {e}")
+        return False
+
+    with spool:
+        # Subir el zip tal cual a la landing zone
+        clave_zip = posixpath.join(settings.S3_PREFIX_AMAZON_FTP, ruta_relativa, posixpath.basename(archivo))
+        if sobrescribir or clave_zip not in zips_existentes:
+            try:
+                logger.info(f"Subiendo {archivo} a s3://{settings.BUCKET_NAME_AMAZON_FTP}/{clave_zip}")
+                s3.upload_fileobj(spool, settings.BUCKET_NAME_AMAZON_FTP, clave_zip)
+                if hasattr(zips_existentes, 'agregar'):
+                    spool.seek(0, 2)
+                    zips_existentes.agregar(clave_zip, spool.tell())
+            except Exception as e:
+                logger.error(f"Error subiendo {archivo} a S3: {e}")
+            spool.seek(0)
+        else:
+            logger.info(f"El archivo {clave_zip} ya existe en S3, omitiendo.")
+
+        # Transformar cada .txt leyendo directamente del zip
+        try:
+            with zipfile.ZipFile(spool, 'r') as zip_ref:
+                for miembro in zip_ref.namelist():
+                    if not miembro.endswith('.txt'):
+                        continue
+                    ruta_s3 = clave_salida(ruta_relativa, posixpath.basename(miembro))
+                    try:
+                        with zip_ref.open(miembro) as tsv:
+                            transformar_y_subir_tsv(tsv, settings.BUCKET_NAME, ruta_s3, json_existentes, sobrescribir)
+                    except Exception as e:
+                        logger.error(f"Error procesando {miembro} de {archivo}: {e}")
+        except zipfile.BadZipFile as e:
+            logger.error(f"Error descomprimiendo el archivo {archivo}: {e}")
+    return True
+
+
+def procesar_archivos_en_streaming(sftp, archivos, zips_existentes, json_existentes, modificados=None, max_workers=None,
+                                   max_reintentos=None, espera_base=None, contador_descargas=None, atributos=None):
+    """
+    Procesa los zips del SFTP en streaming: descarga a memoria, subida del zip y publicación
+    de los JSON, sin pasar por settings.DIRECTORIO_TEMPORAL. Los TSV se transforman en el propio
+    proceso, leyendo del zip y subiendo por partes, aunque settings.TRANSFORM_PROCESOS sea mayor que 1:
+    pasarlos a un pool de procesos obligaría a copiarlos antes a disco.
+
+    :param archivos: Rutas remotas de los zips (ver seleccionar_archivos_a_descargar).
+    :param zips_existentes: Claves ya presentes en la landing zone (conjunto o vista del manifiesto;
+                            en la vista se registra cada zip subido con su tamaño).
+    :param json_existentes: Índice de las salidas ya publicadas (JSON o Parquet, ver clave_salida).
+    :param modificados: Nombres de zip que se vuelven a publicar aunque ya existan en S3.
+    :param contador_descargas: collections.Counter opcional donde se suma cada ruta remota descargada.
+    :param atributos: Diccionario opcional {ruta remota: (st_size, st_mtime)} del listado.
+    """
+    modificados = modificados or set()
+    atributos = atributos or {}
+    max_workers = max(1, max_workers or settings.SFTP_DOWNLOAD_WORKERS)
+    max_reintentos = max(1, max_reintentos or settings.SFTP_DOWNLOAD_MAX_REINTENTOS)
+    espera_base = settings.SFTP_DOWNLOAD_ESPERA_BASE if espera_base is None else espera_base
+
+    s3 = cliente_s3()
+    # Acotar las tareas encoladas; cada hilo mantiene un único spool abierto a la vez
+    cupo = threading.BoundedSemaphore(max_workers * 2)
+    pool = PoolCanalesSFTP(sftp.get_channel().get_transport(), sftp)
+    futuros = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for archivo in archivos:
+                cupo.acquire()
+                tamano = atributos.get(archivo, (None, None))[0]
+                futuro = executor.submit(
+                    _procesar_zip, pool, s3, archivo, tamano, zips_existentes, json_existentes,
+                    posixpath.basename(archivo) in modificados, max_reintentos, espera_base
+                )
+                futuro.add_done_callback(lambda _: cupo.release())
+                futuros.append(futuro)
+    finally:
+        pool.cerrar()
+
+    for archivo, futuro in zip(archivos, futuros):
+        if futuro.result() and contador_descargas is not None:
+            contador_descargas[archivo] += 1
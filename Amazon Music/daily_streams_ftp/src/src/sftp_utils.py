@@ -1,27 +1,275 @@
+import json
+import os
 import paramiko
 import posixpath
 import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from loguru import logger
-from config import settings
+from config.settings import settings
 
-def list_sftp_files(sftp_client, remote_path, base_dir="Daily"):
-    files = []
-    norm_remote_path = posixpath.normpath(remote_path)
-    #logger.info(f"Verificando ruta: {norm_remote_path}")
-    try:
-        for entry in sftp_client.listdir_attr(remote_path):
-            entry_path = posixpath.join(remote_path, entry.filename)
-            #logger.info(f"Procesando entrada: {entry_path}")
-            if stat.S_ISDIR(entry.st_mode):
-                #logger.info(f"Directorio encontrado: {entry.filename}")
-                files.extend(list_sftp_files(sftp_client, entry_path, base_dir))
-            else:
-                if base_dir in posixpath.normpath(entry_path).split(posixpath.sep):
-                    #logger.info(f"Archivo encontrado dentro de {base_dir}: {entry.filename}")
-                    files.append(entry_path)
+
+class PoolCanalesSFTP:
+    """
+    Reparte un SFTPClient por hilo, todos abiertos como canales sobre el mismo transporte.
+    El cliente original (si se pasa) se reutiliza para el primer hilo que lo pida.
+    """
+
+    def __init__(self, transport, sftp_inicial=None):
+        self._transport = transport
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sftp_inicial = sftp_inicial
+        self._propios = []
+
+    def cliente(self):
+        sftp = getattr(self._local, 'sftp', None)
+        if sftp is None:
+            with self._lock:
+                if self._sftp_inicial is not None:
+                    sftp, self._sftp_inicial = self._sftp_inicial, None
                 else:
-                    logger.info(f"Archivo fuera de {base_dir}: {entry.filename}")
-        return files
+                    sftp = paramiko.SFTPClient.from_transport(self._transport)
+                    self._propios.append(sftp)
+            self._local.sftp = sftp
+        return sftp
+
+    def descartar(self):
+        """Olvida el canal del hilo actual (p. ej. tras un error) para que el siguiente uso abra otro."""
+        sftp = getattr(self._local, 'sftp', None)
+        self._local.sftp = None
+        with self._lock:
+            if sftp is None or sftp not in self._propios:
+                return
+            self._propios.remove(sftp)
+        try:
+            sftp.close()
+        except Exception as e:
+            logger.warning(f"Error cerrando canal SFTP: {e}")
+
+    def cerrar(self):
+        # Solo se cierran los canales abiertos por el pool, no el del llamador
+        for sftp in self._propios:
+            try:
+                sftp.close()
+            except Exception as e:
+                logger.warning(f"Error cerrando canal SFTP: {e}")
+        self._propios = []
+
+
+def cargar_cache_listados(ruta_cache):
+    """
+    Carga la caché de listados SFTP (un directorio por línea, en formato JSON).
+
+    :param ruta_cache: Ruta del archivo .jsonl de la caché.
+    :return: Diccionario {directorio: {'mtime': int, 'entries': [[nombre, modo, tamaño, mtime], ...]}}.
+    """
+    cache = {}
+    if not ruta_cache or not os.path.exists(ruta_cache):
+        return cache
+    try:
+        with open(ruta_cache, 'r', encoding='utf-8') as f:
+            for linea in f:
+                if linea.strip():
+                    registro = json.loads(linea)
+                    cache[registro['path']] = {'mtime': registro['mtime'], 'entries': registro['entries']}
     except Exception as e:
-        logger.error(f"Error listando archivos en SFTP: {e}")
-        return []
+        logger.warning(f"Caché de listados SFTP ilegible ({ruta_cache}), se listará todo el árbol: {e}")
+        return {}
+    return cache
+
+
+def guardar_cache_listados(ruta_cache, cache):
+    """
+    Guarda la caché de listados SFTP de forma atómica (archivo temporal + os.replace).
+
+    :param ruta_cache: Ruta del archivo .jsonl de la caché.
+    :param cache: Diccionario con el mismo formato que devuelve cargar_cache_listados.
+    """
+    directorio = os.path.dirname(ruta_cache)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    ruta_tmp = f"{ruta_cache}.tmp"
+    with open(ruta_tmp, 'w', encoding='utf-8') as f:
+        for path in sorted(cache):
+            registro = {'path': path, 'mtime': cache[path]['mtime'], 'entries': cache[path]['entries']}
+            f.write(json.dumps(registro, separators=(',', ':')) + '\n')
+    os.replace(ruta_tmp, ruta_cache)
+
+
+def _entradas_a_cache(entradas):
+    return [[e.filename, e.st_mode, e.st_size, e.st_mtime] for e in entradas]
+
+
+def _entradas_desde_cache(registros):
+    entradas = []
+    for nombre, modo, tamano, mtime in registros:
+        attr = paramiko.SFTPAttributes()
+        attr.filename = nombre
+        attr.st_mode = modo
+        attr.st_size = tamano
+        attr.st_mtime = mtime
+        # Sobrescribir un archivo no cambia el mtime de su directorio: el tamaño y la fecha
+        # de un archivo tomado de la caché pueden estar desfasados (ver refrescar_atributos)
+        attr.desde_cache = True
+        entradas.append(attr)
+    return entradas
+
+
+def _listar_directorio(pool, remote_path, mtime_conocido, cache):
+    """
+    Lista un directorio, reutilizando la caché si su mtime no ha cambiado.
+    El mtime de un directorio solo cambia cuando se agregan o eliminan entradas directas,
+    así que los subdirectorios se siguen comprobando uno a uno (con stat en lugar de listdir).
+
+    :return: Tupla (entradas, mtime del directorio, True si salió de la caché).
+    """
+    sftp = pool.cliente()
+    if mtime_conocido is None:
+        mtime_conocido = sftp.stat(remote_path).st_mtime
+
+    guardado = cache.get(remote_path)
+    if guardado is not None and guardado['mtime'] == mtime_conocido:
+        return _entradas_desde_cache(guardado['entries']), mtime_conocido, True
+
+    return sftp.listdir_attr(remote_path), mtime_conocido, False
+
+
+def list_sftp_files(sftp_client, remote_path, base_dir="Daily", max_workers=None, ruta_cache=None, ventana=None):
+    """
+    Lista recursivamente los archivos bajo remote_path (ver list_sftp_file_attrs).
+
+    :return: Lista de rutas de archivos, en el mismo orden que el recorrido recursivo.
+    """
+    return list(list_sftp_file_attrs(sftp_client, remote_path, base_dir, max_workers, ruta_cache, ventana))
+
+
+def list_sftp_file_attrs(sftp_client, remote_path, base_dir="Daily", max_workers=None, ruta_cache=None, ventana=None):
+    """
+    Lista recursivamente los archivos bajo remote_path que estén dentro de una carpeta base_dir.
+    Los listados de directorios se reparten entre varios canales SFTP del mismo transporte,
+    de modo que cada nivel del árbol (país/Daily/servicio) se pide en paralelo.
+    Los directorios cuyo mtime no cambió desde la última ejecución se toman de la caché local.
+    Con una ventana de fechas, las carpetas de periodos fuera de ella no se recorren y los
+    archivos cuya fecha de dataset queda fuera no se devuelven.
+
+    :param sftp_client: Cliente SFTP conectado; su transporte se usa para abrir los canales extra.
+    :param remote_path: Ruta remota desde donde empezar a recorrer.
+    :param base_dir: Solo se devuelven archivos con esta carpeta en su ruta.
+    :param max_workers: Canales en paralelo (por defecto settings.SFTP_LIST_WORKERS).
+    :param ruta_cache: Archivo de caché de listados (por defecto settings.SFTP_LISTING_CACHE; '' la desactiva).
+    :param ventana: VentanaFechas opcional para limitar el recorrido.
+    :return: Diccionario {ruta: SFTPAttributes} (st_size, st_mtime) en el orden del recorrido recursivo.
+             Los archivos tomados de la caché llevan desde_cache=True (ver refrescar_atributos).
+    """
+    max_workers = max(1, max_workers or settings.SFTP_LIST_WORKERS)
+    ruta_cache = settings.SFTP_LISTING_CACHE if ruta_cache is None else ruta_cache
+    cache = cargar_cache_listados(ruta_cache)
+    nueva_cache = {}
+    listados = {}
+    reutilizados = 0
+    podados = []
+
+    pool = PoolCanalesSFTP(sftp_client.get_channel().get_transport(), sftp_client)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pendientes = {executor.submit(_listar_directorio, pool, remote_path, None, cache): remote_path}
+            while pendientes:
+                hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    directorio = pendientes.pop(futuro)
+                    try:
+                        entradas, mtime, desde_cache = futuro.result()
+                    except Exception as e:
+                        logger.error(f"Error listando archivos en SFTP: {e}")
+                        listados[directorio] = []
+                        continue
+
+                    listados[directorio] = entradas
+                    nueva_cache[directorio] = {'mtime': mtime, 'entries': _entradas_a_cache(entradas)}
+                    reutilizados += desde_cache
+
+                    for entry in entradas:
+                        if stat.S_ISDIR(entry.st_mode):
+                            entry_path = posixpath.join(directorio, entry.filename)
+                            if ventana is not None and not ventana.contiene_carpeta(entry.filename):
+                                podados.append(entry_path)
+                                continue
+                            # El mtime de un listado recién hecho es fiable; el de la caché puede estar desfasado
+                            mtime_hijo = None if desde_cache else entry.st_mtime
+                            pendientes[executor.submit(_listar_directorio, pool, entry_path, mtime_hijo, cache)] = entry_path
+    finally:
+        pool.cerrar()
+
+    # Las carpetas podadas conservan su caché para ejecuciones con otra ventana
+    for podado in podados:
+        for path, guardado in cache.items():
+            if path == podado or path.startswith(podado.rstrip('/') + '/'):
+                nueva_cache[path] = guardado
+
+    if ruta_cache:
+        logger.info(f"Listados SFTP: {len(listados) - reutilizados} directorios listados, {reutilizados} tomados de la caché")
+        try:
+            guardar_cache_listados(ruta_cache, nueva_cache)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la caché de listados SFTP en {ruta_cache}: {e}")
+
+    files = {}
+    _aplanar_listados(listados, remote_path, base_dir, ventana, files)
+    return files
+
+
+def refrescar_atributos(sftp_client, atributos, filtro=None, max_workers=None):
+    """
+    Vuelve a pedir con stat los atributos de los archivos que list_sftp_file_attrs tomó de la caché
+    de listados, repartiendo las llamadas entre varios canales SFTP del mismo transporte.
+    Un zip sobrescrito en el mismo lugar no cambia el mtime de su directorio, así que sin esto
+    la caché devolvería el tamaño y la fecha anteriores y ocultaría la reemisión.
+
+    :param atributos: Diccionario {ruta: SFTPAttributes} de list_sftp_file_attrs; se actualiza en el sitio.
+    :param filtro: Función opcional ruta -> bool para limitar los stat a los archivos que se van a comparar.
+    :param max_workers: Canales en paralelo (por defecto settings.SFTP_LIST_WORKERS).
+    :return: Número de archivos refrescados.
+    """
+    rutas = [
+        ruta for ruta, attr in atributos.items()
+        if getattr(attr, 'desde_cache', False) and (filtro is None or filtro(ruta))
+    ]
+    if not rutas:
+        return 0
+    max_workers = max(1, max_workers or settings.SFTP_LIST_WORKERS)
+
+    def stat_archivo(pool, ruta):
+        attr = pool.cliente().stat(ruta)
+        attr.filename = posixpath.basename(ruta)
+        return attr
+
+    refrescados = 0
+    pool = PoolCanalesSFTP(sftp_client.get_channel().get_transport(), sftp_client)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = {executor.submit(stat_archivo, pool, ruta): ruta for ruta in rutas}
+            for futuro, ruta in futuros.items():
+                try:
+                    atributos[ruta] = futuro.result()
+                    refrescados += 1
+                except Exception as e:
+                    logger.warning(f"No se pudieron refrescar los atributos de {ruta}, se usan los de la caché: {e}")
+    finally:
+        pool.cerrar()
+    logger.info(f"Atributos SFTP refrescados con stat: {refrescados} archivos tomados de la caché")
+    return refrescados
+
+
+def _aplanar_listados(listados, remote_path, base_dir, ventana, files):
+    """Reconstruye los archivos (ruta -> atributos) en orden de recorrido en profundidad."""
+    for entry in listados.get(remote_path, []):
+        entry_path = posixpath.join(remote_path, entry.filename)
+        if stat.S_ISDIR(entry.st_mode):
+            _aplanar_listados(listados, entry_path, base_dir, ventana, files)
+        elif ventana is not None and not ventana.contiene_archivo(entry.filename):
+            continue
+        elif base_dir in posixpath.normpath(entry_path).split(posixpath.sep):
+            files[entry_path] = entry
+        else:
+            logger.info(f"Archivo fuera de {base_dir}: {entry.filename}")
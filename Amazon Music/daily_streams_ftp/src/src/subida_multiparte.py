@@ -0,0 +1,134 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from loguru import logger
+from config.settings import settings
+
+# S3 exige al menos 5 MB por parte, salvo la última
+TAMANO_PARTE_MINIMO = 5 * 1024 * 1024
+
+
+class SubidaMultiparte:
+    """
+    Objeto tipo archivo escribible que sube a S3 lo que se le escribe, en partes de una
+    subida multiparte, sin pasar por disco.
+
+    Cada vez que se acumulan tamano_parte bytes, la parte se sube en un hilo mientras se sigue
+    escribiendo. Como mucho hay concurrencia partes subiéndose y una llenándose: si todas están
+    ocupadas, write() espera, de modo que la memoria queda acotada a (concurrencia + 1) partes.
+    Si al cerrar no se llegó a una parte completa se hace un único put_object.
+    Al salir del with con una excepción, o si falla alguna parte, la subida se aborta para no
+    dejar partes huérfanas cobrándose en el bucket.
+    """
+
+    def __init__(self, s3, bucket, clave, tamano_parte=None, concurrencia=None, argumentos=None):
+        """
+        :param s3: Cliente de S3.
+        :param tamano_parte: Bytes por parte (por defecto settings.S3_MULTIPARTE_TAMANO_PARTE_MB).
+        :param concurrencia: Partes subiéndose a la vez (por defecto settings.S3_MULTIPARTE_CONCURRENCIA).
+        :param argumentos: Argumentos extra del objeto (p. ej. ContentEncoding), como ExtraArgs de upload_file.
+        """
+        self.s3 = s3
+        self.bucket = bucket
+        self.clave = clave
+        self.tamano_parte = max(TAMANO_PARTE_MINIMO, tamano_parte or settings.S3_MULTIPARTE_TAMANO_PARTE_MB * 1024 * 1024)
+        self.concurrencia = max(1, concurrencia or settings.S3_MULTIPARTE_CONCURRENCIA)
+        self.argumentos = argumentos or {}
+        self.bytes_escritos = 0
+        self.closed = False
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._futuros = []
+        self._huecos = threading.BoundedSemaphore(self.concurrencia)
+        self._executor = None
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        if self.closed:
+            raise ValueError(f"Subida a s3://{self.bucket}/{self.clave} ya cerrada")
+        self._buffer += datos
+        self.bytes_escritos += len(datos)
+        while len(self._buffer) >= self.tamano_parte:
+            parte = bytes(self._buffer[:self.tamano_parte])
+            del self._buffer[:self.tamano_parte]
+            self._enviar_parte(parte)
+        return len(datos)
+
+    def _enviar_parte(self, parte):
+        self._comprobar_errores()
+        if self._upload_id is None:
+            respuesta = self.s3.create_multipart_upload(Bucket=self.bucket, Key=self.clave, **self.argumentos)
+            self._upload_id = respuesta['UploadId']
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrencia)
+        # Espera a que quede un hueco libre: es lo que acota la memoria
+        self._huecos.acquire()
+        try:
+            futuro = self._executor.submit(self._subir_parte, len(self._futuros) + 1, parte)
+        except BaseException:
+            self._huecos.release()
+            raise
+        futuro.add_done_callback(lambda _: self._huecos.release())
+        self._futuros.append(futuro)
+
+    def _subir_parte(self, numero, parte):
+        respuesta = self.s3.upload_part(
+            Bucket=self.bucket, Key=self.clave, UploadId=self._upload_id, PartNumber=numero, Body=parte
+        )
+        return {'ETag': respuesta['ETag'], 'PartNumber': numero}
+
+    def _comprobar_errores(self):
+        for futuro in self._futuros:
+            if futuro.done() and futuro.exception() is not None:
+                raise futuro.exception()
+
+    def close(self):
+        """Sube lo pendiente y completa la subida; si algo falla, la aborta y relanza el error."""
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self.s3.put_object(Bucket=self.bucket, Key=self.clave, Body=bytes(self._buffer), **self.argumentos)
+            else:
+                if self._buffer:
+                    self._enviar_parte(bytes(self._buffer))
+                partes = [futuro.result() for futuro in self._futuros]
+                self.s3.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self.clave, UploadId=self._upload_id, MultipartUpload={'Parts': partes}
+                )
+        except BaseException:
+            self.abortar()
+            raise
+        self._buffer = bytearray()
+        self.closed = True
+        self._cerrar_executor()
+
+    def abortar(self):
+        """Descarta la subida: cancela las partes pendientes y aborta la subida multiparte en S3."""
+        self.closed = True
+        self._buffer = bytearray()
+        for futuro in self._futuros:
+            futuro.cancel()
+        wait(self._futuros)
+        self._cerrar_executor()
+        if self._upload_id is not None:
+            try:
+                self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.clave, UploadId=self._upload_id)
+                logger.warning(f"Subida multiparte abortada: s3://{self.bucket}/{self.clave}")
+            except Exception as e:
+                logger.error(f"No se pudo abortar la subida multiparte de s3://{self.bucket}/{self.clave}: {e}")
+            self._upload_id = None
+
+    def _cerrar_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if tipo is None:
+            self.close()
+        elif not self.closed:
+            self.abortar()
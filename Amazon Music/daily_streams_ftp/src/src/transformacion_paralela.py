@@ -0,0 +1,100 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from loguru import logger
+from config.settings import settings
+from .file_transformer import escribir_salida
+
+try:
+    import resource
+except ImportError:  # Windows: sin límite de memoria por proceso
+    resource = None
+
+
+def _inicializar_worker(memoria_max_mb):
+    """
+    Fija RLIMIT_AS del proceso worker. Es un límite grueso: acota el espacio de direcciones virtual,
+    no la memoria residente, y numpy, OpenBLAS y pyarrow reservan arenas virtuales grandes, así que
+    un valor ajustado puede dar MemoryError con archivos que sí caben. Desactivado por defecto.
+    """
+    if resource is None or not memoria_max_mb:
+        return
+    limite = memoria_max_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+
+
+def transformar_a_json(origen, destino):
+    """
+    Lee y transforma un TSV y escribe la salida en destino en el formato de settings.FORMATO_SALIDA
+    (ver escribir_salida). La salida se escribe por lotes en el worker en lugar de volver entera,
+    serializada en un solo bytes, al proceso principal.
+
+    :param origen: Ruta local del TSV.
+    :param destino: Ruta local de la salida.
+    :return: destino.
+    """
+    escribir_salida(origen, destino)
+    return destino
+
+
+def _contexto_procesos():
+    # Con fork el hijo copia los locks que tuvieran tomados los hilos vivos (transporte de paramiko,
+    # etapas del pipeline, loguru) y puede bloquearse: los workers se crean con forkserver o spawn
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in metodos else 'spawn')
+
+
+class TransformadorProcesos:
+    """
+    Pool de procesos para transformar TSV a JSON usando todos los núcleos.
+    transformar() se puede llamar desde varios hilos a la vez; cada llamada bloquea
+    hasta que un proceso devuelve el resultado. Si un worker muere (p. ej. por el
+    límite de memoria) el pool se recrea para los siguientes archivos.
+    """
+
+    def __init__(self, procesos=None, memoria_max_mb=None):
+        self.procesos = max(1, procesos or settings.TRANSFORM_PROCESOS)
+        self.memoria_max_mb = settings.TRANSFORM_MEMORIA_MAX_MB if memoria_max_mb is None else memoria_max_mb
+        self._lock = threading.Lock()
+        self._executor = self._crear_executor()
+
+    def _crear_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.procesos, mp_context=_contexto_procesos(),
+            initializer=_inicializar_worker, initargs=(self.memoria_max_mb,)
+        )
+
+    def transformar(self, origen, destino):
+        """
+        :param origen: Ruta local del TSV.
+        :param destino: Ruta local donde escribir la salida (ver escribir_salida).
+        :return: destino.
+        """
+        executor = self._executor
+        try:
+            return executor.submit(transformar_a_json, origen, destino).result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    logger.warning("Un proceso de transformación terminó de forma inesperada, recreando el pool")
+                    self._executor = self._crear_executor()
+            raise
+
+    def cerrar(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def crear_transformador():
+    """TransformadorProcesos según settings.TRANSFORM_PROCESOS, o None si se transforma en el propio proceso."""
+    if settings.TRANSFORM_PROCESOS <= 1:
+        return None
+    limite = f"RLIMIT_AS de {settings.TRANSFORM_MEMORIA_MAX_MB} MB" if settings.TRANSFORM_MEMORIA_MAX_MB else "sin límite de memoria"
+    logger.info(f"Transformando TSV con {settings.TRANSFORM_PROCESOS} procesos ({limite})")
+    return TransformadorProcesos()
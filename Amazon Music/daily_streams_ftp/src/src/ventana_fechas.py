@@ -0,0 +1,83 @@
+import re
+from datetime import date, datetime, timedelta
+
+# Fechas de dataset tal como aparecen en los nombres: 20240115, 2024-01-15 o 2024_01_15
+_PATRON_FECHA = re.compile(r'(?<!\d)(\d{4})[-_]?(\d{2})[-_]?(\d{2})(?!\d)')
+# Carpetas con nombre de periodo: 2024, 2024-01, 2024-01-15, 20240115
+_PATRON_CARPETA = re.compile(r'^(\d{4})(?:[-_]?(\d{2}))?(?:[-_]?(\d{2}))?$')
+
+
+def extraer_fecha(nombre):
+    """
+    Extrae la fecha de dataset de un nombre de archivo.
+
+    :param nombre: Nombre (o ruta) del archivo.
+    :return: datetime.date con la primera fecha válida del nombre, o None si no tiene.
+    """
+    for anio, mes, dia in _PATRON_FECHA.findall(nombre):
+        try:
+            return date(int(anio), int(mes), int(dia))
+        except ValueError:
+            continue
+    return None
+
+
+class VentanaFechas:
+    """
+    Intervalo cerrado [desde, hasta] de fechas de dataset a procesar.
+    Los nombres sin fecha reconocible se consideran dentro de la ventana.
+    """
+
+    def __init__(self, desde, hasta=None):
+        self.desde = desde
+        self.hasta = hasta
+
+    @classmethod
+    def desde_argumentos(cls, since=None, days_back=None, hoy=None):
+        """
+        Construye la ventana a partir de --since (YYYY-MM-DD) o --days-back (N días).
+
+        :return: VentanaFechas, o None si no se pidió ninguna ventana.
+        """
+        if since:
+            return cls(datetime.strptime(since, '%Y-%m-%d').date())
+        if days_back is not None:
+            hoy = hoy or date.today()
+            return cls(hoy - timedelta(days=int(days_back)))
+        return None
+
+    def contiene(self, fecha):
+        if fecha is None:
+            return True
+        if fecha < self.desde:
+            return False
+        return self.hasta is None or fecha <= self.hasta
+
+    def contiene_archivo(self, nombre):
+        return self.contiene(extraer_fecha(nombre))
+
+    def contiene_carpeta(self, nombre):
+        """
+        Indica si una carpeta con nombre de periodo (año, año-mes o fecha) solapa la ventana.
+        Las carpetas cuyo nombre no es un periodo siempre se recorren.
+        """
+        coincidencia = _PATRON_CARPETA.match(nombre)
+        if not coincidencia:
+            return True
+        anio, mes, dia = coincidencia.groups()
+        try:
+            if dia:
+                inicio = fin = date(int(anio), int(mes), int(dia))
+            elif mes:
+                inicio = date(int(anio), int(mes), 1)
+                fin = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+            else:
+                inicio, fin = date(int(anio), 1, 1), date(int(anio), 12, 31)
+        except ValueError:
+            return True
+        if fin < self.desde:
+            return False
+        return self.hasta is None or inicio <= self.hasta
+
+    def __repr__(self):
+        return f"VentanaFechas(desde={self.desde}, hasta={self.hasta})"
@@ -0,0 +1,279 @@
+"""
+Clientes falsos de S3 y SFTP para probar los motores sin red.
+
+Solo implementan las llamadas que hace el código (list_objects_v2 paginado, HEAD, subidas,
+multiparte, copias y borrados en S3; listdir_attr, stat y open en SFTP) y registran cada
+llamada para que los tests comprueben cuántas se hicieron.
+"""
+import hashlib
+import io
+import posixpath
+import stat
+import threading
+from datetime import datetime, timezone
+import paramiko
+import pytest
+from botocore.exceptions import ClientError
+import src.clientes_aws as clientes_aws
+
+FECHA_FIJA = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def error_cliente(codigo, operacion='HeadObject'):
+    return ClientError({'Error': {'Code': codigo, 'Message': codigo}}, operacion)
+
+
+def _etag(cuerpo):
+    return '"%s"' % hashlib.md5(cuerpo).hexdigest()
+
+
+class _Paginador:
+    def __init__(self, s3):
+        self.s3 = s3
+
+    def paginate(self, Bucket, Prefix='', Delimiter=None, StartAfter=None):
+        with self.s3.lock:
+            claves = sorted(
+                clave for (bucket, clave) in self.s3.objetos
+                if bucket == Bucket and clave.startswith(Prefix) and (StartAfter is None or clave > StartAfter)
+            )
+            self.s3.llamadas.append(('list', Prefix, StartAfter))
+        contenidos, prefijos = [], []
+        for clave in claves:
+            resto = clave[len(Prefix):]
+            if Delimiter and Delimiter in resto:
+                prefijo = Prefix + resto.split(Delimiter)[0] + Delimiter
+                if prefijo not in prefijos:
+                    prefijos.append(prefijo)
+            else:
+                contenidos.append(self.s3.resumen(Bucket, clave))
+        # Páginas pequeñas para que los tests recorran más de una
+        tamano = self.s3.claves_por_pagina
+        for inicio in range(0, max(len(contenidos), 1), tamano):
+            pagina = {'Contents': contenidos[inicio:inicio + tamano]} if contenidos else {}
+            if inicio == 0 and prefijos:
+                pagina['CommonPrefixes'] = [{'Prefix': prefijo} for prefijo in prefijos]
+            yield pagina
+
+
+class ClienteS3Falso:
+    """Cliente de S3 en memoria: {(bucket, clave): {'Body', 'LastModified', 'kw'}}."""
+
+    class exceptions:
+        ClientError = ClientError
+
+    def __init__(self, claves_por_pagina=2):
+        self.objetos = {}
+        self.llamadas = []
+        self.lock = threading.Lock()
+        self.claves_por_pagina = claves_por_pagina
+        self.multipartes = {}
+        # Inyección de fallos
+        self.fallar_parte = None
+        self.fallar_copia = set()
+        self.errores_borrado = {}
+
+    def poner(self, bucket, clave, cuerpo=b'x', fecha=FECHA_FIJA, **kw):
+        with self.lock:
+            self.objetos[(bucket, clave)] = {'Body': bytes(cuerpo), 'LastModified': fecha, 'kw': kw}
+
+    def cuerpo(self, bucket, clave):
+        return self.objetos[(bucket, clave)]['Body']
+
+    def claves(self, bucket):
+        return sorted(clave for (b, clave) in self.objetos if b == bucket)
+
+    def operaciones(self, nombre):
+        return [llamada for llamada in self.llamadas if llamada[0] == nombre]
+
+    def resumen(self, bucket, clave):
+        objeto = self.objetos[(bucket, clave)]
+        return {'Key': clave, 'Size': len(objeto['Body']), 'ETag': _etag(objeto['Body']), 'LastModified': objeto['LastModified']}
+
+    def get_paginator(self, nombre):
+        assert nombre == 'list_objects_v2'
+        return _Paginador(self)
+
+    def head_object(self, Bucket, Key):
+        self.llamadas.append(('head', Key))
+        if (Bucket, Key) not in self.objetos:
+            raise error_cliente('404')
+        objeto = self.objetos[(Bucket, Key)]
+        return {'ContentLength': len(objeto['Body']), 'ETag': _etag(objeto['Body']), 'Metadata': {}, **objeto['kw']}
+
+    def put_object(self, Bucket, Key, Body=b'', **kw):
+        self.llamadas.append(('put', Key))
+        self.poner(Bucket, Key, Body, **kw)
+
+    def upload_file(self, ruta, Bucket, Key, ExtraArgs=None, Config=None):
+        self.llamadas.append(('upload', Key))
+        with open(ruta, 'rb') as archivo:
+            self.poner(Bucket, Key, archivo.read(), **(ExtraArgs or {}))
+
+    def upload_fileobj(self, archivo, Bucket, Key, ExtraArgs=None, Config=None):
+        self.llamadas.append(('upload', Key))
+        self.poner(Bucket, Key, archivo.read(), **(ExtraArgs or {}))
+
+    def create_multipart_upload(self, Bucket, Key, **kw):
+        with self.lock:
+            upload_id = f"u{len(self.multipartes)}"
+            self.multipartes[upload_id] = {'partes': {}, 'kw': kw}
+        self.llamadas.append(('create_mp', Key))
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.llamadas.append(('part', PartNumber, len(Body)))
+        if self.fallar_parte == PartNumber:
+            raise error_cliente('500', 'UploadPart')
+        self.multipartes[UploadId]['partes'][PartNumber] = Body
+        return {'ETag': _etag(Body)}
+
+    def upload_part_copy(self, Bucket, Key, UploadId, PartNumber, CopySource, CopySourceRange):
+        self.llamadas.append(('part_copy', PartNumber, CopySourceRange))
+        inicio, fin = map(int, CopySourceRange[len('bytes='):].split('-'))
+        cuerpo = self.cuerpo(CopySource['Bucket'], CopySource['Key'])[inicio:fin + 1]
+        self.multipartes[UploadId]['partes'][PartNumber] = cuerpo
+        return {'CopyPartResult': {'ETag': _etag(cuerpo)}}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.llamadas.append(('complete_mp', Key))
+        subida = self.multipartes.pop(UploadId)
+        numeros = [parte['PartNumber'] for parte in MultipartUpload['Parts']]
+        assert numeros == sorted(numeros), "S3 exige las partes en orden"
+        self.poner(Bucket, Key, b''.join(subida['partes'][numero] for numero in numeros), **subida['kw'])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.llamadas.append(('abort_mp', Key))
+        self.multipartes.pop(UploadId, None)
+
+    def copy_object(self, Bucket, CopySource, Key):
+        self.llamadas.append(('copy', Key))
+        if CopySource['Key'] in self.fallar_copia:
+            raise error_cliente('500', 'CopyObject')
+        self.poner(Bucket, Key, self.cuerpo(CopySource['Bucket'], CopySource['Key']))
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        assert len(Delete['Objects']) <= 1000, "delete_objects admite como mucho 1000 claves"
+        self.llamadas.append(('delete_objects', len(Delete['Objects'])))
+        errores = []
+        with self.lock:
+            for objeto in Delete['Objects']:
+                if objeto['Key'] in self.errores_borrado:
+                    errores.append({'Key': objeto['Key'], 'Code': self.errores_borrado[objeto['Key']], 'Message': 'denegado'})
+                else:
+                    self.objetos.pop((Bucket, objeto['Key']), None)
+        return {'Errors': errores} if errores else {}
+
+
+class _ArchivoRemoto(io.BytesIO):
+    """Archivo abierto con SFTPClient.open: cuenta los bytes leídos."""
+
+    def __init__(self, sftp, ruta, contenido, mtime):
+        super().__init__(contenido)
+        self.sftp = sftp
+        self.ruta = ruta
+        self.mtime = mtime
+
+    def stat(self):
+        attr = paramiko.SFTPAttributes()
+        attr.st_size = len(self.getvalue())
+        attr.st_mtime = self.mtime
+        return attr
+
+    def prefetch(self, file_size=None):
+        pass
+
+    def read(self, n=-1):
+        cortar_en = self.sftp.cortar_en
+        if cortar_en is not None:
+            if self.tell() >= cortar_en:
+                # Simula una conexión que se cae a mitad de la descarga (una sola vez)
+                self.sftp.cortar_en = None
+                raise EOFError('conexión SFTP cerrada')
+            n = cortar_en - self.tell() if n < 0 else min(n, cortar_en - self.tell())
+        datos = super().read(n)
+        self.sftp.bytes_leidos += len(datos)
+        return datos
+
+
+class SFTPFalso:
+    """
+    Servidor SFTP en memoria. arbol: {nombre: subárbol (dict) o (contenido en bytes, mtime)};
+    el mtime de un directorio va en la clave '__mtime__'.
+    """
+
+    def __init__(self, arbol):
+        self.arbol = arbol
+        self.llamadas = []
+        self.bytes_leidos = 0
+        self.cortar_en = None
+        self.lock = threading.Lock()
+
+    def _nodo(self, ruta):
+        nodo = self.arbol
+        for parte in [parte for parte in ruta.split('/') if parte]:
+            if not isinstance(nodo, dict) or parte not in nodo:
+                # paramiko traduce SSH2_FX_NO_SUCH_FILE a FileNotFoundError
+                raise FileNotFoundError(2, 'No such file', ruta)
+            nodo = nodo[parte]
+        return nodo
+
+    def _atributos(self, nombre, nodo):
+        attr = paramiko.SFTPAttributes()
+        attr.filename = nombre
+        if isinstance(nodo, dict):
+            attr.st_mode = stat.S_IFDIR | 0o755
+            attr.st_size = 0
+            attr.st_mtime = nodo.get('__mtime__', 1)
+        else:
+            attr.st_mode = stat.S_IFREG | 0o644
+            attr.st_size = len(nodo[0])
+            attr.st_mtime = nodo[1]
+        return attr
+
+    def _registrar(self, *llamada):
+        with self.lock:
+            self.llamadas.append(llamada)
+
+    def operaciones(self, nombre):
+        return [llamada for llamada in self.llamadas if llamada[0] == nombre]
+
+    def listdir_attr(self, ruta):
+        self._registrar('listdir', ruta)
+        return [self._atributos(nombre, nodo) for nombre, nodo in self._nodo(ruta).items() if nombre != '__mtime__']
+
+    def stat(self, ruta):
+        self._registrar('stat', ruta)
+        return self._atributos(posixpath.basename(ruta), self._nodo(ruta))
+
+    def open(self, ruta, modo='r'):
+        self._registrar('open', ruta)
+        contenido, mtime = self._nodo(ruta)
+        return _ArchivoRemoto(self, ruta, contenido, mtime)
+
+    def get_channel(self):
+        sftp = self
+
+        class Canal:
+            def get_transport(self):
+                return sftp
+        return Canal()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """ClienteS3Falso registrado como el cliente de S3 compartido del proceso (ver clientes_aws)."""
+    cliente = ClienteS3Falso()
+    monkeypatch.setitem(clientes_aws._clientes, ('s3', None), cliente)
+    return cliente
+
+
+@pytest.fixture
+def crear_sftp(monkeypatch):
+    """Crea un SFTPFalso; los canales extra que abre PoolCanalesSFTP son el mismo servidor falso."""
+    monkeypatch.setattr(paramiko.SFTPClient, 'from_transport', classmethod(lambda cls, transporte: transporte))
+    return SFTPFalso
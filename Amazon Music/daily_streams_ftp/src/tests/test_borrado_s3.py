@@ -0,0 +1,55 @@
+"""Borrados masivos por lotes de delete_objects."""
+from src.borrado_s3 import eliminar_claves, eliminar_prefijo, listar_claves
+
+
+def test_listar_claves_recorre_todas_las_paginas(s3):
+    for numero in range(7):
+        s3.poner('b', f"p/{numero}.json")
+    s3.poner('b', 'otro/0.json')
+    assert list(listar_claves(s3, 'b', 'p/')) == [f"p/{numero}.json" for numero in range(7)]
+
+
+def test_solo_nivel_superior_no_entra_en_subcarpetas(s3):
+    s3.poner('b', 'p/suelto.zip')
+    s3.poner('b', 'p/US/Daily/a.zip')
+    assert list(listar_claves(s3, 'b', 'p/', solo_nivel_superior=True)) == ['p/suelto.zip']
+
+
+def test_borra_en_lotes_de_mil(s3):
+    claves = [f"p/{numero:05d}" for numero in range(2500)]
+    for clave in claves:
+        s3.poner('b', clave)
+
+    resultado = eliminar_claves(s3, 'b', claves, simular=False, max_workers=3)
+
+    assert resultado
+    assert sorted(resultado.eliminados) == claves
+    assert not s3.claves('b')
+    assert sorted(llamada[1] for llamada in s3.operaciones('delete_objects')) == [500, 1000, 1000]
+
+
+def test_los_errores_de_s3_quedan_en_fallidos(s3):
+    for clave in ('p/a', 'p/b', 'p/c'):
+        s3.poner('b', clave)
+    s3.errores_borrado = {'p/b': 'AccessDenied'}
+
+    resultado = eliminar_claves(s3, 'b', ['p/a', 'p/b', 'p/c'], simular=False)
+
+    assert not resultado
+    assert sorted(resultado.eliminados) == ['p/a', 'p/c']
+    assert resultado.fallidos == {'p/b': 'AccessDenied: denegado'}
+    assert s3.claves('b') == ['p/b']
+
+
+def test_simular_solo_escribe_el_manifiesto(s3, tmp_path):
+    s3.poner('b', 'p/a')
+    s3.poner('b', 'p/b')
+    manifiesto = tmp_path / 'borrado.txt'
+
+    resultado = eliminar_prefijo(s3, 'b', 'p/', simular=True, manifiesto=str(manifiesto))
+
+    assert resultado.simulado
+    assert resultado.eliminados == ['p/a', 'p/b']
+    assert manifiesto.read_text(encoding='utf-8') == 'p/a\np/b\n'
+    assert s3.claves('b') == ['p/a', 'p/b']
+    assert not s3.operaciones('delete_objects')
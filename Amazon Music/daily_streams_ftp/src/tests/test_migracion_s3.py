@@ -0,0 +1,92 @@
+"""Migraciones plan/apply: un único listado, tandas anotadas en el diario y reanudación."""
+import json
+import src.migracion_s3 as migracion_s3
+from src.migracion_s3 import aplicar_plan, destino_por_prefijos, generar_plan, leer_diario, leer_plan
+
+
+def preparar(s3, tmp_path, claves=6):
+    for numero in range(claves):
+        s3.poner('b', f"src/sales/US/daily/{numero}.json", f"dia {numero}".encode())
+    s3.poner('b', 'src/sales/US/Daily/ya_bien.json')
+    ruta_plan = str(tmp_path / 'plan.jsonl')
+    pares = generar_plan(s3, 'b', 'src/sales/', destino_por_prefijos([('src/sales/US/daily/', 'src/sales/US/Daily/')]), ruta_plan)
+    return ruta_plan, pares
+
+
+def test_el_plan_lista_una_vez_y_solo_incluye_lo_que_se_mueve(s3, tmp_path):
+    ruta_plan, pares = preparar(s3, tmp_path)
+
+    bucket, plan = leer_plan(ruta_plan)
+    assert (bucket, pares) == ('b', 6)
+    assert plan[0].origen == 'src/sales/US/daily/0.json'
+    assert plan[0].destino == 'src/sales/US/Daily/0.json'
+    assert len(s3.operaciones('list')) == 1
+    assert not (tmp_path / 'plan.jsonl.tmp').exists()
+
+
+def test_aplicar_mueve_todo_y_anota_cada_par(s3, tmp_path):
+    ruta_plan, _ = preparar(s3, tmp_path)
+
+    resultado = aplicar_plan(ruta_plan, tamano_tanda=4, s3=s3)
+
+    assert resultado and len(resultado.movidos) == 6
+    assert not [clave for clave in s3.claves('b') if '/daily/' in clave]
+    assert s3.cuerpo('b', 'src/sales/US/Daily/5.json') == b'dia 5'
+    assert len(leer_diario(f"{ruta_plan}.diario")) == 6
+
+
+def test_reaplicar_omite_lo_anotado_sin_volver_a_listar(s3, tmp_path):
+    ruta_plan, _ = preparar(s3, tmp_path)
+    aplicar_plan(ruta_plan, s3=s3)
+    listados = len(s3.operaciones('list'))
+    copias = len(s3.operaciones('copy'))
+
+    resultado = aplicar_plan(ruta_plan, s3=s3)
+
+    assert resultado.movidos == []
+    assert len(s3.operaciones('list')) == listados
+    assert len(s3.operaciones('copy')) == copias
+
+
+def test_una_ejecucion_interrumpida_se_reanuda_desde_el_diario(s3, tmp_path, monkeypatch):
+    ruta_plan, _ = preparar(s3, tmp_path)
+    aplicar_movimiento = migracion_s3.aplicar_movimiento
+    tandas = []
+
+    def interrumpir_en_la_segunda_tanda(*args, **kwargs):
+        tandas.append(1)
+        if len(tandas) == 2:
+            raise KeyboardInterrupt
+        return aplicar_movimiento(*args, **kwargs)
+
+    monkeypatch.setattr(migracion_s3, 'aplicar_movimiento', interrumpir_en_la_segunda_tanda)
+    try:
+        aplicar_plan(ruta_plan, tamano_tanda=2, s3=s3)
+    except KeyboardInterrupt:
+        pass
+    assert len(leer_diario(f"{ruta_plan}.diario")) == 2
+
+    monkeypatch.setattr(migracion_s3, 'aplicar_movimiento', aplicar_movimiento)
+    resultado = aplicar_plan(ruta_plan, tamano_tanda=2, s3=s3)
+
+    assert sorted(resultado.movidos) == [f"src/sales/US/daily/{numero}.json" for numero in range(2, 6)]
+    assert len(leer_diario(f"{ruta_plan}.diario")) == 6
+
+
+def test_un_par_movido_pero_sin_anotar_cuenta_como_migrado(s3, tmp_path):
+    ruta_plan, _ = preparar(s3, tmp_path, claves=2)
+    # Simula un corte entre el borrado del origen y la anotación en el diario
+    s3.poner('b', 'src/sales/US/Daily/0.json', s3.cuerpo('b', 'src/sales/US/daily/0.json'))
+    del s3.objetos[('b', 'src/sales/US/daily/0.json')]
+
+    resultado = aplicar_plan(ruta_plan, s3=s3)
+
+    assert resultado
+    assert sorted(resultado.movidos) == ['src/sales/US/daily/0.json', 'src/sales/US/daily/1.json']
+    assert leer_diario(f"{ruta_plan}.diario") == {'src/sales/US/daily/0.json', 'src/sales/US/daily/1.json'}
+
+
+def test_el_diario_ignora_una_ultima_linea_cortada(tmp_path):
+    diario = tmp_path / 'plan.jsonl.diario'
+    diario.write_text(json.dumps({'origen': 'a', 'destino': 'A'}) + '\n{"origen": "b", "des', encoding='utf-8')
+    assert leer_diario(str(diario)) == {'a'}
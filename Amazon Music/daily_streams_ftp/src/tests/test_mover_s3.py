@@ -0,0 +1,81 @@
+"""Movimientos de prefijos: copia del lado del servidor, verificación y borrado de los orígenes."""
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import src.mover_s3 as mover_s3
+from src.mover_s3 import ParMovimiento, copiar_y_verificar, mover_prefijo, planificar_movimiento
+
+
+def test_planificar_conserva_la_ruta_relativa_y_aplica_el_filtro(s3):
+    s3.poner('b', 'src/sales/US/daily/a.json', b'aaa')
+    s3.poner('b', 'src/sales/US/daily/b.tmp', b'b')
+
+    pares = planificar_movimiento(s3, 'b', 'src/sales/US/daily/', 'src/sales/US/Daily/',
+                                  filtro=lambda clave: clave.endswith('.json'))
+
+    assert [(par.origen, par.destino, par.tamano) for par in pares] == [
+        ('src/sales/US/daily/a.json', 'src/sales/US/Daily/a.json', 3)
+    ]
+
+
+def test_mover_prefijo_copia_verifica_y_borra(s3):
+    for numero in range(5):
+        s3.poner('b', f"viejo/{numero}.json", f"contenido {numero}".encode())
+
+    resultado = mover_prefijo('b', 'viejo/', 'nuevo/', max_workers=2, s3=s3)
+
+    assert resultado
+    assert sorted(resultado.movidos) == [f"viejo/{numero}.json" for numero in range(5)]
+    assert s3.claves('b') == [f"nuevo/{numero}.json" for numero in range(5)]
+    assert s3.cuerpo('b', 'nuevo/3.json') == b'contenido 3'
+    assert resultado.bytes_copiados == sum(len(f"contenido {numero}") for numero in range(5))
+
+
+def test_una_copia_fallida_conserva_su_origen(s3):
+    s3.poner('b', 'viejo/ok.json', b'ok')
+    s3.poner('b', 'viejo/mal.json', b'mal')
+    s3.fallar_copia = {'viejo/mal.json'}
+
+    resultado = mover_prefijo('b', 'viejo/', 'nuevo/', s3=s3)
+
+    assert not resultado
+    assert resultado.movidos == ['viejo/ok.json']
+    assert set(resultado.fallidos) == {'viejo/mal.json'}
+    assert s3.claves('b') == ['nuevo/ok.json', 'viejo/mal.json']
+
+
+def test_una_copia_que_no_coincide_con_el_origen_no_se_borra(s3):
+    s3.poner('b', 'viejo/a.json', b'abc')
+    # El plan dice 4 bytes pero el objeto tiene 3: la verificación debe rechazar la copia
+    par = ParMovimiento('viejo/a.json', 'nuevo/a.json', 4, None)
+    with pytest.raises(ValueError, match='Tamaño'):
+        copiar_y_verificar(s3, 'b', par)
+
+    resultado = mover_s3.aplicar_movimiento(s3, 'b', [par])
+    assert set(resultado.fallidos) == {'viejo/a.json'}
+    assert ('b', 'viejo/a.json') in s3.objetos
+
+
+def test_objetos_enormes_se_copian_por_partes(s3, monkeypatch):
+    monkeypatch.setattr(mover_s3, 'LIMITE_COPY_OBJECT', 10)
+    cuerpo = bytes(range(25))
+    s3.poner('b', 'viejo/grande.zip', cuerpo, ContentType='application/zip')
+
+    resultado = mover_prefijo('b', 'viejo/', 'nuevo/', s3=s3)
+
+    assert resultado.movidos == ['viejo/grande.zip']
+    assert s3.cuerpo('b', 'nuevo/grande.zip') == cuerpo
+    assert s3.objetos[('b', 'nuevo/grande.zip')]['kw']['ContentType'] == 'application/zip'
+    assert not s3.operaciones('copy')
+
+
+def test_el_tamano_de_parte_crece_para_no_pasar_del_maximo_de_partes(s3, monkeypatch):
+    monkeypatch.setattr(mover_s3, 'LIMITE_COPY_OBJECT', 10)
+    monkeypatch.setattr(mover_s3, 'MAX_PARTES', 3)
+    s3.poner('b', 'viejo/grande.zip', bytes(25))
+
+    par = ParMovimiento('viejo/grande.zip', 'nuevo/grande.zip', 25, None)
+    with ThreadPoolExecutor(max_workers=2) as executor_partes:
+        copiar_y_verificar(s3, 'b', par, tamano_parte=1, executor_partes=executor_partes)
+
+    assert sorted(llamada[2] for llamada in s3.operaciones('part_copy')) == ['bytes=0-8', 'bytes=18-24', 'bytes=9-17']
+    assert s3.cuerpo('b', 'nuevo/grande.zip') == bytes(25)
@@ -0,0 +1,75 @@
+"""Pipeline de etapas solapadas: salidas, descartes, fallos y cierre de las colas."""
+import threading
+import time
+import pytest
+from src.pipeline import Etapa, Pipeline
+
+
+def ejecutar_con_limite(pipeline, entradas, segundos=5):
+    """Ejecuta el pipeline en otro hilo y falla en lugar de colgarse si no termina."""
+    salida = {}
+    hilo = threading.Thread(target=lambda: salida.setdefault('resultado', pipeline.ejecutar(entradas)), daemon=True)
+    hilo.start()
+    hilo.join(segundos)
+    assert not hilo.is_alive(), "el pipeline no terminó: alguna etapa quedó esperando en su cola"
+    return salida['resultado']
+
+
+def test_pasa_cada_elemento_por_todas_las_etapas():
+    pipeline = Pipeline([
+        Etapa('doble', lambda x: x * 2, workers=3),
+        Etapa('mas_uno', lambda x: x + 1, workers=2),
+    ], capacidad=2)
+    assert sorted(pipeline.ejecutar(range(20))) == [x * 2 + 1 for x in range(20)]
+    assert [etapa.procesados for etapa in pipeline.etapas] == [20, 20]
+
+
+def test_none_descarta_y_expandir_emite_cada_elemento():
+    pipeline = Pipeline([
+        Etapa('pares', lambda x: x if x % 2 == 0 else None),
+        Etapa('repetir', lambda x: [x] * 3, expandir=True),
+    ])
+    assert sorted(pipeline.ejecutar(range(6))) == [0, 0, 0, 2, 2, 2, 4, 4, 4]
+
+
+def test_las_etapas_trabajan_a_la_vez():
+    def lento(x):
+        time.sleep(0.05)
+        return x
+
+    pipeline = Pipeline([Etapa('a', lento), Etapa('b', lento)], capacidad=1)
+    inicio = time.perf_counter()
+    pipeline.ejecutar(range(8))
+    # En serie serían 16 x 0.05 s; solapadas, unas 9 x 0.05 s
+    assert time.perf_counter() - inicio < 0.7
+
+
+def test_los_errores_se_registran_y_se_notifican():
+    fallos = []
+
+    def fallar_con_tres(x):
+        if x == 3:
+            raise ValueError('tres')
+        return x
+
+    pipeline = Pipeline(
+        [Etapa('filtro', fallar_con_tres, workers=2), Etapa('igual', lambda x: x)],
+        al_fallar=lambda etapa, elemento, error: fallos.append((etapa.nombre, elemento, str(error))),
+    )
+    assert sorted(pipeline.ejecutar(range(5))) == [0, 1, 2, 4]
+    assert fallos == [('filtro', 3, 'tres')]
+    assert pipeline.etapas[0].errores == 1
+
+
+# El hilo que muere deja el aviso de excepción no capturada en un hilo: es justo el caso que se prueba
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+@pytest.mark.parametrize('workers', [1, 2])
+def test_un_hilo_muerto_por_base_exception_no_bloquea_las_siguientes_etapas(workers):
+    def salir_con_uno(x):
+        if x == 1:
+            raise SystemExit
+        return x
+
+    pipeline = Pipeline([Etapa('sale', salir_con_uno, workers=workers), Etapa('igual', lambda x: x, workers=2)])
+    resultado = ejecutar_con_limite(pipeline, [0, 1])
+    assert resultado == [0]
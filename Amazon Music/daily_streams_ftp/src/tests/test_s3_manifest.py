@@ -0,0 +1,91 @@
+"""Manifiesto SQLite de S3: refresco incremental por shard, reconciliación y vistas."""
+import pytest
+from src.indice_s3 import IndiceExistenciaS3
+from src.s3_manifest import ManifiestoS3
+
+PREFIJO = 'raw/'
+
+
+@pytest.fixture
+def manifiesto(tmp_path):
+    with ManifiestoS3(str(tmp_path / 'manifiesto.sqlite3')) as manifiesto:
+        yield manifiesto
+
+
+def poner_dias(s3, shard, dias):
+    for dia in dias:
+        s3.poner('b', f"{PREFIJO}{shard}AmazonMP3_202401{dia:02d}.json", b'x' * dia)
+
+
+def test_el_primer_refresco_lista_todo(s3, manifiesto):
+    poner_dias(s3, 'US/Daily/Prime/', range(1, 6))
+    poner_dias(s3, 'MX/Daily/Unlimited/', [1])
+    assert manifiesto.refrescado_en('b', PREFIJO) is None
+
+    assert manifiesto.refrescar('b', PREFIJO) == 6
+
+    assert manifiesto.claves('b', PREFIJO) == s3.claves('b')
+    objeto = manifiesto.objetos('b', f"{PREFIJO}US/")[2]
+    assert (objeto['Key'], objeto['Size']) == (f"{PREFIJO}US/Daily/Prime/AmazonMP3_20240103.json", 3)
+    assert manifiesto.refrescado_en('b', PREFIJO) is not None
+
+
+def test_el_refresco_incremental_solo_pagina_lo_posterior_a_la_ultima_clave(s3, manifiesto):
+    poner_dias(s3, 'US/Daily/Prime/', range(1, 6))
+    manifiesto.refrescar('b', PREFIJO)
+    poner_dias(s3, 'US/Daily/Prime/', [6, 7])
+    poner_dias(s3, 'BR/Daily/Prime/', [1])
+    s3.llamadas.clear()
+
+    assert manifiesto.refrescar('b', PREFIJO) == 3
+
+    assert manifiesto.claves('b', PREFIJO) == s3.claves('b')
+    paginados = {prefijo: desde for (_, prefijo, desde) in s3.operaciones('list') if prefijo.endswith('Prime/')}
+    assert paginados[f"{PREFIJO}US/Daily/Prime/"] == f"{PREFIJO}US/Daily/Prime/AmazonMP3_20240105.json"
+    # Un shard nuevo se pagina completo
+    assert paginados[f"{PREFIJO}BR/Daily/Prime/"] is None
+
+
+def test_solo_la_reconciliacion_completa_ve_los_borrados(s3, manifiesto):
+    poner_dias(s3, 'US/Daily/Prime/', range(1, 4))
+    manifiesto.refrescar('b', PREFIJO)
+    borrada = f"{PREFIJO}US/Daily/Prime/AmazonMP3_20240102.json"
+    del s3.objetos[('b', borrada)]
+
+    manifiesto.refrescar('b', PREFIJO)
+    assert manifiesto.contiene('b', borrada)
+
+    manifiesto.refrescar('b', PREFIJO, completo=True)
+    assert not manifiesto.contiene('b', borrada)
+    assert manifiesto.claves('b', PREFIJO) == s3.claves('b')
+
+
+def test_los_prefijos_no_se_mezclan(s3, manifiesto):
+    poner_dias(s3, 'US/Daily/Prime/', [1])
+    s3.poner('b', 'rawx/US/Daily/Prime/otro.json')
+    manifiesto.refrescar('b', PREFIJO)
+    assert manifiesto.claves('b', PREFIJO) == [f"{PREFIJO}US/Daily/Prime/AmazonMP3_20240101.json"]
+
+
+def test_la_vista_se_comporta_como_conjunto_y_registra_subidas(s3, manifiesto):
+    poner_dias(s3, 'US/Daily/Prime/', [1])
+    manifiesto.refrescar('b', PREFIJO)
+    vista = manifiesto.vista('b', PREFIJO)
+    nueva = f"{PREFIJO}US/Daily/Prime/AmazonMP3_20240102.json"
+
+    assert f"{PREFIJO}US/Daily/Prime/AmazonMP3_20240101.json" in vista
+    assert nueva not in vista
+    vista.agregar(nueva, 123)
+
+    assert nueva in vista and len(vista) == 2
+    assert manifiesto.objetos('b', nueva)[0]['Size'] == 123
+
+
+def test_el_indice_de_un_prefijo_nunca_refrescado_nace_caducado(s3, manifiesto):
+    poner_dias(s3, 'US/Daily/Prime/', [1])
+    assert not IndiceExistenciaS3.desde_manifiesto(manifiesto, 'b', PREFIJO).esta_vigente()
+
+    manifiesto.refrescar('b', PREFIJO)
+    indice = IndiceExistenciaS3.desde_manifiesto(manifiesto, 'b', PREFIJO)
+    assert indice.esta_vigente()
+    assert f"{PREFIJO}US/Daily/Prime/AmazonMP3_20240101.json" in indice
@@ -0,0 +1,86 @@
+"""
+Paridad del serializador JSON por columnas con DataFrame.to_json (pandas fijado en requirements.txt).
+
+    python -m pytest tests
+"""
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import pytest
+from src.esquema_tsv import leer_tsv_tipado
+from src.file_transformer import transformar_datos
+from src.serializador_json import escribir_array_json, escribir_ndjson, serializar_json
+
+FORMATOS_FECHA = ['iso', 'epoch']
+
+
+def dataframe_casos_limite():
+    """Valores que obligan a escapar o a formatear igual que pandas."""
+    return pd.DataFrame({
+        'TEXTO': ['a/b', 'comillas "x"', 'tab\t y \\', 'acentuación ñ', 'emoji \U0001F3B5', None, '', 'línea\nnueva'],
+        'ENTERO': np.arange(8, dtype='int64') - 3,
+        'ENTERO_NULO': pd.array([1, None, 3, -4, None, 10**12, 0, 7], dtype='Int64'),
+        'DECIMAL': [0.1, 1 / 3, np.nan, 1e20, -2.5, 3.0, 1e-7, 123456789.123456789],
+        'BOOLEANO': [True, False] * 4,
+        'FECHA': pd.to_datetime(['2024-01-15 10:20:30', None, '2024-02-29', '1999-12-31 23:59:59.123', '2024-01-01', None, '2030-06-30', '2024-01-15'], format='ISO8601'),
+        'CATEGORIA': pd.Categorical(['US', 'MX', None, 'US', 'BR', 'MX', 'US', 'ES']),
+        'MIXTO': ['x', 1, 2.5, None, 'y', True, 'z', 3],
+    })
+
+
+def dataframe_tipado():
+    """Un TSV diario leído con el esquema de Diccionario.json y transformado, como en producción."""
+    tsv = (
+        "dataset date\tterritory code\ttrack isrc\ttrack name\tdigital album upc\tstreams\ttimestamp\tpostal code\tdevice type\n"
+        "2024-01-15\tUS\tUSRC17607839\tCanción \"uno\"\t0093624\t3\t2024-01-15 10:20:30\t01234\tMobile\n"
+        "2024-01-15\tMX\tMXF011900001\t\t\t\t2024-01-15 23:59:59\t\tDesktop\n"
+        "2024-01-15\tUS\tUSRC17607840\tA/B\t123\t7\t2024-01-15 00:00:00\tSW1A 1AA\tMobile\n"
+    ).encode('utf-8')
+    return transformar_datos(leer_tsv_tipado(BytesIO(tsv), estricto=False))
+
+
+def a_json(df, lineas, date_format):
+    return df.to_json(orient='records', lines=lineas, date_format=date_format).encode('utf-8')
+
+
+@pytest.mark.parametrize('date_format', FORMATOS_FECHA)
+@pytest.mark.parametrize('lineas', [False, True])
+@pytest.mark.parametrize('crear', [dataframe_casos_limite, dataframe_tipado])
+def test_serializar_json_igual_que_pandas(crear, lineas, date_format):
+    df = crear()
+    assert serializar_json(df, lineas=lineas, date_format=date_format) == a_json(df, lineas, date_format)
+
+
+@pytest.mark.parametrize('date_format', FORMATOS_FECHA)
+@pytest.mark.parametrize('filas_por_lote', [1, 3, 100])
+def test_escribir_ndjson_por_lotes(date_format, filas_por_lote):
+    df = dataframe_casos_limite()
+    salida = BytesIO()
+    escribir_ndjson(df, salida, date_format=date_format, filas_por_lote=filas_por_lote)
+    assert salida.getvalue() == a_json(df, True, date_format)
+
+
+@pytest.mark.parametrize('filas_por_lote', [1, 3, 100])
+def test_escribir_array_json_en_varios_bloques(filas_por_lote):
+    df = dataframe_casos_limite()
+    salida = BytesIO()
+    salida.write(b'[')
+    primero = True
+    for inicio in range(0, len(df), 3):
+        if escribir_array_json(df.iloc[inicio:inicio + 3], salida, filas_por_lote=filas_por_lote, primero=primero):
+            primero = False
+    salida.write(b']')
+    assert salida.getvalue() == a_json(df, False, 'iso')
+
+
+@pytest.mark.parametrize('lineas', [False, True])
+def test_dataframe_vacio(lineas):
+    df = dataframe_casos_limite().iloc[:0]
+    assert serializar_json(df, lineas=lineas) == a_json(df, lineas, 'iso')
+
+
+def test_escribir_ndjson_vacio():
+    df = dataframe_casos_limite().iloc[:0]
+    salida = BytesIO()
+    escribir_ndjson(df, salida)
+    assert salida.getvalue() == a_json(df, True, 'iso')
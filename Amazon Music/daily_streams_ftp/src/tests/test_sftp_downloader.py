@@ -0,0 +1,83 @@
+"""Descargas SFTP reanudables: checkpoints en .part/.part.meta, reinicio si el archivo cambió y reintentos."""
+import json
+import pytest
+import src.sftp_downloader as sftp_downloader
+from src.sftp_downloader import descargar_con_reintentos, descargar_reanudable
+from src.sftp_utils import PoolCanalesSFTP
+
+REMOTO = '/US/Daily/AmazonMP3_20240101.zip'
+CONTENIDO = bytes(range(256)) * 4
+
+
+@pytest.fixture(autouse=True)
+def bloques_pequenos(monkeypatch):
+    monkeypatch.setattr(sftp_downloader, 'TAMANO_BLOQUE', 64)
+    monkeypatch.setattr(sftp_downloader, 'BYTES_ENTRE_CHECKPOINTS', 128)
+
+
+@pytest.fixture
+def sftp(crear_sftp):
+    return crear_sftp({'US': {'Daily': {'AmazonMP3_20240101.zip': (CONTENIDO, 100)}}})
+
+
+def test_descarga_completa_y_limpia_los_temporales(sftp, tmp_path):
+    local = tmp_path / 'a.zip'
+
+    descargar_reanudable(sftp, REMOTO, str(local), len(CONTENIDO), 100)
+
+    assert local.read_bytes() == CONTENIDO
+    assert not (tmp_path / 'a.zip.part').exists()
+    assert not (tmp_path / 'a.zip.part.meta').exists()
+
+
+def test_un_corte_se_reanuda_desde_el_ultimo_checkpoint(sftp, tmp_path):
+    local = tmp_path / 'a.zip'
+    sftp.cortar_en = 600
+    with pytest.raises(EOFError):
+        descargar_reanudable(sftp, REMOTO, str(local))
+    checkpoint = json.loads((tmp_path / 'a.zip.part.meta').read_text(encoding='utf-8'))
+    assert checkpoint == {'remoto': REMOTO, 'tamano': len(CONTENIDO), 'mtime': 100, 'offset': 512}
+    sftp.bytes_leidos = 0
+
+    descargar_reanudable(sftp, REMOTO, str(local))
+
+    assert local.read_bytes() == CONTENIDO
+    assert sftp.bytes_leidos == len(CONTENIDO) - 512
+
+
+def test_si_el_remoto_cambio_se_empieza_de_cero(sftp, tmp_path):
+    local = tmp_path / 'a.zip'
+    sftp.cortar_en = 600
+    with pytest.raises(EOFError):
+        descargar_reanudable(sftp, REMOTO, str(local))
+    nuevo = CONTENIDO[::-1]
+    sftp.arbol['US']['Daily']['AmazonMP3_20240101.zip'] = (nuevo, 200)
+    sftp.bytes_leidos = 0
+
+    descargar_reanudable(sftp, REMOTO, str(local))
+
+    assert local.read_bytes() == nuevo
+    assert sftp.bytes_leidos == len(nuevo)
+
+
+def test_descargar_con_reintentos_reanuda_con_un_canal_nuevo(sftp, tmp_path):
+    local = tmp_path / 'a.zip'
+    sftp.cortar_en = 300
+    pool = PoolCanalesSFTP(sftp.get_channel().get_transport(), sftp)
+
+    descargar_con_reintentos(pool, REMOTO, str(local), max_reintentos=3, espera_base=0,
+                             atributos=(len(CONTENIDO), 100))
+
+    assert local.read_bytes() == CONTENIDO
+    assert len(sftp.operaciones('open')) == 2
+    assert sftp.bytes_leidos == 300 + len(CONTENIDO) - 256
+
+
+def test_descargar_con_reintentos_propaga_el_ultimo_error(crear_sftp, tmp_path):
+    sftp = crear_sftp({})
+    pool = PoolCanalesSFTP(sftp.get_channel().get_transport(), sftp)
+
+    with pytest.raises(FileNotFoundError):
+        descargar_con_reintentos(pool, REMOTO, str(tmp_path / 'a.zip'), max_reintentos=2, espera_base=0)
+
+    assert len(sftp.operaciones('open')) == 2
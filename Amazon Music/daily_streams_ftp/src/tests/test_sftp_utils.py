@@ -0,0 +1,95 @@
+"""Recorrido SFTP en paralelo: filtro por carpeta base, poda por ventana y caché de listados."""
+from datetime import date
+import pytest
+from src.sftp_utils import list_sftp_file_attrs, refrescar_atributos
+from src.ventana_fechas import VentanaFechas
+
+
+def arbol_de_prueba():
+    return {
+        '__mtime__': 10,
+        'US': {
+            '__mtime__': 10,
+            'LEEME.txt': (b'fuera de Daily', 5),
+            'Daily': {
+                '__mtime__': 10,
+                '2023': {'__mtime__': 10, 'AmazonMP3_20231231.zip': (b'viejo', 7)},
+                '2024': {
+                    '__mtime__': 10,
+                    'AmazonMP3_20240101.zip': (b'enero', 8),
+                    'AmazonMP3_20240102.zip': (b'enero 2', 9),
+                },
+            },
+        },
+    }
+
+
+@pytest.fixture
+def sftp(crear_sftp):
+    return crear_sftp(arbol_de_prueba())
+
+
+def test_devuelve_solo_los_archivos_bajo_la_carpeta_base(sftp):
+    atributos = list_sftp_file_attrs(sftp, '/', max_workers=3, ruta_cache='')
+
+    assert list(atributos) == [
+        '/US/Daily/2023/AmazonMP3_20231231.zip',
+        '/US/Daily/2024/AmazonMP3_20240101.zip',
+        '/US/Daily/2024/AmazonMP3_20240102.zip',
+    ]
+    assert atributos['/US/Daily/2024/AmazonMP3_20240102.zip'].st_size == len(b'enero 2')
+    assert len(sftp.operaciones('listdir')) == 5
+
+
+def test_la_ventana_no_recorre_carpetas_de_periodos_anteriores(sftp):
+    ventana = VentanaFechas(date(2024, 1, 2))
+
+    atributos = list_sftp_file_attrs(sftp, '/', ruta_cache='', ventana=ventana)
+
+    assert list(atributos) == ['/US/Daily/2024/AmazonMP3_20240102.zip']
+    assert ('listdir', '/US/Daily/2023') not in sftp.llamadas
+
+
+def test_la_segunda_ejecucion_toma_los_directorios_sin_cambios_de_la_cache(sftp, tmp_path):
+    ruta_cache = str(tmp_path / 'listados.jsonl')
+    primera = list_sftp_file_attrs(sftp, '/', ruta_cache=ruta_cache)
+    sftp.llamadas.clear()
+
+    segunda = list_sftp_file_attrs(sftp, '/', ruta_cache=ruta_cache)
+
+    assert list(segunda) == list(primera)
+    assert not sftp.operaciones('listdir')
+    # Los subdirectorios se comprueban con stat porque su mtime en la caché puede estar desfasado
+    assert len(sftp.operaciones('stat')) == 5
+    assert all(attr.desde_cache for attr in segunda.values())
+
+
+def test_un_directorio_con_otro_mtime_se_vuelve_a_listar(sftp, tmp_path):
+    ruta_cache = str(tmp_path / 'listados.jsonl')
+    list_sftp_file_attrs(sftp, '/', ruta_cache=ruta_cache)
+    carpeta = sftp.arbol['US']['Daily']['2024']
+    carpeta['AmazonMP3_20240103.zip'] = (b'nuevo', 11)
+    carpeta['__mtime__'] = 11
+    sftp.llamadas.clear()
+
+    atributos = list_sftp_file_attrs(sftp, '/', ruta_cache=ruta_cache)
+
+    assert sftp.operaciones('listdir') == [('listdir', '/US/Daily/2024')]
+    assert '/US/Daily/2024/AmazonMP3_20240103.zip' in atributos
+    assert not getattr(atributos['/US/Daily/2024/AmazonMP3_20240103.zip'], 'desde_cache', False)
+
+
+def test_refrescar_atributos_detecta_un_archivo_sobrescrito(sftp, tmp_path):
+    ruta_cache = str(tmp_path / 'listados.jsonl')
+    list_sftp_file_attrs(sftp, '/', ruta_cache=ruta_cache)
+    # Sobrescribir un archivo no cambia el mtime de su directorio
+    sftp.arbol['US']['Daily']['2024']['AmazonMP3_20240101.zip'] = (b'enero reemitido', 20)
+    atributos = list_sftp_file_attrs(sftp, '/', ruta_cache=ruta_cache)
+    ruta = '/US/Daily/2024/AmazonMP3_20240101.zip'
+    assert atributos[ruta].st_size == len(b'enero')
+
+    refrescados = refrescar_atributos(sftp, atributos, filtro=lambda r: '/2024/' in r, max_workers=2)
+
+    assert refrescados == 2
+    assert (atributos[ruta].st_size, atributos[ruta].st_mtime) == (len(b'enero reemitido'), 20)
+    assert atributos['/US/Daily/2023/AmazonMP3_20231231.zip'].desde_cache
@@ -0,0 +1,65 @@
+"""SubidaMultiparte: reparto en partes, put_object para archivos pequeños y aborto."""
+import pytest
+from botocore.exceptions import ClientError
+from src.subida_multiparte import TAMANO_PARTE_MINIMO, SubidaMultiparte
+
+MB = 1024 * 1024
+
+
+def test_archivo_pequeno_se_sube_con_un_solo_put_object(s3):
+    with SubidaMultiparte(s3, 'b', 'salida.json', argumentos={'ContentEncoding': 'gzip'}) as subida:
+        subida.write(b'{"a":1}\n')
+        subida.write(b'{"a":2}\n')
+
+    assert s3.cuerpo('b', 'salida.json') == b'{"a":1}\n{"a":2}\n'
+    assert s3.objetos[('b', 'salida.json')]['kw'] == {'ContentEncoding': 'gzip'}
+    assert [llamada[0] for llamada in s3.llamadas] == ['put']
+
+
+def test_escrituras_grandes_se_reparten_en_partes_del_tamano_pedido(s3):
+    datos = bytes(range(256)) * (13 * MB // 256)
+    with SubidaMultiparte(s3, 'b', 'grande.json', tamano_parte=5 * MB, concurrencia=2,
+                          argumentos={'ContentEncoding': 'zstd'}) as subida:
+        # Escrituras de tamaño irregular: las partes no dependen de cómo llegan los bytes
+        for inicio in range(0, len(datos), 3 * MB + 7):
+            subida.write(datos[inicio:inicio + 3 * MB + 7])
+
+    assert s3.cuerpo('b', 'grande.json') == datos
+    assert s3.objetos[('b', 'grande.json')]['kw'] == {'ContentEncoding': 'zstd'}
+    assert [llamada[2] for llamada in s3.operaciones('part')] == [5 * MB, 5 * MB, 3 * MB]
+    assert subida.bytes_escritos == len(datos)
+    assert not s3.multipartes
+
+
+def test_la_parte_nunca_baja_del_minimo_de_s3(s3):
+    subida = SubidaMultiparte(s3, 'b', 'x', tamano_parte=1)
+    assert subida.tamano_parte == TAMANO_PARTE_MINIMO
+
+
+def test_una_parte_fallida_aborta_la_subida(s3):
+    s3.fallar_parte = 2
+    with pytest.raises(ClientError):
+        with SubidaMultiparte(s3, 'b', 'roto.json', tamano_parte=5 * MB, concurrencia=1) as subida:
+            subida.write(b'x' * (11 * MB))
+
+    assert ('b', 'roto.json') not in s3.objetos
+    assert s3.operaciones('abort_mp') == [('abort_mp', 'roto.json')]
+    assert not s3.multipartes
+
+
+def test_una_excepcion_dentro_del_with_aborta_sin_publicar(s3):
+    with pytest.raises(RuntimeError):
+        with SubidaMultiparte(s3, 'b', 'parcial.json', tamano_parte=5 * MB) as subida:
+            subida.write(b'x' * (6 * MB))
+            raise RuntimeError('fallo al serializar')
+
+    assert ('b', 'parcial.json') not in s3.objetos
+    assert s3.operaciones('abort_mp') == [('abort_mp', 'parcial.json')]
+    assert not s3.operaciones('complete_mp')
+
+
+def test_no_se_puede_escribir_tras_cerrar(s3):
+    subida = SubidaMultiparte(s3, 'b', 'x')
+    subida.close()
+    with pytest.raises(ValueError):
+        subida.write(b'tarde')
@@ -1,9 +1,10 @@
-import boto3
 import os
 from loguru import logger
 import pandas as pd
 from io import StringIO
 from config.settings import settings
+from src.s3_manifest import ManifiestoS3
+from src.clientes_aws import cliente_s3
 import zipfile
 import tempfile
 import shutil
@@ -14,16 +15,24 @@ S3_PREFIX_RAW = 'src/raw/'  # Prefijo en S3 para raw (archivos .zip)
 LOCAL_PATH_SALES = 'src/sales/'  # Prefijo en S3 para sales (archivos .json)
 TEMPORAL_PATH = 'src/Data/'  # Carpeta temporal local para archivos descomprimidos
 
-# Cliente de S3
-s3_client = boto3.client('s3', aws_access_key_id=settings.AWS_ACCESS_KEY_ID, aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY)
+# Cliente de S3 compartido
+s3_client = cliente_s3()
 
 
 # Asegurarse de que la carpeta temporal exista
 if not os.path.exists(TEMPORAL_PATH):
     os.makedirs(TEMPORAL_PATH)
 
-def get_s3_files(prefix):
-    """Obtiene una lista de archivos en S3 bajo el prefijo dado."""
+def get_s3_files(prefix, completo=False):
+    """
+    Obtiene una lista de archivos en S3 bajo el prefijo dado.
+    Si el manifiesto local está activo, lo refresca de forma incremental y consulta el índice.
+    """
+    if settings.S3_MANIFEST_PATH:
+        with ManifiestoS3() as manifiesto:
+            manifiesto.refrescar(bucket_name, prefix, completo=completo)
+            return manifiesto.claves(bucket_name, prefix)
+
     s3_files = []
     paginator = s3_client.get_paginator('list_objects_v2')
     for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
@@ -2,6 +2,7 @@ import zipfile
 import os
 import pandas as pd
 import logging
+from src.serializador_json import escribir_ndjson
 
 # Configuración básica del logger
 logging.basicConfig(level=logging.INFO)
@@ -82,7 +83,9 @@ def procesar_archivos_txt(directorio_txt, directorio_destino):
                 if df_transformado is not None:
                     nombre_archivo_json = archivo.replace('.txt', '.json')
                     ruta_json = os.path.join(directorio_destino, nombre_archivo_json)
-                    df_transformado.to_json(ruta_json, orient='records', lines=True)
+                    # NDJSON con fechas en epoch (ms), igual que to_json(lines=True) por defecto
+                    with open(ruta_json, 'wb') as salida:
+                        escribir_ndjson(df_transformado, salida, date_format='epoch')
                     logger.info(f"Archivo {nombre_archivo_json} guardado en {directorio_destino}")
                 else:
                     logger.error(f"Error al transformar el archivo {archivo}")